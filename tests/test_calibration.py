@@ -0,0 +1,45 @@
+"""Tests of the per-user sensors normalization."""
+
+import struct
+
+import numpy as np
+import pytest
+
+from vmg30.batch import decode_payloads
+from vmg30.calibration import CalibrationProfile
+
+_PAYLOAD = struct.Struct('>BHI8i24H')  # quaternion sample
+
+
+def _payload(sensors):
+    return _PAYLOAD.pack(0x01, 1, 0, *[0] * 8, *sensors)
+
+
+def _profile():
+    minimums = [200.0] * 24
+    maximums = [800.0] * 24
+    gains = [1.0] * 14 + [1.0] * 5 + [0.5] * 5
+    return CalibrationProfile(minimums=minimums, maximums=maximums, gains=gains)
+
+
+@pytest.mark.parametrize('raw, pressure, other', [(200, 1.0, 0.0), (800, 0.0, 0.5),
+                                                  (500, 0.5, 0.25)])
+def test_learned_profile_ranges(raw, pressure, other):
+    profile = _profile()
+    payload = _payload([raw] * 24)
+
+    sample = profile.decoder(payload)
+    assert sample.pressures == pytest.approx([pressure] * 5)
+    assert sample.pip_joints == pytest.approx([(raw - 200) / 600] * 5)
+    assert sample.abductions == pytest.approx([other] * 4)
+
+    samples = decode_payloads(payload, len(payload), profile=profile)
+    assert samples['pressures'][0] == pytest.approx(np.full(5, pressure))
+    assert samples['abductions'][0] == pytest.approx(np.full(4, other))
+
+
+def test_default_profile_matches_firmware():
+    profile = CalibrationProfile()
+    sample = profile.decoder(_payload([999] * 24))
+    assert sample.pressures == pytest.approx([0.0] * 5)
+    assert sample.dip_joints == pytest.approx([0.999] * 5)
@@ -0,0 +1,125 @@
+"""Tests of the glove clock synchronisation on synthetic clocks."""
+
+import dataclasses
+import random
+
+import pytest
+
+from vmg30.clock import CLOCK_WRAP, ClockSync
+from vmg30.protocol import decode_sample
+from vmg30.tools.bench import make_payload
+
+_TEMPLATE = decode_sample(make_payload(random.Random(0)))
+_HOST_START = 50.0
+_LATENCY = 0.001  # the least transfer time
+
+
+def _stream(count, period=10, start=1000, drift=0.0, seed=0, spikes=(), drops=()):
+    # samples of a glove clocked every period msec from start msec, with their host
+    # reception time (the transfer time is jittery, whole buckets of 64 samples listed in
+    # spikes are delayed) and the host time they were taken at
+    rng = random.Random(seed)
+    for i in range(count):
+        if i in drops:
+            continue
+        elapsed = i * period / 1000
+        taken = _HOST_START + elapsed * (1.0 + drift)
+        received = taken + _LATENCY + rng.expovariate(500.0)
+        if i // 64 in spikes:
+            received += 0.05
+        clock = (start + i * period) % (1 << 32) / 1000
+        yield dataclasses.replace(_TEMPLATE, clock=clock), received, taken
+
+
+def _run(sync, stream):
+    return [(sync.update(sample, received), taken) for sample, received, taken in stream]
+
+
+@pytest.mark.parametrize('drift', [0.0, 1e-4, -5e-5])
+def test_known_drift(drift):
+    sync = ClockSync()
+    timed = _run(sync, _stream(64 * 64, drift=drift))
+    assert sync.period == pytest.approx(0.01)
+    assert sync.drift == pytest.approx(drift, abs=2e-6)
+    assert sync.offset == pytest.approx(_HOST_START - 1.0 + 40.95 * drift + _LATENCY, abs=2e-4)
+    for sample, taken in timed[64 * 8:]:
+        assert sample.timestamp - taken == pytest.approx(_LATENCY, abs=5e-4)
+    timestamps = [sample.timestamp for sample, _ in timed]
+    assert timestamps == sorted(timestamps)
+    assert (sync.samples, sync.gaps, sync.lost) == (64 * 64, 0, 0)
+
+
+def test_first_bucket_takes_smallest_difference():
+    stream = list(_stream(9))
+    sync = ClockSync()
+    timed = _run(sync, stream[:8])
+    assert sync.period is None  # estimated from the first 8 steps
+    assert sync.drift == 0.0
+    difference = min(received - sample.clock for sample, received, _ in stream[:8])
+    assert sync.offset == pytest.approx(difference)
+    assert timed[-1][0].timestamp == pytest.approx(timed[-1][0].clock + difference)
+    _run(sync, stream[8:])
+    assert sync.period == pytest.approx(0.01)
+
+
+def test_jitter_spikes_are_rejected():
+    spikes = (3, 20, 21, 47, 63)  # buckets delayed by 50 msec
+    sync = ClockSync()
+    timed = _run(sync, _stream(64 * 64, drift=1e-4, spikes=spikes))
+    assert sync.drift == pytest.approx(1e-4, abs=2e-6)
+    for sample, taken in timed[64 * 8:]:
+        assert sample.timestamp - taken == pytest.approx(_LATENCY, abs=5e-4)
+
+    reference = ClockSync()
+    _run(reference, _stream(64 * 64, drift=1e-4))
+    assert sync.offset == pytest.approx(reference.offset, abs=2e-4)
+
+
+def test_clock_wrap():
+    start = round(CLOCK_WRAP * 1000) - 64 * 10 * 10  # the counter wraps at the 640th sample
+    sync = ClockSync()
+    timed = _run(sync, _stream(64 * 20, start=start, drift=1e-4))
+    clocks = [sample.clock for sample, _ in timed]
+    assert timed[639][0].sample.clock > timed[640][0].sample.clock
+    assert clocks[640] == pytest.approx(CLOCK_WRAP)
+    assert all(b - a == pytest.approx(0.01) for a, b in zip(clocks, clocks[1:]))
+    for sample, taken in timed[64 * 8:]:
+        assert sample.timestamp - taken == pytest.approx(_LATENCY, abs=5e-4)
+    assert (sync.gaps, sync.lost) == (0, 0)
+    assert sync.unwrap(timed[-1][0].sample.clock) == clocks[-1]
+
+
+@pytest.mark.parametrize('rate', [None, 100.0], ids=['estimated', 'nominal'])
+def test_dropped_samples(rate):
+    drops = {20, 100, 101, 102, 500, 501, 502, 503, 504, 505, 506, 507, 508, 509}
+    sync = ClockSync(rate=rate)
+    timed = _run(sync, _stream(64 * 16, drops=drops))
+    assert sync.period == pytest.approx(0.01)
+    assert (sync.samples, sync.gaps, sync.lost) == (64 * 16 - len(drops), 3, len(drops))
+    lost = {round(sample.clock * 100) - 100: sample.lost for sample, _ in timed if sample.lost}
+    assert lost == {21: 1, 103: 3, 510: 10}
+    for sample, taken in timed[64 * 8:]:
+        assert sample.timestamp - taken == pytest.approx(_LATENCY, abs=5e-4)
+
+
+def test_samples_sharing_clock():
+    # faster than the millisecond counter, e.g. a backlog read at once
+    sync = ClockSync()
+    stream = [(dataclasses.replace(sample, clock=1.0 + i // 4 / 1000), received, taken)
+              for i, (sample, received, taken) in enumerate(_stream(300, period=1))]
+    timed = _run(sync, stream)
+    assert sync.period is None
+    assert (sync.gaps, sync.lost) == (0, 0)
+    assert [sample.clock for sample, _ in timed] == [1.0 + i // 4 / 1000 for i in range(300)]
+
+
+def test_reset():
+    sync = ClockSync()
+    _run(sync, _stream(200, drops={50}))
+    sync.reset()
+    assert (sync.offset, sync.drift, sync.period) == (None, 0.0, None)
+    assert (sync.samples, sync.gaps, sync.lost) == (0, 0, 0)
+    # the glove was restarted, its clock begins anew
+    timed = _run(sync, _stream(200, start=0))
+    assert timed[0][0].clock == 0.0
+    assert sync.gaps == 0
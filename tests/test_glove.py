@@ -0,0 +1,96 @@
+"""Tests of the glove client against the emulated glove."""
+
+import dataclasses
+import os
+
+import pytest
+
+from vmg30.emulator import _TEMPLATES, EmulatorPty, FakeSerial, GloveEmulator, \
+    _synthetic_payload
+from vmg30.error import GloveTimeoutError
+from vmg30.glove import Glove
+from vmg30.protocol import decode_sample
+from vmg30.reader import GloveReader
+
+
+def _templates(device_id, raw):
+    mode = 0x03 if raw else 0x01
+    return [dataclasses.replace(decode_sample(_synthetic_payload(mode, device_id, index)),
+                                clock=0.0)
+            for index in range(_TEMPLATES)]
+
+
+def _skipped_packets(samples, templates):
+    # every sample is intact and in the emulated order, count the missing (damaged) ones
+    indices = [templates.index(dataclasses.replace(sample, clock=0.0)) for sample in samples]
+    skipped = sum((b - a - 1) % _TEMPLATES for a, b in zip(indices, indices[1:]))
+    clocks = [sample.clock for sample in samples]
+    assert clocks == sorted(clocks)
+    return skipped
+
+
+def test_connect():
+    emulator = GloveEmulator(device_id=7, label='LEFT', firmware=(2, 1, 3))
+    with Glove(FakeSerial(emulator)) as glove:
+        assert (glove.device_id, glove.label, glove.firmware) == (7, 'LEFT', '2.1.3')
+        glove.label = 'RIGHT'
+        assert glove.label == 'RIGHT'
+        assert emulator.label == 'RIGHT'
+
+
+@pytest.mark.parametrize('raw', [False, True], ids=['quaternion', 'raw_imu'])
+def test_sampling(raw):
+    emulator = GloveEmulator(device_id=3, rate=None)
+    with Glove(FakeSerial(emulator)) as glove, glove.sampling(raw) as samples:
+        received = [sample for _, sample in zip(range(300), samples)]
+    assert _skipped_packets(received, _templates(3, raw)) == 0
+    assert glove.corrupted_packets == 0
+    assert not emulator.sampling
+
+
+@pytest.mark.parametrize('corrupt_rate, truncate_rate', [(0.1, 0.0), (0.0, 0.1), (0.1, 0.1)],
+                         ids=['corrupt', 'truncate', 'both'])
+def test_sampling_skips_damaged_packets(corrupt_rate, truncate_rate):
+    emulator = GloveEmulator(rate=None, corrupt_rate=corrupt_rate,
+                             truncate_rate=truncate_rate, seed=1)
+    with Glove(FakeSerial(emulator)) as glove, glove.sampling() as samples:
+        received = [sample for _, sample in zip(range(1000), samples)]
+    damaged = emulator.corrupted + emulator.truncated
+    assert damaged > 0
+    assert glove.corrupted_packets > 0
+    # the packets produced after the last received sample are still buffered
+    skipped = _skipped_packets(received, _templates(1, False))
+    assert 0 < skipped <= damaged
+    assert len(received) + skipped <= emulator.samples
+
+
+def test_read_timeout_on_stall():
+    emulator = GloveEmulator(rate=1000.0, stall_rate=1.0, stall_duration=10.0, seed=0)
+    with Glove(FakeSerial(emulator, timeout=0.05)) as glove, glove.sampling() as samples:
+        with pytest.raises(GloveTimeoutError):
+            next(samples)
+    assert emulator.stalls == 1
+
+
+def test_reader_drains_the_glove():
+    emulator = GloveEmulator(rate=None, corrupt_rate=0.05, truncate_rate=0.05, seed=2)
+    with Glove(FakeSerial(emulator)) as glove:
+        with GloveReader(glove, queue_size=16, block=True) as reader:
+            received = [reader.get(timeout=2.0) for _ in range(500)]
+        glove.stop_sampling()
+        assert reader.received >= 500
+        assert reader.dropped == 0
+        assert reader.corrupted > 0
+    assert _skipped_packets(received, _templates(1, False)) > 0
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='pseudo terminals are POSIX only')
+def test_sampling_through_pty():
+    emulator = GloveEmulator(device_id=5, rate=1000.0, corrupt_rate=0.05, truncate_rate=0.05,
+                             seed=3)
+    with EmulatorPty(emulator) as pty, Glove(pty.port) as glove:
+        assert glove.device_id == 5
+        with glove.sampling() as samples:
+            received = [sample for _, sample in zip(range(300), samples)]
+        assert glove.corrupted_packets > 0
+    assert _skipped_packets(received, _templates(5, False)) > 0
@@ -0,0 +1,142 @@
+"""Tests of the packet framing and the sample decoding."""
+
+import dataclasses
+import random
+import struct
+
+import pytest
+
+import vmg30.protocol
+from vmg30.data import GloveSample
+from vmg30.protocol import PacketFramer, SampleDecoder, decode_sample, encode_packet, \
+    encode_sample
+from vmg30.tools.bench import StreamPort, make_payload, reference_decode
+
+
+def _packets(framer):
+    packets = []
+    while True:
+        packet = framer.next_packet()
+        if packet is None:
+            return packets
+        packets.append((packet[0], bytes(packet[1])))
+
+
+def test_framer_extracts_packets():
+    framer = PacketFramer()
+    framer.feed(encode_packet(0x0A, b'abc') + encode_packet(0x11) + encode_packet(0x60, b'x'))
+    assert _packets(framer) == [(0x0A, b'abc'), (0x11, b''), (0x60, b'x')]
+    assert (framer.corrupted, framer.resyncs, framer.pending) == (0, 0, 0)
+
+
+def test_framer_resyncs_after_garbage():
+    framer = PacketFramer()
+    framer.feed(b'\x00\x01garbage' + encode_packet(0x0A, b'abc') + b'\x23\x23' +
+                encode_packet(0x11, b'de'))
+    assert _packets(framer) == [(0x0A, b'abc'), (0x11, b'de')]
+    assert framer.resyncs == 2
+    assert framer.corrupted == 0
+
+
+@pytest.mark.parametrize('damage', [-2, -1], ids=['checksum', 'end_byte'])
+def test_framer_skips_damaged_packet(damage):
+    damaged = bytearray(encode_packet(0x0A, b'abc'))
+    damaged[damage] ^= 0x01
+    framer = PacketFramer()
+    framer.feed(bytes(damaged) + encode_packet(0x11, b'de'))
+    assert _packets(framer) == [(0x11, b'de')]
+    assert framer.corrupted == 1
+
+
+def test_framer_checksum_of_longest_packet():
+    payload = b'\xff' * 253  # the length byte is 255
+    packet = encode_packet(0xFF, payload)
+    assert packet[-2] == sum(packet[:-2]) & 0xFF
+    framer = PacketFramer()
+    framer.feed(packet)
+    assert _packets(framer) == [(0xFF, payload)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 93, 256])
+def test_framer_reads_packets_split_across_reads(chunk_size):
+    rng = random.Random(chunk_size)
+    payloads = [make_payload(rng, bool(i % 2), i) for i in range(100)]
+    port = StreamPort(b''.join(encode_packet(0x0A, p) for p in payloads), chunk_size)
+    framer = PacketFramer(capacity=512)  # small enough to move the unread bytes around
+    received = []
+    while len(received) < len(payloads):
+        packet = framer.next_packet()
+        if packet is None:
+            assert framer.read_from(port) > 0
+        else:
+            received.append(bytes(packet[1]))
+    assert received == payloads
+    assert framer.corrupted == 0
+
+
+def _extreme_payloads(raw):
+    header = struct.pack('>BHI', 0x03 if raw else 0x01, 0xFFFF, 0xFFFFFFFF)
+    if raw:
+        values = [(struct.pack('>18h', *[v] * 18)) for v in (-0x8000, 0, 0x7FFF)]
+    else:
+        values = [(struct.pack('>8i', *[v] * 8)) for v in (-0x80000000, 0, 0x7FFFFFFF)]
+    sensors = [struct.pack('>24H', *[v] * 24) for v in (0, 999, 0xFFFF)]
+    return [header + v + s for v in values for s in sensors]
+
+
+def _assert_same_sample(sample, expected):
+    assert type(sample) is GloveSample
+    for field in dataclasses.fields(GloveSample):
+        value, reference = getattr(sample, field.name), getattr(expected, field.name)
+        if dataclasses.is_dataclass(reference):
+            assert type(value) is type(reference), field.name
+            for imu_field in dataclasses.fields(reference):
+                assert getattr(value, imu_field.name) == getattr(reference, imu_field.name), \
+                    f'{field.name}.{imu_field.name}'
+        else:
+            assert value == reference, field.name
+            assert type(value) is type(reference), field.name
+
+
+@pytest.mark.parametrize('raw', [False, True], ids=['quaternion', 'raw_imu'])
+def test_decode_matches_reference(raw):
+    rng = random.Random(raw)
+    payloads = [make_payload(rng, raw, rng.randrange(1 << 32)) for _ in range(200)]
+    payloads += _extreme_payloads(raw)
+    for payload in payloads:
+        expected = reference_decode(payload)
+        _assert_same_sample(decode_sample(payload), expected)
+        _assert_same_sample(decode_sample(memoryview(payload + bytes(5))), expected)
+        assert decode_sample(encode_sample(expected)) == expected
+
+
+@pytest.mark.parametrize('raw', [False, True], ids=['quaternion', 'raw_imu'])
+def test_decoder_with_offsets(raw):
+    divisors = [float(500 + i) for i in range(24)]
+    offsets = [i / 100 for i in range(24)]
+    decoder = SampleDecoder(divisors, offsets)
+    payload = make_payload(random.Random(1), raw)
+    sensors = struct.unpack_from('>24H', payload, len(payload) - 48)
+    scaled = [v / d + o for v, d, o in zip(sensors, divisors, offsets)]
+
+    sample = decoder(payload)
+    assert sample.dip_joints == tuple(scaled[0:10:2])
+    assert sample.pip_joints == tuple(scaled[1:10:2])
+    assert sample.palm_arch == scaled[10]
+    assert sample.thumb_cross_over == scaled[12]
+    assert sample.pressures == tuple(1.0 + v for v in scaled[14:19])
+    assert sample.abductions == tuple(scaled[19:23])
+    assert sample.battery_charge == scaled[23]
+    reference = reference_decode(payload)
+    assert (sample.wrist_quat, sample.wrist_imu) == (reference.wrist_quat, reference.wrist_imu)
+
+
+def test_decoder_rejects_changed_sample_class(monkeypatch):
+    @dataclasses.dataclass(frozen=True)
+    class ValidatedSample(GloveSample):
+        def __post_init__(self):
+            pass
+
+    monkeypatch.setattr(vmg30.protocol, 'GloveSample', ValidatedSample)
+    with pytest.raises(TypeError):
+        SampleDecoder()
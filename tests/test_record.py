@@ -0,0 +1,132 @@
+"""Tests of the streaming recording and its clock index."""
+
+import os
+import random
+
+import numpy as np
+import pytest
+
+from vmg30.protocol import decode_sample
+from vmg30.record import INDEX_SUFFIX, RECORD_SIZE, RecordReader, RecordWriter, \
+    is_recording, read_samples
+from vmg30.tools.bench import make_payload
+
+_WRAP = 1 << 32
+_START = _WRAP - 500  # the clock wraps after 50 samples of 10 msec
+
+
+def _write(path, clocks, seed=0):
+    rng = random.Random(seed)
+    payloads = [make_payload(rng, bool(i % 3 == 0), clock % _WRAP)
+                for i, clock in enumerate(clocks)]
+    with RecordWriter(path, chunk_size=16) as writer:
+        for payload in payloads:
+            writer.write_payload(payload)
+        assert writer.count == len(payloads)
+    return payloads
+
+
+def test_write_and_read(tmp_path):
+    path = str(tmp_path / 'glove.rec')
+    payloads = _write(path, range(0, 1000, 10))
+    with open(path, 'ab') as file:
+        file.write(bytes(RECORD_SIZE // 2))  # an incomplete record left by a crash
+    expected = [decode_sample(payload) for payload in payloads]
+
+    assert is_recording(path)
+    assert list(read_samples(path, chunk_size=7)) == expected
+    with RecordReader(path) as reader:
+        assert len(reader) == len(payloads)
+        assert list(reader) == expected
+        assert (reader[0], reader[-1]) == (expected[0], expected[-1])
+        assert list(reader[10:20]) == expected[10:20]
+        assert reader.clock.tolist() == list(range(0, 1000, 10))
+        with pytest.raises(IndexError):
+            reader[len(payloads)]  # pylint: disable=pointless-statement
+
+
+def test_seek_across_clock_wrap(tmp_path):
+    path = str(tmp_path / 'glove.rec')
+    clocks = list(range(_START, _START + 1000, 10))
+    _write(path, clocks)
+    with RecordReader(path) as reader:
+        assert reader.clock[49] > reader.clock[50]  # the stored clock wraps
+        for i, clock in enumerate(clocks):
+            assert reader.seek(clock / 1000) == i
+            assert reader.seek((clock - 5) / 1000) == i
+        assert reader.seek(0.0) == 0
+        assert reader.seek((_START + 1000) / 1000) == len(reader)
+
+        between = reader.between((_WRAP - 100) / 1000, (_WRAP + 100) / 1000)
+        assert between.clock.tolist() == [c % _WRAP for c in range(_WRAP - 100, _WRAP + 100, 10)]
+        assert len(reader.between(start=_WRAP / 1000)) == 50
+        assert len(reader.between(stop=_WRAP / 1000)) == 50
+
+        view = reader[40:60]
+        assert view.seek(_WRAP / 1000) == 10
+        assert view.between(stop=(_WRAP + 50) / 1000).clock.tolist() == \
+            reader[40:55].clock.tolist()
+
+    index = np.load(path + INDEX_SUFFIX)
+    assert index.dtype == np.int64
+    assert index.tolist() == clocks
+
+
+def test_seek_across_reboot(tmp_path):
+    path = str(tmp_path / 'glove.rec')
+    clocks = list(range(5000, 6000, 10)) + list(range(0, 2000, 10))
+    _write(path, clocks)
+    with RecordReader(path) as reader:
+        assert reader.seek(5.5) == 50
+        assert reader.seek(5.99) == 99
+        # the index keeps the maximum, the samples after the reboot are found at its end
+        assert reader.seek(5.995) == len(reader)
+        assert reader.seek(1.0) == 0
+        assert len(reader.between(5.0, 5.99)) == 99
+    index = np.load(path + INDEX_SUFFIX)
+    assert index.tolist() == clocks[:100] + [5990] * 200
+
+
+def test_reboot_after_wrap(tmp_path):
+    path = str(tmp_path / 'glove.rec')
+    clocks = list(range(_START, _START + 1000, 10)) + list(range(0, 500, 10))
+    _write(path, clocks)
+    with RecordReader(path) as reader:
+        assert reader.seek((_START + 990) / 1000) == 99
+        assert reader.seek((_START + 995) / 1000) == len(reader)
+    index = np.load(path + INDEX_SUFFIX)
+    assert index.tolist() == clocks[:100] + [_START + 990] * 50
+
+
+def test_index_of_appended_recording(tmp_path):
+    path = str(tmp_path / 'glove.rec')
+    clocks = list(range(_START, _START + 1000, 10))
+    _write(path, clocks[:60])  # past the wrap
+    with RecordReader(path) as reader:
+        assert reader.seek(_WRAP / 1000) == 50
+
+    _write(path, clocks + list(range(0, 300, 10)))  # the same recording continued
+    with RecordReader(path) as reader:
+        assert reader.seek(_WRAP / 1000) == 50
+        assert reader.seek((_WRAP + 485) / 1000) == 99
+        assert reader.seek((_WRAP + 495) / 1000) == len(reader)
+    appended = np.load(path + INDEX_SUFFIX)
+    os.remove(path + INDEX_SUFFIX)
+    with RecordReader(path) as reader:
+        reader.seek(0.0)
+    assert appended.tolist() == np.load(path + INDEX_SUFFIX).tolist()
+    assert appended.tolist() == clocks + [_START + 990] * 30
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'glove.rec')
+    _write(path, range(_START, _START + 1000, 10))
+    np.save(path + INDEX_SUFFIX, np.arange(100, dtype=np.uint32))  # an old index format
+    with RecordReader(path) as reader:
+        assert reader.seek(_WRAP / 1000) == 50
+    assert np.load(path + INDEX_SUFFIX).dtype == np.int64
+
+    _write(path, range(1000, 2000, 10))  # overwritten by another recording
+    with RecordReader(path) as reader:
+        assert reader.seek(1.5) == 50
+    assert np.load(path + INDEX_SUFFIX).tolist() == list(range(1000, 2000, 10))
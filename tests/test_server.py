@@ -0,0 +1,83 @@
+"""Tests of the glove server and its client against emulated Wi-Fi gloves."""
+
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from vmg30.emulator import EmulatorServer, GloveEmulator
+from vmg30.error import GloveError
+from vmg30.server import GloveClient, GloveServer, socket_path
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason='the command socket is a Unix one')
+
+
+@pytest.fixture
+def served():
+    emulators = [EmulatorServer(GloveEmulator(device_id=i, rate=1000.0)) for i in (1, 2)]
+    for emulator in emulators:
+        emulator.start()
+    server = GloveServer([emulator.url for emulator in emulators],
+                         name=f'vmg30-test-{os.getpid()}', capacity=256)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.close()
+    for emulator in emulators:
+        emulator.stop()
+
+
+def _replies(sock, count):
+    lines = sock.makefile('rb')
+    return [json.loads(lines.readline()) for _ in range(count)]
+
+
+def test_sampling(served):
+    with GloveClient(served.name, device_id=2) as client, client.sampling() as samples:
+        received = [sample for _, sample in zip(range(100), samples)]
+    assert {sample.device_id for sample in received} == {2}
+    clocks = [sample.clock for sample in received]
+    assert clocks == sorted(clocks)
+
+
+def test_calibration(served):
+    with GloveClient(served.name, device_id=1) as client, GloveClient(served.name) as other:
+        assert list(client.calibration()) == [0, 25, 50, 75, 100]
+        with client.sampling() as samples, other.sampling() as other_samples:
+            assert next(samples).device_id == 1
+            assert next(other_samples).device_id == 1
+
+
+def test_replies_are_not_interleaved(served):
+    # the stages are sent by the calibration thread while the loop answers the commands
+    requests = [dict(command='calibration', device_id=1)]
+    requests += [dict(command='set_vibro_feedback', device_id=1, levels=[0.5] * 5)] * 200
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5.0)
+        sock.connect(socket_path(served.name))
+        sock.sendall(b''.join(json.dumps(r).encode() + b'\n' for r in requests))
+        replies = _replies(sock, 205)
+    assert [reply['stage'] for reply in replies if 'stage' in reply] == [0, 25, 50, 75, 100]
+    assert replies.count(dict(done=True)) == 200
+
+
+def test_unexpected_calibration_error_is_reported(served, monkeypatch):
+    glove = served.gloves[0]
+
+    def calibration():
+        yield 0
+        raise RuntimeError('firmware bug')
+
+    monkeypatch.setattr(glove, 'calibration', calibration)
+    with GloveClient(served.name, device_id=1) as client:
+        stages = client.calibration()
+        assert next(stages) == 0
+        with pytest.raises(GloveError, match='RuntimeError: firmware bug'):
+            next(stages)
+        # the glove is back in the loop
+        with client.sampling() as samples:
+            assert next(samples).device_id == 1
@@ -0,0 +1,50 @@
+"""Tests of the instrumentation statistics."""
+
+import pytest
+
+from vmg30 import stats
+from vmg30.emulator import FakeSerial, GloveEmulator
+from vmg30.error import GloveTimeoutError
+from vmg30.glove import Glove
+from vmg30.model import HandModel
+
+
+@pytest.fixture
+def measured():
+    try:
+        yield stats.enable(stats.Stats())
+    finally:
+        stats.disable()
+
+
+def test_sampling_is_measured(measured):
+    emulator = GloveEmulator(rate=None, corrupt_rate=0.1, seed=1)
+    with Glove(FakeSerial(emulator)) as glove, glove.sampling() as samples:
+        for _, _ in zip(range(200), samples):
+            pass
+    assert measured.histograms['glove.next_sample'].count == 200
+    assert measured.histograms['glove.jitter'].count == 200
+    assert measured.counters['glove.corrupted'] > 0
+
+
+def test_failures_are_measured(measured):
+    emulator = GloveEmulator(rate=1000.0, stall_rate=1.0, stall_duration=10.0, seed=0)
+    with Glove(FakeSerial(emulator, timeout=0.05)) as glove, glove.sampling() as samples:
+        with pytest.raises(GloveTimeoutError):
+            next(samples)
+    assert measured.histograms['glove.next_sample'].count == 1
+    assert measured.histograms['glove.next_sample'].min >= 50e6
+    assert measured.counters['glove.timeouts'] == 1
+    assert measured.histograms['glove.jitter'].count == 0
+
+    with pytest.raises(AttributeError):
+        HandModel().angles(None)
+    assert measured.histograms['model.angles'].count == 1
+
+
+def test_disable_restores_the_methods():
+    angles = HandModel.angles
+    stats.enable(stats.Stats())
+    assert HandModel.angles is not angles
+    stats.disable()
+    assert HandModel.angles is angles
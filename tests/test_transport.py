@@ -0,0 +1,126 @@
+"""Tests of the glove connection transports against the emulated Wi-Fi glove."""
+
+import struct
+import time
+
+import pytest
+import serial
+
+import vmg30.transport
+from vmg30.emulator import EmulatorServer, GloveEmulator
+from vmg30.error import GloveConnectionError
+from vmg30.glove import Glove
+from vmg30.protocol import PacketFramer, encode_packet
+from vmg30.transport import SocketTransport, UdpTransport, open_transport
+
+from test_glove import _skipped_packets, _templates
+
+_INFO_REPLY = encode_packet(0x0C, struct.pack('>BBHIIIBB', 0x01, 0x00, 9, 0, 0, 0, 1, 0))
+
+
+def _wait_in_waiting(transport, size, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while transport.in_waiting < size and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return transport.in_waiting
+
+
+def test_open_transport_by_scheme():
+    with EmulatorServer(kind='tcp') as server:
+        transport = open_transport(server.url, timeout=0.5)
+        try:
+            assert isinstance(transport, SocketTransport)
+            assert (transport.name, transport.timeout) == (server.url, 0.5)
+        finally:
+            transport.close()
+    with EmulatorServer(kind='udp') as server:
+        transport = open_transport(server.url + '?local_port=0', timeout=0.5)
+        try:
+            assert isinstance(transport, UdpTransport)
+            assert (transport.name, transport.timeout) == (server.url, 0.5)
+        finally:
+            transport.close()
+
+
+def test_open_transport_falls_back_to_serial():
+    transport = open_transport('loop://', timeout=0.5)
+    try:
+        assert isinstance(transport, serial.SerialBase)
+        assert (transport.baudrate, transport.timeout, transport.write_timeout) == \
+            (230400, 0.5, 0.5)
+        transport.write(b'\x24\x0c\x02\x0e\x23')
+        buffer = bytearray(16)
+        assert buffer[:transport.readinto(buffer)] == b'\x24\x0c\x02\x0e\x23'
+    finally:
+        transport.close()
+
+
+@pytest.mark.parametrize('kind', ['tcp', 'udp'])
+def test_in_waiting(kind):
+    with EmulatorServer(GloveEmulator(device_id=9), kind=kind) as server:
+        transport = open_transport(server.url)
+        try:
+            assert transport.in_waiting == 0
+            transport.write(encode_packet(0x0C))
+            assert _wait_in_waiting(transport, len(_INFO_REPLY)) == len(_INFO_REPLY)
+            buffer = bytearray(256)
+            assert buffer[:transport.readinto(buffer)] == _INFO_REPLY
+            assert transport.in_waiting == 0
+            transport.timeout = 0.05
+            assert transport.readinto(buffer) == 0
+        finally:
+            transport.close()
+
+
+@pytest.mark.parametrize('kind', ['tcp', 'udp'])
+def test_in_waiting_without_fionread(kind, monkeypatch):
+    monkeypatch.setattr(vmg30.transport, 'fcntl', None)
+    with EmulatorServer(GloveEmulator(device_id=9), kind=kind) as server:
+        transport = open_transport(server.url)
+        try:
+            transport.write(encode_packet(0x0C))
+            assert _wait_in_waiting(transport, 1, timeout=0.2) == 0
+            buffer = bytearray(256)
+            assert buffer[:transport.readinto(buffer)] == _INFO_REPLY
+        finally:
+            transport.close()
+
+
+def test_udp_datagram_read_in_parts():
+    with EmulatorServer(GloveEmulator(device_id=9), kind='udp') as server:
+        transport = open_transport(server.url)
+        try:
+            transport.write(encode_packet(0x0C))
+            assert _wait_in_waiting(transport, len(_INFO_REPLY)) == len(_INFO_REPLY)
+            buffer = bytearray(8)
+            parts = []
+            while sum(map(len, parts)) < len(_INFO_REPLY):
+                parts.append(bytes(buffer[:transport.readinto(buffer)]))
+                assert transport.in_waiting == len(_INFO_REPLY) - sum(map(len, parts))
+            assert [len(part) for part in parts] == [8, 8, len(_INFO_REPLY) - 16]
+            assert b''.join(parts) == _INFO_REPLY
+        finally:
+            transport.close()
+
+
+def test_tcp_closed_connection():
+    server = EmulatorServer(kind='tcp')
+    with server:
+        transport = open_transport(server.url)
+    try:
+        with pytest.raises(GloveConnectionError):
+            PacketFramer().read_from(transport)
+    finally:
+        transport.close()
+
+
+@pytest.mark.parametrize('kind', ['tcp', 'udp'])
+@pytest.mark.parametrize('raw', [False, True], ids=['quaternion', 'raw_imu'])
+def test_sampling_over_network(kind, raw):
+    emulator = GloveEmulator(device_id=4, rate=1000.0)
+    with EmulatorServer(emulator, kind=kind) as server, Glove(server.url) as glove:
+        assert glove.device_id == 4
+        with glove.sampling(raw) as samples:
+            received = [sample for _, sample in zip(range(300), samples)]
+        assert glove.corrupted_packets == 0
+    assert _skipped_packets(received, _templates(4, raw)) == 0
@@ -1,7 +1,70 @@
-"""Client for VMG30 glove from Virtual Motion Lab."""
+"""Client for VMG30 glove from Virtual Motion Lab.
 
-from .data import GloveSample
-from .error import GloveError, GlovePacketError, GloveTimeoutError
-from .glove import Glove
-from .model import HandModel
-from .view import HandView
+Classes are imported from their modules at the first access, so `from vmg30 import Glove`
+loads only pyserial while the hand model (numpy) and the view (panda3d_viewer) are loaded
+when used.
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+_LAZY_ATTRIBUTES = {
+    'AsyncGlove': 'aio',
+    'ClockSync': 'clock',
+    'CompactSample': 'data',
+    'GloveEvent': 'data',
+    'GloveSample': 'data',
+    'HubFrame': 'data',
+    'TimedSample': 'data',
+    'GloveError': 'error',
+    'GlovePacketError': 'error',
+    'GloveTimeoutError': 'error',
+    'EventPipeline': 'events',
+    'Hysteresis': 'events',
+    'Rolling': 'events',
+    'Signal': 'events',
+    'ColumnReader': 'export',
+    'ColumnWriter': 'export',
+    'SampleFilter': 'filter',
+    'Glove': 'glove',
+    'HapticScheduler': 'haptics',
+    'GloveHub': 'hub',
+    'HandModel': 'model',
+    'PoseIndex': 'pose_index',
+    'GloveReader': 'reader',
+    'GloveClient': 'server',
+    'GloveServer': 'server',
+    'HandView': 'view',
+}
+
+__all__ = tuple(_LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from .aio import AsyncGlove
+    from .clock import ClockSync
+    from .data import CompactSample, GloveEvent, GloveSample, HubFrame, TimedSample
+    from .error import GloveError, GlovePacketError, GloveTimeoutError
+    from .events import EventPipeline, Hysteresis, Rolling, Signal
+    from .export import ColumnReader, ColumnWriter
+    from .filter import SampleFilter
+    from .glove import Glove
+    from .haptics import HapticScheduler
+    from .hub import GloveHub
+    from .model import HandModel
+    from .pose_index import PoseIndex
+    from .reader import GloveReader
+    from .server import GloveClient, GloveServer
+    from .view import HandView
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value  # the next access skips __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
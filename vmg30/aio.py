@@ -0,0 +1,382 @@
+"""This module contains the asyncio virtual motion glove interface."""
+
+import asyncio
+import collections
+import ipaddress
+import os
+import struct
+from typing import AsyncIterator, Optional, Sequence, TYPE_CHECKING
+
+import serial
+
+from .data import GloveSample
+from .error import GloveConnectionError, GloveError, GloveTimeoutError
+from .protocol import PacketFramer, decode_sample, encode_packet
+
+if TYPE_CHECKING:  # numpy is loaded only when a profile is used
+    from .calibration import CalibrationProfile
+
+__all__ = ('AsyncGlove')
+
+
+_READ_SIZE = 1024
+
+
+class AsyncGlove:
+    """Virtual motion glove (VMG30) asyncio interface.
+
+    The serial device is read by the event loop reader callback (POSIX only), packets are
+    dispatched by type: samples go to a bounded queue, command replies resolve the awaiting
+    command. So commands can be executed concurrently while sampling is running. Commands are
+    written without blocking the loop: what the device does not take at once is buffered and
+    written by the loop writer callback.
+    """
+
+    def __init__(self, port: str = '/dev/ttyUSB0', queue_size: int = 256, timeout: float = 2.0):
+        """Set up the glove, await connect() or use it as an async context guard to connect.
+
+        Keyword Arguments:
+            port {str} -- serial device name (default: {'/dev/ttyUSB0'})
+            queue_size {int} -- maximum number of queued samples (default: {256})
+            timeout {float} -- command reply timeout, sec (default: {2.0})
+        """
+        self._port = port
+        self._timeout = timeout
+        self._conn = None
+        self._loop = None
+        self._framer = PacketFramer()
+        self._output = bytearray()
+        self._output_since = None
+        self._replies = collections.defaultdict(collections.deque)
+        self._samples = collections.deque(maxlen=queue_size)
+        self._sample_ready = None
+        self._calibration = None
+        self._dropped = 0
+        self._profile = None
+        self._decode = decode_sample
+
+    async def connect(self) -> None:
+        """Connect to the glove and read its configuration."""
+        self._loop = asyncio.get_running_loop()
+        self._sample_ready = asyncio.Event()
+        try:
+            self._conn = serial.Serial(self._port, baudrate=230400, timeout=0, write_timeout=0)
+            self._loop.add_reader(self._conn.fileno(), self._on_readable)
+
+            await self.stop_sampling()
+
+            self._label = bytes(await self._exec(0x11)).decode().split('\0', 1)[0]
+            self._firmware = '{}.{}.{}'.format(*await self._exec(0x13))
+
+            info = struct.unpack('>BBHIIIBB', await self._exec(0x0C))
+            self._device_type = info[0]
+            self._device_id = info[2]
+            self._address = ipaddress.ip_address(info[3])
+            self._netmask = ipaddress.ip_address(info[4])
+            self._gateway = ipaddress.ip_address(info[5])
+            self._dhcp = info[6]
+
+        except serial.SerialException as ex:
+            raise GloveConnectionError(ex.strerror)
+        except GloveTimeoutError:
+            self.disconnect()
+            raise GloveConnectionError(
+                f'The glove on "{self._port}" is not responding, ensure it is turned on.')
+
+    @property
+    def device_id(self) -> int:
+        """Device identificator.
+
+        Returns:
+            int -- id
+        """
+        return self._device_id
+
+    async def set_device_id(self, device_id: int) -> None:
+        """Update device identificator.
+
+        Arguments:
+            device_id {int} -- new id
+        """
+        echo = await self._exec(0x0D, struct.pack('>H', device_id))
+        self._device_id, = struct.unpack('>H', echo)
+
+    @property
+    def label(self) -> str:
+        """Device string identificator.
+
+        Returns:
+            str -- label
+        """
+        return self._label
+
+    async def set_label(self, label: str) -> None:
+        """Update label.
+
+        Arguments:
+            label {str} -- new label
+        """
+        echo = await self._exec(0x11, struct.pack('16s', label.ljust(16, '\0').encode()))
+        self._label = echo.decode().split('\0', 1)[0]
+
+    @property
+    def firmware(self) -> str:
+        """Firmware version.
+
+        Returns:
+            str -- version string x.y.z
+        """
+        return self._firmware
+
+    @property
+    def has_wifi_module(self) -> bool:
+        """Device has WIFI module.
+
+        Returns:
+            bool -- True if has module
+        """
+        return self._device_type == 0x02
+
+    @property
+    def corrupted_packets(self) -> int:
+        """Number of damaged packets skipped since connection.
+
+        Returns:
+            int -- packets count
+        """
+        return self._framer.corrupted
+
+    @property
+    def calibration_profile(self) -> Optional['CalibrationProfile']:
+        """Sensors normalization applied to decoded samples.
+
+        Returns:
+            Optional[CalibrationProfile] -- profile, None for the firmware normalization
+        """
+        return self._profile
+
+    @calibration_profile.setter
+    def calibration_profile(self, profile: Optional['CalibrationProfile']) -> None:
+        """Set sensors normalization applied to decoded samples.
+
+        Arguments:
+            profile {Optional[CalibrationProfile]} -- profile, None for the firmware one
+        """
+        self._profile = profile
+        self._decode = decode_sample if profile is None else profile.decoder
+
+    @property
+    def dropped_samples(self) -> int:
+        """Number of samples dropped because the queue was full.
+
+        Returns:
+            int -- samples count
+        """
+        return self._dropped
+
+    async def calibration(self) -> AsyncIterator[int]:
+        """Start self calibration of the dataglove orientation module.
+
+        Yields:
+            int -- calibration status (from 0 to 100)
+        """
+        self._calibration = asyncio.Queue()
+        try:
+            self._send(0x31)
+            stage = 0
+            while stage != 100:
+                try:
+                    stage = await asyncio.wait_for(self._calibration.get(), self._timeout)
+                except asyncio.TimeoutError:
+                    raise GloveTimeoutError('Read timeout')
+                if stage == 255:
+                    raise GloveError('IMU calibration failed')
+                yield stage
+        finally:
+            self._calibration = None
+
+    async def start_sampling(self, raw=False) -> None:
+        """Start data sampling.
+
+        Keyword Arguments:
+            raw {bool} -- return IMU data instead of quaternions (default: {False})
+        """
+        self._send(0x0A, bytes([0x03 if raw else 0x01]))
+
+    async def stop_sampling(self) -> None:
+        """Stop data sampling."""
+        self._send(0x0A, bytes([0x00]))
+        await asyncio.sleep(0.1)
+        self._send(0x0B)
+        await asyncio.sleep(0.1)
+        self._samples.clear()
+
+    async def next_sample(self) -> GloveSample:
+        """Receive next sample."""
+        while not self._samples:
+            self._sample_ready.clear()
+            try:
+                await asyncio.wait_for(self._sample_ready.wait(), self._timeout)
+            except asyncio.TimeoutError:
+                raise GloveTimeoutError('Read timeout')
+        return self._samples.popleft()
+
+    def sampling(self, raw=False) -> '_Sampling':
+        """Start data sampling.
+
+        Use either as an async iterator or as an async context guard returning the iterator,
+        the latter stops sampling at exit.
+
+        Keyword Arguments:
+            raw {bool} -- return IMU data instead of quaternions (default: {False})
+        """
+        return _Sampling(self, raw)
+
+    def set_vibro_feedback(self, levels: Sequence[float]) -> None:
+        """Set vibrotactile feedback.
+
+        Arguments:
+            levels {Sequence[float]} -- vibro intensity on tips of the fingers [0..1]
+        """
+        values = [round(min(max(i, 0.0), 1.0) * 140) + 110 for i in levels]
+        self._send(0x60, bytes(values + [0x00]))
+
+    def reboot(self) -> None:
+        """Reboot the dataglove."""
+        self._send(0x0E)
+
+    def turn_off(self) -> None:
+        """Turn off the dataglove."""
+        self._send(0x40)
+        self.disconnect()
+
+    def disconnect(self) -> None:
+        """Close connection."""
+        if self._conn is None:
+            return
+        self._loop.remove_reader(self._conn.fileno())
+        if self._output:
+            self._loop.remove_writer(self._conn.fileno())
+            self._output.clear()
+        self._conn.close()
+        self._conn = None
+        for replies in self._replies.values():
+            for reply in replies:
+                reply.cancel()
+        self._replies.clear()
+
+    async def __aenter__(self):
+        """Connect the glove at context guard enter.
+
+        Returns:
+            AsyncGlove -- this glove
+        """
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        """Disconnect the glove at context guard exit."""
+        self.disconnect()
+
+    def __repr__(self):
+        """String representation.
+
+        Returns:
+            str -- string representing the glove
+        """
+        return f'AsyncGlove(port="{self._port}", id={self.device_id}, label="{self.label}")'
+
+    def _on_readable(self) -> None:
+        try:
+            count = os.readv(self._conn.fileno(), [self._framer.reserve(_READ_SIZE)])
+        except BlockingIOError:
+            return
+        if not count:
+            self.disconnect()
+            return
+        self._framer.commit(count)
+
+        while True:
+            packet = self._framer.next_packet()
+            if packet is None:
+                break
+            package_type, package_data = packet
+            if package_type == 0x0A:
+                if len(self._samples) == self._samples.maxlen:
+                    self._dropped += 1
+                self._samples.append(self._decode(package_data))
+                self._sample_ready.set()
+            elif package_type == 0x31 and self._calibration is not None:
+                self._calibration.put_nowait(package_data[0])
+            else:
+                replies = self._replies.get(package_type)
+                while replies:
+                    reply = replies.popleft()
+                    if not reply.done():
+                        reply.set_result(bytes(package_data))
+                        break
+
+    def _on_writable(self) -> None:
+        try:
+            count = os.write(self._conn.fileno(), self._output)
+        except BlockingIOError:
+            return
+        del self._output[:count]
+        self._output_since = self._loop.time()
+        if not self._output:
+            self._loop.remove_writer(self._conn.fileno())
+
+    def _send(self, package_type: int, package_data: bytes = None) -> int:
+        package = encode_packet(package_type, package_data)
+        if self._output:
+            # the device has not taken anything for the timeout, it is not reading
+            if self._loop.time() - self._output_since > self._timeout:
+                raise GloveTimeoutError('Write timeout')
+            self._output += package
+            return len(package)
+        try:
+            count = os.write(self._conn.fileno(), package)
+        except BlockingIOError:
+            count = 0
+        if count < len(package):
+            self._output += package[count:]
+            self._output_since = self._loop.time()
+            self._loop.add_writer(self._conn.fileno(), self._on_writable)
+        return len(package)
+
+    async def _exec(self, package_type: int, package_data: bytes = None) -> bytes:
+        reply = self._loop.create_future()
+        self._replies[package_type].append(reply)
+        self._send(package_type, package_data)
+        try:
+            return await asyncio.wait_for(reply, self._timeout)
+        except asyncio.TimeoutError:
+            raise GloveTimeoutError('Read timeout')
+
+
+class _Sampling:
+    """Sampling session of AsyncGlove."""
+
+    def __init__(self, glove: AsyncGlove, raw: bool):
+        self._glove = glove
+        self._raw = raw
+        self._started = False
+
+    async def __aenter__(self):
+        await self._start()
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        await self._glove.stop_sampling()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> GloveSample:
+        await self._start()
+        return await self._glove.next_sample()
+
+    async def _start(self):
+        if not self._started:
+            self._started = True
+            await self._glove.start_sampling(self._raw)
@@ -0,0 +1,222 @@
+"""This module contains vectorized decoding of many glove samples at once."""
+
+from typing import List, Sequence
+
+import numpy as np
+
+from .data import GloveSample, IMUSample
+from .protocol import SENSOR_DIVISORS, PacketFramer
+
+__all__ = ('SAMPLE_DTYPE', 'decode_packets', 'decode_payloads', 'from_samples', 'to_samples')
+
+
+IMU_DTYPE = np.dtype([
+    ('angular_velocity', np.float64, (3,)),
+    ('acceleration', np.float64, (3,)),
+    ('magnetic_field', np.float64, (3,)),
+])
+
+SAMPLE_DTYPE = np.dtype([
+    ('device_id', np.uint16),
+    ('clock', np.float64),
+    ('wrist_imu', IMU_DTYPE),
+    ('hand_imu', IMU_DTYPE),
+    ('wrist_quat', np.float64, (4,)),
+    ('hand_quat', np.float64, (4,)),
+    ('pip_joints', np.float64, (5,)),
+    ('dip_joints', np.float64, (5,)),
+    ('palm_arch', np.float64),
+    ('thumb_cross_over', np.float64),
+    ('abductions', np.float64, (4,)),
+    ('pressures', np.float64, (5,)),
+    ('battery_charge', np.float64),
+])
+
+MAX_PAYLOAD_SIZE = 91
+
+_SENSOR_DIVISORS = np.array(SENSOR_DIVISORS, float)
+
+
+def _payload_dtype(value_type: str, count: int) -> np.dtype:
+    return np.dtype({
+        'names': ['sample_type', 'device_id', 'clock', 'values', 'sensors'],
+        'formats': [np.uint8, '>u2', '>u4', (value_type, (count,)), ('>u2', (24,))],
+        'offsets': [0, 1, 3, 7, 7 + np.dtype(value_type).itemsize * count],
+    })
+
+
+_QUAT_PAYLOAD_DTYPE = _payload_dtype('>i4', 8)
+_RAW_PAYLOAD_DTYPE = _payload_dtype('>i2', 18)
+
+
+def decode_payloads(buffer, stride: int, offset: int = 0, count: int = None,
+                    profile=None) -> np.ndarray:
+    """Decode sample payloads placed in a buffer at a fixed stride.
+
+    Arguments:
+        buffer {buffer} -- any object exposing the buffer interface
+        stride {int} -- distance between payloads in bytes
+
+    Keyword Arguments:
+        offset {int} -- offset of the first payload (default: {0})
+        count {int} -- number of payloads (default: {as many as fit the buffer})
+        profile {CalibrationProfile} -- sensors normalization (default: {firmware one})
+
+    Returns:
+        np.ndarray -- decoded samples of SAMPLE_DTYPE, absent fields are NaN
+    """
+    data = np.frombuffer(buffer, np.uint8)
+    if count is None:
+        count = max(len(data) - offset - _QUAT_PAYLOAD_DTYPE.itemsize, -stride) // stride + 1
+    samples = np.empty(count, SAMPLE_DTYPE)
+    if not count:
+        return samples
+
+    if profile is None:
+        divisors, offsets = _SENSOR_DIVISORS, None
+    else:
+        divisors, offsets = profile.divisors, profile.offsets
+
+    raw = data[offset::stride][:count] == 0x03
+    for dtype, mask in ((_QUAT_PAYLOAD_DTYPE, ~raw), (_RAW_PAYLOAD_DTYPE, raw)):
+        if not mask.any():
+            continue
+        # strided view on the payloads, no bytes are copied
+        payloads = np.ndarray((count,), dtype, data, offset, (stride,))
+        if not mask.all():
+            payloads = payloads[mask]
+        target = samples[mask] if not mask.all() else samples
+        values = payloads['values']
+        if dtype is _RAW_PAYLOAD_DTYPE:
+            for name, part in (('wrist_imu', values[:, :9]), ('hand_imu', values[:, 9:])):
+                target[name]['angular_velocity'] = part[:, 0:3] / 0x8000 * 10
+                target[name]['acceleration'] = part[:, 3:6] / 0x8000 * 4
+                target[name]['magnetic_field'] = part[:, 6:9]
+            target['wrist_quat'] = target['hand_quat'] = np.nan
+        else:
+            for name in IMU_DTYPE.names:
+                target['wrist_imu'][name] = target['hand_imu'][name] = np.nan
+            target['wrist_quat'] = values[:, :4] / 0x10000
+            target['hand_quat'] = values[:, 4:] / 0x10000
+
+        # all sensors are normalized at once, pressures are inverted by negative divisors
+        sensors = payloads['sensors'] / divisors
+        if offsets is not None:
+            sensors += offsets
+        target['device_id'] = payloads['device_id']
+        target['clock'] = payloads['clock'] / 1000
+        target['pip_joints'] = sensors[:, 1:10:2]
+        target['dip_joints'] = sensors[:, 0:10:2]
+        target['palm_arch'] = sensors[:, 10]
+        target['thumb_cross_over'] = sensors[:, 12]
+        target['pressures'] = 1.0 + sensors[:, 14:19]
+        target['abductions'] = sensors[:, 19:23]
+        target['battery_charge'] = sensors[:, 23]
+        if target is not samples:
+            samples[mask] = target
+    return samples
+
+
+def decode_packets(buffer, profile=None) -> np.ndarray:
+    """Decode concatenated sample (0x0A) packets.
+
+    A stream of equally sized valid packets is decoded in place. Otherwise packets are
+    extracted one by one, damaged packets and packets of other types are skipped.
+
+    Arguments:
+        buffer {buffer} -- any object exposing the buffer interface
+
+    Keyword Arguments:
+        profile {CalibrationProfile} -- sensors normalization (default: {firmware one})
+
+    Returns:
+        np.ndarray -- decoded samples of SAMPLE_DTYPE, absent fields are NaN
+    """
+    data = np.frombuffer(buffer, np.uint8)
+    if len(data) >= 5:
+        size = int(data[2]) + 3
+        if len(data) % size == 0 and size - 5 >= _QUAT_PAYLOAD_DTYPE.itemsize:
+            frames = data.reshape(-1, size)
+            checksums = frames[:, :-2].sum(axis=1, dtype=np.uint32) % 256
+            if np.all(frames[:, 0] == 0x24) and np.all(frames[:, 1] == 0x0A) and \
+                    np.all(frames[:, 2] == size - 3) and np.all(frames[:, -1] == 0x23) and \
+                    np.all(frames[:, -2] == checksums):
+                return decode_payloads(data, size, offset=3, profile=profile)
+
+    framer = PacketFramer(capacity=max(len(data), 1024))
+    framer.feed(data)
+    records = bytearray()
+    while True:
+        packet = framer.next_packet()
+        if packet is None:
+            break
+        package_type, payload = packet
+        if package_type == 0x0A and len(payload) >= _QUAT_PAYLOAD_DTYPE.itemsize:
+            records += payload[:MAX_PAYLOAD_SIZE]
+            records += bytes(MAX_PAYLOAD_SIZE - len(payload))
+    return decode_payloads(records, MAX_PAYLOAD_SIZE, profile=profile)
+
+
+def to_samples(samples: np.ndarray) -> List[GloveSample]:
+    """Convert decoded samples to GloveSample objects.
+
+    Arguments:
+        samples {np.ndarray} -- array of SAMPLE_DTYPE
+
+    Returns:
+        List[GloveSample] -- samples
+    """
+    def column(values):
+        values = values.tolist()
+        return list(map(tuple, values)) if values and isinstance(values[0], list) else values
+
+    def imu_column(imu):
+        fields = zip(*(column(imu[name]) for name in IMU_DTYPE.names))
+        return [IMUSample(*values) if flag else None for flag, values in zip(raw, fields)]
+
+    raw = np.isnan(samples['wrist_quat'][:, 0]).tolist()
+    columns = {name: column(samples[name]) for name in SAMPLE_DTYPE.names
+               if name not in ('wrist_imu', 'hand_imu')}
+    for name in ('wrist_imu', 'hand_imu'):
+        columns[name] = imu_column(samples[name]) if any(raw) else [None] * len(raw)
+    for name in ('wrist_quat', 'hand_quat'):
+        columns[name] = [None if flag else value for flag, value in zip(raw, columns[name])]
+
+    return [GloveSample(*fields) for fields in zip(*(columns[n] for n in SAMPLE_DTYPE.names))]
+
+
+def from_samples(samples: Sequence[GloveSample]) -> np.ndarray:
+    """Convert GloveSample objects to an array.
+
+    Arguments:
+        samples {Sequence[GloveSample]} -- samples
+
+    Returns:
+        np.ndarray -- array of SAMPLE_DTYPE, absent fields are NaN
+    """
+    absent_imu = ((np.nan,) * 3,) * 3
+    absent_quat = (np.nan,) * 4
+
+    def row(sample):
+        return (
+            sample.device_id,
+            sample.clock,
+            absent_imu if sample.wrist_imu is None else (
+                sample.wrist_imu.angular_velocity,
+                sample.wrist_imu.acceleration,
+                sample.wrist_imu.magnetic_field),
+            absent_imu if sample.hand_imu is None else (
+                sample.hand_imu.angular_velocity,
+                sample.hand_imu.acceleration,
+                sample.hand_imu.magnetic_field),
+            absent_quat if sample.wrist_quat is None else sample.wrist_quat,
+            absent_quat if sample.hand_quat is None else sample.hand_quat,
+            sample.pip_joints,
+            sample.dip_joints,
+            sample.palm_arch,
+            sample.thumb_cross_over,
+            sample.abductions,
+            sample.pressures,
+            sample.battery_charge)
+
+    return np.array([row(sample) for sample in samples], SAMPLE_DTYPE)
@@ -0,0 +1,297 @@
+"""This module contains per-user calibration of the glove sensors."""
+
+import json
+import os
+import re
+import time
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+
+from .protocol import SENSOR_DIVISORS, SampleDecoder
+
+__all__ = ('CalibrationProfile', 'ProfileBuilder', 'load_profile', 'save_profile')
+
+
+PROFILES_DIR = os.path.join(os.path.expanduser('~'), '.vmg30', 'profiles')
+
+# sensors block layout: 5 dip/pip pairs, palm arch, unused, thumb cross over, unused,
+# 5 pressures, 4 abductions, battery charge
+CALIBRATED_SENSORS = tuple(range(0, 11)) + (12,) + tuple(range(14, 23))
+PRESSURE_SENSORS = tuple(range(14, 19))
+
+_SENSORS_OFFSET = {0x01: 39, 0x03: 43}  # after 8 quaternion or 18 IMU values
+_MIN_SPAN = 10
+
+
+class CalibrationProfile:
+    """Per-user sensors ranges and gains.
+
+    A sensor raw value v is normalized as gain * (v - minimum) / (maximum - minimum), pressures
+    are inverted: 1 - gain * (v - minimum) / (maximum - minimum). The normalization is folded
+    into divisors and offsets, precomputed once per profile and applied by the decoder to
+    all sensors at once. The default profile reproduces the firmware normalization.
+    """
+
+    def __init__(self,
+                 device_id: int = 0,
+                 label: str = '',
+                 minimums: Sequence[float] = None,
+                 maximums: Sequence[float] = None,
+                 gains: Sequence[float] = None):
+        """Set up the profile.
+
+        Keyword Arguments:
+            device_id {int} -- device identificator (default: {0})
+            label {str} -- device string identificator (default: {''})
+            minimums {Sequence[float]} -- raw values of the 24 sensors mapped to 0
+                                          (default: {0 for all})
+            maximums {Sequence[float]} -- raw values of the 24 sensors mapped to 1
+                                          (default: {999 for pressures, 1000 for others})
+            gains {Sequence[float]} -- gains of the 24 sensors (default: {1 for all})
+        """
+        self.device_id = device_id
+        self.label = label
+        self._minimums = np.zeros(24) if minimums is None else np.array(minimums, float)
+        self._maximums = np.abs(np.array(SENSOR_DIVISORS, float)) if maximums is None \
+            else np.array(maximums, float)
+        self._gains = np.ones(24) if gains is None else np.array(gains, float)
+        if self._minimums.shape != (24,) or self._maximums.shape != (24,) or \
+                self._gains.shape != (24,):
+            raise ValueError('Calibration profile needs values for 24 sensors')
+
+        divisors = (self._maximums - self._minimums) / self._gains
+        divisors[list(PRESSURE_SENSORS)] *= -1.0
+        offsets = -self._minimums / divisors  # +minimum / span for the inverted pressures
+        self._divisors = divisors
+        self._offsets = offsets
+        self._decoder = None
+
+    @property
+    def minimums(self) -> np.ndarray:
+        """Raw values of the sensors mapped to 0.
+
+        Returns:
+            np.ndarray -- values of the 24 sensors
+        """
+        return self._minimums
+
+    @property
+    def maximums(self) -> np.ndarray:
+        """Raw values of the sensors mapped to 1.
+
+        Returns:
+            np.ndarray -- values of the 24 sensors
+        """
+        return self._maximums
+
+    @property
+    def gains(self) -> np.ndarray:
+        """Gains of the sensors.
+
+        Returns:
+            np.ndarray -- values of the 24 sensors
+        """
+        return self._gains
+
+    @property
+    def divisors(self) -> np.ndarray:
+        """Precomputed normalization divisors, negative for inverted pressures.
+
+        Returns:
+            np.ndarray -- values of the 24 sensors
+        """
+        return self._divisors
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """Precomputed normalization offsets.
+
+        Returns:
+            np.ndarray -- values of the 24 sensors
+        """
+        return self._offsets
+
+    @property
+    def decoder(self) -> SampleDecoder:
+        """Sample decoder applying the profile, compiled at the first use.
+
+        Returns:
+            SampleDecoder -- decoder
+        """
+        if self._decoder is None:
+            self._decoder = SampleDecoder(self._divisors.tolist(), self._offsets.tolist())
+        return self._decoder
+
+    def to_dict(self) -> dict:
+        """Convert to a JSON compatible dict.
+
+        Returns:
+            dict -- profile fields
+        """
+        return dict(device_id=self.device_id, label=self.label,
+                    minimums=self._minimums.tolist(), maximums=self._maximums.tolist(),
+                    gains=self._gains.tolist())
+
+    @classmethod
+    def from_dict(cls, fields: dict) -> 'CalibrationProfile':
+        """Create from a dict made by to_dict.
+
+        Arguments:
+            fields {dict} -- profile fields
+
+        Returns:
+            CalibrationProfile -- profile
+        """
+        return cls(**fields)
+
+    def __repr__(self):
+        """String representation.
+
+        Returns:
+            str -- string representing the profile
+        """
+        return f'CalibrationProfile(id={self.device_id}, label="{self.label}")'
+
+
+class ProfileBuilder:
+    """Learn sensors ranges from the samples recorded while the user moves the hand.
+
+    Ask the user to open, clench and spread the fingers and to press the tips, the
+    ranges are then taken as low and high percentiles of the recorded raw values, so a
+    few outliers do not stretch them. Sensors which barely moved keep the default range.
+    """
+
+    def __init__(self, device_id: int = 0, label: str = '', percentile: float = 1.0):
+        """Set up the builder.
+
+        Keyword Arguments:
+            device_id {int} -- device identificator (default: {0})
+            label {str} -- device string identificator (default: {''})
+            percentile {float} -- share of the values ignored at each end, % (default: {1.0})
+        """
+        self.device_id = device_id
+        self.label = label
+        self._percentile = percentile
+        self._values = []
+
+    @property
+    def count(self) -> int:
+        """Number of recorded samples.
+
+        Returns:
+            int -- samples count
+        """
+        return len(self._values)
+
+    def add_payload(self, payload: bytes) -> None:
+        """Record a sample.
+
+        Arguments:
+            payload {bytes} -- payload of 0x0A packet (any buffer object)
+        """
+        offset = _SENSORS_OFFSET[payload[0]]
+        self._values.append(bytes(payload[offset:offset + 48]))
+
+    def record(self, glove, duration: float = 10.0, raw: bool = False) -> Iterator[int]:
+        """Record samples from the glove.
+
+        Arguments:
+            glove {Glove} -- connected glove
+
+        Keyword Arguments:
+            duration {float} -- recording duration, sec (default: {10.0})
+            raw {bool} -- sample IMU data instead of quaternions (default: {False})
+
+        Yields:
+            int -- recording status (from 0 to 100)
+        """
+        self.device_id, self.label = glove.device_id, glove.label
+        stage = 0
+        yield stage
+        with glove.sampling(raw):
+            start = time.monotonic()
+            while stage != 100:
+                self.add_payload(glove.next_payload())
+                progress = min(int((time.monotonic() - start) / duration * 100), 100)
+                if progress != stage:
+                    stage = progress
+                    yield stage
+
+    def profile(self, gains: Sequence[float] = None) -> CalibrationProfile:
+        """Build the profile from the recorded samples.
+
+        Keyword Arguments:
+            gains {Sequence[float]} -- gains of the 24 sensors (default: {1 for all})
+
+        Returns:
+            CalibrationProfile -- profile
+        """
+        default = CalibrationProfile()
+        minimums, maximums = default.minimums.copy(), default.maximums.copy()
+        if self._values:
+            values = np.frombuffer(b''.join(self._values), '>u2').reshape(-1, 24)
+            low, high = np.percentile(
+                values, (self._percentile, 100.0 - self._percentile), axis=0)
+            learned = np.zeros(24, bool)
+            learned[list(CALIBRATED_SENSORS)] = True
+            learned &= high - low >= _MIN_SPAN
+            minimums[learned], maximums[learned] = low[learned], high[learned]
+        return CalibrationProfile(self.device_id, self.label, minimums, maximums, gains)
+
+
+def profile_path(device_id: int, label: str, directory: str = None) -> str:
+    """Get the path of a stored profile.
+
+    Arguments:
+        device_id {int} -- device identificator
+        label {str} -- device string identificator
+
+    Keyword Arguments:
+        directory {str} -- profiles directory (default: {PROFILES_DIR})
+
+    Returns:
+        str -- file path
+    """
+    name = re.sub(r'[^\w\-]', '_', label)
+    return os.path.join(directory or PROFILES_DIR, f'{device_id}_{name}.json')
+
+
+def load_profile(device_id: int, label: str,
+                 directory: str = None) -> Optional[CalibrationProfile]:
+    """Load the profile stored for a glove.
+
+    Arguments:
+        device_id {int} -- device identificator
+        label {str} -- device string identificator
+
+    Keyword Arguments:
+        directory {str} -- profiles directory (default: {PROFILES_DIR})
+
+    Returns:
+        Optional[CalibrationProfile] -- profile or None if there is no stored profile
+    """
+    try:
+        with open(profile_path(device_id, label, directory), 'r') as file:
+            return CalibrationProfile.from_dict(json.load(file))
+    except FileNotFoundError:
+        return None
+
+
+def save_profile(profile: CalibrationProfile, directory: str = None) -> str:
+    """Store a profile, the stored profile of the same glove is replaced.
+
+    Arguments:
+        profile {CalibrationProfile} -- profile
+
+    Keyword Arguments:
+        directory {str} -- profiles directory (default: {PROFILES_DIR})
+
+    Returns:
+        str -- file path
+    """
+    path = profile_path(profile.device_id, profile.label, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(profile.to_dict(), file, indent=2)
+    return path
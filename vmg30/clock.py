@@ -0,0 +1,238 @@
+"""This module contains the glove clock synchronisation with the host."""
+
+import collections
+import time
+from typing import Iterable, Iterator, Optional, Union
+
+from .data import CompactSample, GloveSample, TimedSample
+
+__all__ = ('ClockSync')
+
+
+CLOCK_WRAP = 2 ** 32 / 1000  # the glove clock is a 32-bit millisecond counter
+
+
+class ClockSync:
+    """Map the glove clock to the host monotonic clock.
+
+    The glove counter is unwrapped and its offset to the host clock is estimated online: the
+    smallest host - glove time difference is taken in each bucket of samples (the sample that
+    waited least in the buffers), and a line fitted to the recent bucket minima by least
+    squares, with the minima further than three median absolute deviations rejected, gives
+    the offset and the drift of the glove clock. The state is bounded by the number of
+    buckets and the line is refitted once per bucket.
+
+    The sample period is the median glove clock step (unless the rate is given), a step
+    longer than one and a half periods is reported as a gap of lost samples.
+    """
+
+    def __init__(self, rate: float = None, bucket_size: int = 64, buckets: int = 64):
+        """Set up the estimation.
+
+        Keyword Arguments:
+            rate {float} -- nominal samples per second (default: {None to estimate it})
+            bucket_size {int} -- number of samples of a bucket (default: {64})
+            buckets {int} -- number of recent buckets the line is fitted to, a longer
+                             window resolves the drift better from the millisecond
+                             counter (default: {64})
+        """
+        self._rate = rate
+        self._bucket_size = bucket_size
+        self._minima = collections.deque(maxlen=buckets)
+        self._steps = collections.deque(maxlen=bucket_size)
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the estimation, e.g. after the glove was restarted."""
+        self._minima.clear()
+        self._steps.clear()
+        self._wraps = 0
+        self._last = None
+        self._bucket_count = 0
+        self._bucket_min = None
+        self._offset = None
+        self._drift = 0.0
+        self._reference = 0.0
+        self._period = 1.0 / self._rate if self._rate else None
+        self._samples = 0
+        self._gaps = 0
+        self._lost = 0
+
+    @property
+    def offset(self) -> Optional[float]:
+        """Host time minus glove time at the last sample.
+
+        Returns:
+            Optional[float] -- offset, sec, None before the first sample
+        """
+        if self._offset is None:
+            return None
+        return self.to_host(self._last) - self._last
+
+    @property
+    def drift(self) -> float:
+        """Relative rate of the host clock against the glove clock.
+
+        Returns:
+            float -- host seconds per glove second minus one
+        """
+        return self._drift
+
+    @property
+    def period(self) -> Optional[float]:
+        """Sample period.
+
+        Returns:
+            Optional[float] -- period, sec, None until estimated
+        """
+        return self._period
+
+    @property
+    def samples(self) -> int:
+        """Number of received samples.
+
+        Returns:
+            int -- samples count
+        """
+        return self._samples
+
+    @property
+    def gaps(self) -> int:
+        """Number of detected gaps.
+
+        Returns:
+            int -- gaps count
+        """
+        return self._gaps
+
+    @property
+    def lost(self) -> int:
+        """Number of samples missing in the gaps.
+
+        Returns:
+            int -- samples count
+        """
+        return self._lost
+
+    def unwrap(self, clock: float) -> float:
+        """Unwrap the glove clock, the clocks must come in order.
+
+        Arguments:
+            clock {float} -- glove time, sec
+
+        Returns:
+            float -- glove time since the counter start, sec
+        """
+        clock += self._wraps * CLOCK_WRAP
+        if self._last is not None and clock < self._last - CLOCK_WRAP / 2:
+            self._wraps += 1
+            clock += CLOCK_WRAP
+        return clock
+
+    def to_host(self, clock: float) -> float:
+        """Map an unwrapped glove time to the host monotonic clock.
+
+        Arguments:
+            clock {float} -- glove time since the counter start, sec
+
+        Returns:
+            float -- host time, sec
+        """
+        return clock + self._offset + self._drift * (clock - self._reference)
+
+    def update(self,
+               sample: Union[GloveSample, CompactSample],
+               host_time: float = None) -> TimedSample:
+        """Take a received sample into account and timestamp it.
+
+        Arguments:
+            sample {Union[GloveSample, CompactSample]} -- data from the glove
+
+        Keyword Arguments:
+            host_time {float} -- host monotonic time of the reception, sec
+                                 (default: {time.monotonic()})
+
+        Returns:
+            TimedSample -- sample with its host time
+        """
+        if host_time is None:
+            host_time = time.monotonic()
+        clock = self.unwrap(sample.clock)
+        lost = 0
+        if self._last is not None:
+            step = clock - self._last
+            if self._period is not None and step > 1.5 * self._period:
+                lost = round(step / self._period) - 1
+                self._gaps += 1
+                self._lost += lost
+            else:
+                self._steps.append(step)
+                if self._period is None and len(self._steps) == 8:
+                    self._estimate_period()  # refined once per bucket
+        self._last = clock
+        self._samples += 1
+
+        difference = host_time - clock
+        if self._bucket_min is None or difference < self._bucket_min[1]:
+            self._bucket_min = (clock, difference)
+        if not self._minima and (self._offset is None or difference < self._offset):
+            self._offset, self._reference = difference, clock  # until the first bucket
+        self._bucket_count += 1
+        if self._bucket_count == self._bucket_size:
+            self._minima.append(self._bucket_min)
+            self._bucket_count = 0
+            self._bucket_min = None
+            self._fit()
+        return TimedSample(self.to_host(clock), clock, lost, sample)
+
+    def timed(self, samples: Iterable[Union[GloveSample, CompactSample]]) -> Iterator[TimedSample]:
+        """Timestamp a stream of samples on reception, e.g. the Glove.sampling() iterator.
+
+        Arguments:
+            samples {Iterable[Union[GloveSample, CompactSample]]} -- samples
+
+        Yields:
+            TimedSample -- sample with its host time
+        """
+        for sample in samples:
+            yield self.update(sample, time.monotonic())
+
+    def _fit(self) -> None:
+        if self._rate is None and len(self._steps) == self._steps.maxlen:
+            self._estimate_period()
+
+        points = list(self._minima)
+        offset, drift, reference = _fit_line(points)
+        if len(points) > 2:
+            residuals = [abs(y - offset - drift * (x - reference)) for x, y in points]
+            deviation = _median(residuals)
+            kept = [point for point, residual in zip(points, residuals)
+                    if residual <= 3.0 * deviation + 1e-6]
+            if len(kept) >= 2 and len(kept) < len(points):
+                offset, drift, reference = _fit_line(kept)
+        self._offset, self._drift, self._reference = offset, drift, reference
+
+    def _estimate_period(self) -> None:
+        # samples received in a burst may share a clock value, a zero period is no estimate
+        period = _median(self._steps)
+        if period > 0.0:
+            self._period = period
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def _fit_line(points):
+    # least squares line through (glove time, host - glove time) points,
+    # returned as the value at the mean glove time and the slope
+    count = len(points)
+    reference = sum(x for x, _ in points) / count
+    mean = sum(y for _, y in points) / count
+    spread = sum((x - reference) ** 2 for x, _ in points)
+    if count < 2 or spread <= 0.0:
+        return mean, 0.0, reference
+    slope = sum((x - reference) * (y - mean) for x, y in points) / spread
+    return mean, slope, reference
@@ -1,10 +1,12 @@
 """This module contains glove specific data types."""
 
+import dataclasses
+import struct
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 
 
-__all__ = ('IMUSample', 'GloveSample')
+__all__ = ('IMUSample', 'GloveSample', 'TimedSample', 'HubFrame', 'GloveEvent', 'CompactSample')
 
 
 Vec3f = Tuple[float, float, float]
@@ -46,7 +48,7 @@ class GloveSample:
     """
 
     device_id: int
-    clock: int
+    clock: float
     wrist_imu: IMUSample
     hand_imu: IMUSample
     wrist_quat: Vec4f
@@ -58,3 +60,198 @@ class GloveSample:
     abductions: Vec4f
     pressures: Vec5f
     battery_charge: float
+
+
+@dataclass(frozen=True)
+class TimedSample:
+    """Glove data sample with its host time.
+
+    timestamp {float} -- host monotonic time of the sample, sec
+    clock {float} -- internal glove time since the counter start (unwrapped), sec
+    lost {int} -- number of samples lost just before this one
+    sample {GloveSample} -- sample (or CompactSample)
+    """
+
+    timestamp: float
+    clock: float
+    lost: int
+    sample: GloveSample
+
+
+@dataclass(frozen=True)
+class HubFrame:
+    """Samples of several gloves taken at the same time.
+
+    timestamp {float} -- host monotonic time of the earliest sample, sec
+    samples {Dict[int, GloveSample]} -- samples by device id, a stalled glove is absent
+    """
+
+    timestamp: float
+    samples: Dict[int, GloveSample]
+
+
+@dataclass(frozen=True)
+class GloveEvent:
+    """Change of a detected glove condition.
+
+    clock {float} -- internal glove time of the change, sec
+    name {str} -- detector name
+    active {bool} -- True if the condition started, False if it ended
+    value {float} -- detected signal value at the change
+    """
+
+    clock: float
+    name: str
+    active: bool
+    value: float
+
+
+_HEADER = struct.Struct('>BHI')
+_QUAT = struct.Struct('>4i')
+_IMU = struct.Struct('>9h')
+_JOINTS = struct.Struct('>10H')
+_SENSOR = struct.Struct('>H')
+_PRESSURES = struct.Struct('>5H')
+_ABDUCTIONS = struct.Struct('>4H')
+
+
+class CompactSample:
+    """Glove data sample backed by the packet payload.
+
+    The sample holds a single bytes object, fields are decoded when accessed (so cache the
+    values used repeatedly), decoded values are identical to GloveSample fields. Pickling
+    stores the payload only.
+    """
+
+    __slots__ = ('_data', '_sensors')
+
+    def __init__(self, payload: bytes):
+        """Wrap a sample packet payload.
+
+        Arguments:
+            payload {bytes} -- payload of 0x0A packet (any buffer object)
+        """
+        self._data = bytes(payload)
+        # the sensors block follows 8 quaternion or 18 IMU values
+        self._sensors = 43 if self._data[0] == 0x03 else 39
+
+    @property
+    def payload(self) -> bytes:
+        """Sample packet payload.
+
+        Returns:
+            bytes -- payload of 0x0A packet
+        """
+        return self._data
+
+    @property
+    def device_id(self) -> int:
+        """Device identificator."""
+        return _HEADER.unpack_from(self._data)[1]
+
+    @property
+    def clock(self) -> float:
+        """Internal glove time, sec."""
+        return _HEADER.unpack_from(self._data)[2] / 1000
+
+    @property
+    def wrist_imu(self) -> Optional[IMUSample]:
+        """Wrist IMU raw data."""
+        return self._imu(7)
+
+    @property
+    def hand_imu(self) -> Optional[IMUSample]:
+        """Hand IMU raw data."""
+        return self._imu(25)
+
+    @property
+    def wrist_quat(self) -> Optional[Vec4f]:
+        """Wrist quaternion."""
+        return self._quat(7)
+
+    @property
+    def hand_quat(self) -> Optional[Vec4f]:
+        """Hand quaternion."""
+        return self._quat(23)
+
+    @property
+    def pip_joints(self) -> Vec5f:
+        """Proximal finger interphalangeal sensors values [0..1]."""
+        return tuple(v / 1000 for v in _JOINTS.unpack_from(self._data, self._sensors)[1::2])
+
+    @property
+    def dip_joints(self) -> Vec5f:
+        """Distal finger interphalangeal sensors values [0..1]."""
+        return tuple(v / 1000 for v in _JOINTS.unpack_from(self._data, self._sensors)[0::2])
+
+    @property
+    def palm_arch(self) -> float:
+        """Palm arch sensor value [0..1]."""
+        return _SENSOR.unpack_from(self._data, self._sensors + 20)[0] / 1000
+
+    @property
+    def thumb_cross_over(self) -> float:
+        """Thumb cross over sensor value [0..1]."""
+        return _SENSOR.unpack_from(self._data, self._sensors + 24)[0] / 1000
+
+    @property
+    def pressures(self) -> Vec5f:
+        """Tip pressure sensors values [0..1]."""
+        return tuple(1.0 - v / 999 for v in _PRESSURES.unpack_from(self._data, self._sensors + 28))
+
+    @property
+    def abductions(self) -> Vec4f:
+        """Abduction sensors values [0..1]."""
+        return tuple(v / 1000 for v in _ABDUCTIONS.unpack_from(self._data, self._sensors + 38))
+
+    @property
+    def battery_charge(self) -> float:
+        """Battery charge [0..1]."""
+        return _SENSOR.unpack_from(self._data, self._sensors + 46)[0] / 1000
+
+    def to_sample(self) -> GloveSample:
+        """Decode all fields.
+
+        Returns:
+            GloveSample -- sample
+        """
+        return GloveSample(**{field.name: getattr(self, field.name)
+                              for field in dataclasses.fields(GloveSample)})
+
+    def __eq__(self, other):
+        """Compare with a compact or a regular sample."""
+        if isinstance(other, CompactSample):
+            return self._data == other._data  # pylint: disable=protected-access
+        if isinstance(other, GloveSample):
+            return self.to_sample() == other
+        return NotImplemented
+
+    def __hash__(self):
+        """Hash of the payload."""
+        return hash(self._data)
+
+    def __reduce__(self):
+        """Pickle the payload only."""
+        return (CompactSample, (self._data,))
+
+    def __repr__(self):
+        """String representation.
+
+        Returns:
+            str -- string representing the sample
+        """
+        return f'CompactSample(device_id={self.device_id}, clock={self.clock})'
+
+    def _quat(self, offset: int) -> Optional[Vec4f]:
+        if self._data[0] == 0x03:
+            return None
+        return tuple(v / 0x10000 for v in _QUAT.unpack_from(self._data, offset))
+
+    def _imu(self, offset: int) -> Optional[IMUSample]:
+        if self._data[0] != 0x03:
+            return None
+        values = _IMU.unpack_from(self._data, offset)
+        return IMUSample(
+            angular_velocity=tuple(v / 0x8000 * 10 for v in values[0:3]),
+            acceleration=tuple(v / 0x8000 * 4 for v in values[3:6]),
+            magnetic_field=values[6:9])
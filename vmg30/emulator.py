@@ -0,0 +1,563 @@
+"""This module contains the virtual motion glove emulator.
+
+The emulator speaks the glove protocol: it answers the commands and streams synthetic samples
+at a configurable rate, optionally damaging packets and stalling on purpose. It can be used
+in process through FakeSerial, by any serial client through a pseudo terminal (POSIX only)
+or over a local TCP or UDP socket through EmulatorServer.
+"""
+
+import math
+import os
+import random
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Optional, Sequence
+
+from .protocol import PacketFramer, encode_packet
+
+__all__ = ('GloveEmulator', 'FakeSerial', 'EmulatorPty', 'EmulatorServer')
+
+
+_TEMPLATES = 100  # number of distinct samples in the synthetic motion cycle
+
+
+class GloveEmulator:
+    """Emulated glove.
+
+    Bytes written by the host are parsed as commands, replies and samples are produced on
+    demand when the host reads, according to the emulator clock. So the emulator has no
+    thread of its own and can stream faster than the real hardware (unlimited rate).
+    """
+
+    def __init__(self,
+                 device_id: int = 1,
+                 label: str = 'VMG30',
+                 firmware: Sequence[int] = (1, 0, 0),
+                 rate: Optional[float] = 100.0,
+                 corrupt_rate: float = 0.0,
+                 truncate_rate: float = 0.0,
+                 stall_rate: float = 0.0,
+                 stall_duration: float = 0.5,
+                 seed: int = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """Set up the glove.
+
+        Keyword Arguments:
+            device_id {int} -- device identificator (default: {1})
+            label {str} -- device string identificator (default: {'VMG30'})
+            firmware {Sequence[int]} -- firmware version x, y, z (default: {(1, 0, 0)})
+            rate {Optional[float]} -- samples per second, None for unlimited (default: {100.0})
+            corrupt_rate {float} -- probability of a sample packet with a bad crc (default: {0.0})
+            truncate_rate {float} -- probability of a truncated sample packet (default: {0.0})
+            stall_rate {float} -- probability of a stall instead of a sample (default: {0.0})
+            stall_duration {float} -- stall duration, sec (default: {0.5})
+            seed {int} -- faults random generator seed (default: {None})
+            clock {Callable[[], float]} -- time source, sec (default: {time.monotonic})
+        """
+        self.device_id = device_id
+        self.label = label
+        self.firmware = tuple(firmware)
+        self.vibro_levels = None
+        self._period = 1.0 / rate if rate else None
+        self._corrupt_rate = corrupt_rate
+        self._fault_rate = corrupt_rate + truncate_rate
+        self._stall_rate = stall_rate
+        self._stall_duration = stall_duration
+        self._rng = random.Random(seed)
+        self._clock = clock
+        self._start = clock()
+        self._framer = PacketFramer(capacity=1024)
+        self._output = bytearray()
+        self._mode = 0x00
+        self._next_time = 0.0
+        self._resume_time = 0.0
+        self._templates = {}
+        self._index = 0
+        self._samples = 0
+        self._corrupted = 0
+        self._truncated = 0
+        self._stalls = 0
+
+    @property
+    def sampling(self) -> bool:
+        """Sampling is running.
+
+        Returns:
+            bool -- True if running
+        """
+        return self._mode != 0x00
+
+    @property
+    def samples(self) -> int:
+        """Number of sample packets produced, including the damaged ones.
+
+        Returns:
+            int -- packets count
+        """
+        return self._samples
+
+    @property
+    def corrupted(self) -> int:
+        """Number of sample packets produced with a bad crc.
+
+        Returns:
+            int -- packets count
+        """
+        return self._corrupted
+
+    @property
+    def truncated(self) -> int:
+        """Number of truncated sample packets produced.
+
+        Returns:
+            int -- packets count
+        """
+        return self._truncated
+
+    @property
+    def stalls(self) -> int:
+        """Number of stalls.
+
+        Returns:
+            int -- stalls count
+        """
+        return self._stalls
+
+    def write(self, data: bytes) -> int:
+        """Receive bytes from the host.
+
+        Arguments:
+            data {bytes} -- command packets (any buffer object)
+
+        Returns:
+            int -- number of bytes received
+        """
+        self._framer.feed(data)
+        while True:
+            packet = self._framer.next_packet()
+            if packet is None:
+                return len(data)
+            self._execute(packet[0], bytes(packet[1]))
+
+    def read(self, size: int) -> bytes:
+        """Send bytes to the host.
+
+        Arguments:
+            size {int} -- maximum number of bytes
+
+        Returns:
+            bytes -- bytes available by now, may be empty
+        """
+        self._produce(size)
+        data = bytes(self._output[:size])
+        del self._output[:size]
+        return data
+
+    def pending(self) -> int:
+        """Number of bytes available by now.
+
+        Returns:
+            int -- bytes count
+        """
+        self._produce(0)
+        return len(self._output)
+
+    def next_event(self) -> Optional[float]:
+        """Time until there are bytes to send.
+
+        Returns:
+            Optional[float] -- time, sec, None if nothing is expected
+        """
+        if self._output:
+            return 0.0
+        if not self._mode:
+            return None
+        now = self._clock()
+        if self._period is None:
+            return max(self._resume_time - now, 0.0)
+        return max(self._next_time - now, self._resume_time - now, 0.0)
+
+    def _execute(self, package_type: int, package_data: bytes) -> None:
+        if package_type == 0x0A:
+            self._mode = package_data[0] if package_data else 0x00
+            self._next_time = self._resume_time = self._clock()
+        elif package_type == 0x0C:
+            self._reply(0x0C, struct.pack('>BBHIIIBB', 0x01, 0x00, self.device_id, 0, 0, 0, 1, 0))
+        elif package_type == 0x0D:
+            self.device_id, = struct.unpack('>H', package_data)
+            self._reply(0x0D, package_data)
+        elif package_type == 0x0E:
+            self._mode = 0x00
+            self._start = self._clock()
+        elif package_type == 0x11:
+            if package_data:
+                self.label = package_data.decode().split('\0', 1)[0]
+            self._reply(0x11, struct.pack('16s', self.label.encode()))
+        elif package_type == 0x13:
+            self._reply(0x13, bytes(self.firmware))
+        elif package_type == 0x31:
+            for stage in range(0, 101, 25):
+                self._reply(0x31, bytes([stage]))
+        elif package_type == 0x40:
+            self._mode = 0x00
+        elif package_type == 0x60:
+            self.vibro_levels = [(v - 110) / 140 for v in package_data[:5]]
+
+    def _reply(self, package_type: int, package_data: bytes) -> None:
+        self._output += encode_packet(package_type, package_data)
+
+    def _produce(self, size: int) -> None:
+        if not self._mode:
+            return
+        now = self._clock()
+        while now >= self._resume_time:
+            if self._period is not None:
+                if self._next_time > now:
+                    return
+                timestamp = self._next_time
+                self._next_time += self._period
+            elif len(self._output) >= size:
+                return
+            else:
+                timestamp = now
+
+            if self._stall_rate and self._rng.random() < self._stall_rate:
+                self._stalls += 1
+                self._resume_time = timestamp + self._stall_duration
+                if self._period is not None:
+                    self._next_time = self._resume_time
+                return
+            self._emit(timestamp)
+
+    def _emit(self, timestamp: float) -> None:
+        payload = bytearray(self._template(self._mode, self._index))
+        struct.pack_into('>I', payload, 3, int((timestamp - self._start) * 1000) & 0xFFFFFFFF)
+        packet = encode_packet(0x0A, payload)
+        self._index = (self._index + 1) % _TEMPLATES
+        self._samples += 1
+
+        if self._fault_rate:
+            fault = self._rng.random()
+            if fault < self._corrupt_rate:
+                packet = packet[:-2] + bytes([~packet[-2] & 0xFF]) + packet[-1:]
+                self._corrupted += 1
+            elif fault < self._fault_rate:
+                packet = packet[:self._rng.randrange(1, len(packet))]
+                self._truncated += 1
+        self._output += packet
+
+    def _template(self, mode: int, index: int) -> bytes:
+        key = (mode, self.device_id, index)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = _synthetic_payload(mode, self.device_id, index)
+        return template
+
+
+def _synthetic_payload(mode: int, device_id: int, index: int) -> bytes:
+    phase = 2.0 * math.pi * index / _TEMPLATES
+    sensors = [int(500 + 400 * math.sin(phase + 0.3 * i)) for i in range(14)]
+    sensors += [int(999 * (0.5 + 0.5 * math.cos(phase + 0.5 * i))) for i in range(5)]
+    sensors += [int(500 + 200 * math.sin(phase + 0.7 * i)) for i in range(4)]
+    sensors += [900]
+    if mode == 0x03:
+        imu = [0, 0, int(0x8000 / 10 * math.cos(phase)), 0, 0, 0x8000 // 4, 200, 0, -400]
+        return struct.pack('>BHI18h24H', mode, device_id, 0, *imu, *imu, *sensors)
+    wrist, hand = 0.3 * math.sin(phase), 0.5 * math.sin(phase)
+    quats = [math.cos(wrist / 2), 0.0, 0.0, math.sin(wrist / 2),
+             math.cos(hand / 2), 0.0, math.sin(hand / 2), 0.0]
+    return struct.pack('>BHI8i24H', 0x01, device_id, 0, *[int(v * 0x10000) for v in quats],
+                       *sensors)
+
+
+class FakeSerial:
+    """In-process stand-in of serial.Serial connected to an emulated glove.
+
+    Pass it to Glove instead of the port name.
+    """
+
+    def __init__(self, emulator: GloveEmulator = None, timeout: Optional[float] = 2.0):
+        """Connect to the emulator.
+
+        Keyword Arguments:
+            emulator {GloveEmulator} -- emulated glove (default: {GloveEmulator()})
+            timeout {Optional[float]} -- read timeout, sec, None to wait forever
+                                         (default: {2.0})
+        """
+        self.emulator = emulator if emulator is not None else GloveEmulator()
+        self.timeout = timeout
+        self.name = 'emulator'
+        self.is_open = True
+
+    @property
+    def in_waiting(self) -> int:
+        """Number of bytes available without blocking.
+
+        Returns:
+            int -- bytes count
+        """
+        return self.emulator.pending()
+
+    def read(self, size: int = 1) -> bytes:
+        """Read bytes, wait for them until the timeout.
+
+        Keyword Arguments:
+            size {int} -- number of bytes (default: {1})
+
+        Returns:
+            bytes -- bytes read, fewer than requested on timeout
+        """
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        data = self.emulator.read(size)
+        while len(data) < size:
+            wait = self.emulator.next_event()
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0.0:
+                    break
+                wait = remaining if wait is None else min(wait, remaining)
+            elif wait is None:
+                raise RuntimeError('Emulated glove will never send the requested bytes')
+            time.sleep(wait)
+            data += self.emulator.read(size - len(data))
+        return data
+
+    def readinto(self, buffer) -> int:
+        """Read bytes into a buffer, wait for them until the timeout.
+
+        Arguments:
+            buffer {buffer} -- writable buffer
+
+        Returns:
+            int -- number of bytes read
+        """
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def write(self, data: bytes) -> int:
+        """Write bytes.
+
+        Arguments:
+            data {bytes} -- bytes
+
+        Returns:
+            int -- number of bytes written
+        """
+        return self.emulator.write(data)
+
+    def close(self) -> None:
+        """Close the connection."""
+        self.is_open = False
+
+
+class EmulatorPty:
+    """Serve an emulated glove on a pseudo terminal (POSIX only).
+
+    A thread passes bytes between the emulator and the pty master, the slave device path
+    can be opened by Glove or by any other serial client.
+    """
+
+    def __init__(self, emulator: GloveEmulator = None):
+        """Create the pseudo terminal, call start() or use it as a context guard to serve.
+
+        Keyword Arguments:
+            emulator {GloveEmulator} -- emulated glove (default: {GloveEmulator()})
+        """
+        import pty  # pylint: disable=import-outside-toplevel
+        import tty  # pylint: disable=import-outside-toplevel
+
+        self.emulator = emulator if emulator is not None else GloveEmulator()
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self._port = os.ttyname(self._slave)
+        self._thread = None
+        self._running = False
+
+    @property
+    def port(self) -> str:
+        """Serial device name to connect to.
+
+        Returns:
+            str -- device path
+        """
+        return self._port
+
+    def start(self) -> None:
+        """Start serving."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='EmulatorPty', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving and close the pseudo terminal."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        os.close(self._master)
+        os.close(self._slave)
+
+    def __enter__(self):
+        """Start serving at context guard enter.
+
+        Returns:
+            EmulatorPty -- this server
+        """
+        self.start()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Stop serving at context guard exit."""
+        self.stop()
+
+    def _run(self) -> None:
+        output = b''
+        while self._running:
+            wait = 0.0 if output else self.emulator.next_event()
+            wait = 0.1 if wait is None else min(wait, 0.1)
+            writers = [self._master] if wait == 0.0 else []
+            readable, writable, _ = select.select([self._master], writers, [], wait)
+            if readable:
+                try:
+                    self.emulator.write(os.read(self._master, 4096))
+                except (BlockingIOError, OSError):
+                    pass
+            if writable:
+                output = output or self.emulator.read(4096)
+                try:
+                    output = output[os.write(self._master, output):]
+                except (BlockingIOError, OSError):
+                    pass
+
+
+class EmulatorServer:
+    """Serve an emulated glove on a local TCP or UDP socket, as a Wi-Fi glove does.
+
+    TCP clients are served one at a time. Over UDP the output is sent in datagrams to the
+    address of the last received command.
+    """
+
+    def __init__(self,
+                 emulator: GloveEmulator = None,
+                 kind: str = 'tcp',
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 datagram_size: int = 1024):
+        """Bind the socket, call start() or use it as a context guard to serve.
+
+        Keyword Arguments:
+            emulator {GloveEmulator} -- emulated glove (default: {GloveEmulator()})
+            kind {str} -- 'tcp' or 'udp' (default: {'tcp'})
+            host {str} -- address to bind (default: {'127.0.0.1'})
+            port {int} -- port to bind, 0 for any free port (default: {0})
+            datagram_size {int} -- maximum UDP datagram size (default: {1024})
+        """
+        if kind not in ('tcp', 'udp'):
+            raise ValueError(f'Unknown socket kind "{kind}"')
+        self.emulator = emulator if emulator is not None else GloveEmulator()
+        self._kind = kind
+        self._datagram_size = datagram_size
+        self._sock = socket.socket(
+            socket.AF_INET, socket.SOCK_STREAM if kind == 'tcp' else socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        if kind == 'tcp':
+            self._sock.listen(1)
+        self._sock.setblocking(False)
+        self._address = self._sock.getsockname()
+        self._thread = None
+        self._running = False
+
+    @property
+    def url(self) -> str:
+        """Connection URL to pass to Glove.
+
+        Returns:
+            str -- tcp://host:port or udp://host:port
+        """
+        return '{}://{}:{}'.format(self._kind, *self._address)
+
+    def start(self) -> None:
+        """Start serving."""
+        self._running = True
+        target = self._run_tcp if self._kind == 'tcp' else self._run_udp
+        self._thread = threading.Thread(target=target, name='EmulatorServer', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._sock.close()
+
+    def __enter__(self):
+        """Start serving at context guard enter.
+
+        Returns:
+            EmulatorServer -- this server
+        """
+        self.start()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Stop serving at context guard exit."""
+        self.stop()
+
+    def _wait(self, output) -> float:
+        wait = 0.0 if output else self.emulator.next_event()
+        return 0.1 if wait is None else min(wait, 0.1)
+
+    def _run_tcp(self) -> None:
+        client, output = None, b''
+        while self._running:
+            if client is None:
+                if select.select([self._sock], [], [], 0.1)[0]:
+                    client, _ = self._sock.accept()
+                    client.setblocking(False)
+                    client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    output = b''
+                continue
+            wait = self._wait(output)
+            writers = [client] if wait == 0.0 else []
+            readable, writable, _ = select.select([client], writers, [], wait)
+            try:
+                if readable:
+                    data = client.recv(4096)
+                    if not data:
+                        raise ConnectionError
+                    self.emulator.write(data)
+                if writable:
+                    output = output or self.emulator.read(4096)
+                    output = output[client.send(output):]
+            except BlockingIOError:
+                pass
+            except OSError:
+                client.close()
+                client = None
+        if client is not None:
+            client.close()
+
+    def _run_udp(self) -> None:
+        peer, output = None, b''
+        while self._running:
+            wait = self._wait(output) if peer is not None else 0.1
+            writers = [self._sock] if wait == 0.0 else []
+            readable, writable, _ = select.select([self._sock], writers, [], wait)
+            try:
+                if readable:
+                    data, peer = self._sock.recvfrom(0x10000)
+                    self.emulator.write(data)
+                if writable:
+                    output = output or self.emulator.read(self._datagram_size)
+                    if output:
+                        self._sock.sendto(output, peer)
+                    output = b''
+            except (BlockingIOError, ConnectionRefusedError):
+                pass
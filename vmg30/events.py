@@ -0,0 +1,382 @@
+"""This module contains streaming detectors of glove events.
+
+A detector reads a scalar signal out of the samples (a sensor or a reduction of a sensor
+group, optionally passed through rolling statistics) and reports the changes of a condition
+on it as events stamped with the glove clock. Detectors keep fixed-size state and process
+either one sample at a time or whole recorded arrays (vmg30.batch.SAMPLE_DTYPE): signals are
+extracted from arrays at once, the stateful part is the same loop over plain floats, so both
+give the same events.
+"""
+
+import collections
+import math
+from typing import Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .data import CompactSample, GloveEvent, GloveSample
+
+__all__ = ('Signal', 'Rolling', 'Hysteresis', 'EventPipeline')
+
+
+Sample = Union[GloveSample, CompactSample]
+
+_REDUCTIONS = {
+    'mean': (lambda values: sum(values) / len(values), np.mean),
+    'min': (min, np.min),
+    'max': (max, np.max),
+    'sum': (sum, np.sum),
+}
+
+
+class Signal:
+    """Scalar value of a sample field.
+
+    A group field (e.g. pressures) is reduced to a scalar by an index or by a reduction of
+    the selected members, e.g. Signal('pressures', (0, 1), 'min') is high when both thumb and
+    index tips are pressed.
+    """
+
+    def __init__(self,
+                 field: str,
+                 index: Union[int, Sequence[int]] = None,
+                 reduce: str = None):
+        """Select the value.
+
+        Arguments:
+            field {str} -- sample field name, e.g. 'pip_joints'
+
+        Keyword Arguments:
+            index {Union[int, Sequence[int]]} -- member or members of a group field
+                                                 (default: {None for all members})
+            reduce {str} -- 'mean', 'min', 'max' or 'sum' of the members, required for
+                            several members (default: {None})
+        """
+        if reduce is not None and reduce not in _REDUCTIONS:
+            raise ValueError(f'Unknown reduction "{reduce}"')
+        self._field = field
+        self._index = index if isinstance(index, int) or index is None else tuple(index)
+        self._reduce = reduce
+
+    def __call__(self, sample: Sample) -> float:
+        """Get the value of a sample.
+
+        Arguments:
+            sample {Sample} -- data from the glove
+
+        Returns:
+            float -- value
+        """
+        value = getattr(sample, self._field)
+        if isinstance(self._index, int):
+            return value[self._index]
+        if self._index is not None:
+            value = [value[i] for i in self._index]
+        if self._reduce is not None:
+            return _REDUCTIONS[self._reduce][0](value)
+        return value
+
+    def column(self, samples: np.ndarray) -> np.ndarray:
+        """Get the values of recorded samples.
+
+        Arguments:
+            samples {np.ndarray} -- array of vmg30.batch.SAMPLE_DTYPE
+
+        Returns:
+            np.ndarray -- values of shape (N,)
+        """
+        values = samples[self._field]
+        if self._index is not None:
+            values = values[:, self._index]
+        if self._reduce is not None:
+            return _REDUCTIONS[self._reduce][1](values, axis=1)
+        return values
+
+    def __repr__(self):
+        """String representation.
+
+        Returns:
+            str -- string representing the signal
+        """
+        return f'Signal("{self._field}", {self._index}, {self._reduce})'
+
+
+class Rolling:
+    """Rolling statistic of a signal over the last samples.
+
+    The window is a ring buffer, mean and standard deviation come from running sums (they are
+    recomputed once per window to drop the rounding drift), minimum and maximum from monotonic
+    queues, so an update costs O(1) amortized and the state never grows.
+    """
+
+    STATISTICS = ('mean', 'std', 'min', 'max', 'range')
+
+    def __init__(self, signal: Signal, window: int, statistic: str = 'mean'):
+        """Set up the window.
+
+        Arguments:
+            signal {Signal} -- source signal
+            window {int} -- number of samples
+
+        Keyword Arguments:
+            statistic {str} -- 'mean', 'std', 'min', 'max' or 'range' (default: {'mean'})
+        """
+        if statistic not in self.STATISTICS:
+            raise ValueError(f'Unknown statistic "{statistic}"')
+        self.signal = signal
+        self._window = window
+        self._statistic = statistic
+        self.reset()
+
+    def reset(self) -> None:
+        """Empty the window."""
+        self._ring = [0.0] * self._window
+        self._count = 0
+        self._position = 0
+        self._sum = 0.0
+        self._squares = 0.0
+        self._minimums = collections.deque()
+        self._maximums = collections.deque()
+
+    def update(self, value: float) -> float:
+        """Append a value.
+
+        Arguments:
+            value {float} -- signal value
+
+        Returns:
+            float -- statistic of the window
+        """
+        ring, position, window = self._ring, self._position, self._window
+        if self._count == window:
+            old = ring[position % window]
+            self._sum -= old
+            self._squares -= old * old
+        else:
+            self._count += 1
+        ring[position % window] = value
+        self._sum += value
+        self._squares += value * value
+        self._position = position = position + 1
+        if position % window == 0:
+            self._sum = math.fsum(ring[:self._count])
+            self._squares = math.fsum(v * v for v in ring[:self._count])
+
+        statistic = self._statistic
+        if statistic == 'mean':
+            return self._sum / self._count
+        if statistic == 'std':
+            mean = self._sum / self._count
+            return math.sqrt(max(self._squares / self._count - mean * mean, 0.0))
+
+        oldest = position - window
+        minimums, maximums = self._minimums, self._maximums
+        if statistic != 'max':
+            while minimums and minimums[-1][1] >= value:
+                minimums.pop()
+            minimums.append((position, value))
+            if minimums[0][0] <= oldest:
+                minimums.popleft()
+        if statistic != 'min':
+            while maximums and maximums[-1][1] <= value:
+                maximums.pop()
+            maximums.append((position, value))
+            if maximums[0][0] <= oldest:
+                maximums.popleft()
+        if statistic == 'min':
+            return minimums[0][1]
+        if statistic == 'max':
+            return maximums[0][1]
+        return maximums[0][1] - minimums[0][1]
+
+    def __call__(self, sample: Sample) -> float:
+        """Append the value of a sample.
+
+        Arguments:
+            sample {Sample} -- data from the glove
+
+        Returns:
+            float -- statistic of the window
+        """
+        return self.update(self.signal(sample))
+
+    def column(self, samples: np.ndarray) -> List[float]:
+        """Append the values of recorded samples.
+
+        Arguments:
+            samples {np.ndarray} -- array of vmg30.batch.SAMPLE_DTYPE
+
+        Returns:
+            List[float] -- statistic of the window after each sample
+        """
+        update = self.update
+        return [update(value) for value in self.signal.column(samples).tolist()]
+
+
+class Hysteresis:
+    """Threshold detector with hysteresis and debouncing.
+
+    With on above off the condition starts when the signal reaches on and ends when it falls
+    to off (e.g. a grip closing), with on below off it is the other way round (e.g. a hand
+    holding still). A change is reported only once the signal stayed past the threshold for
+    the debounce time, the event carries the clock of the threshold crossing.
+    """
+
+    def __init__(self,
+                 name: str,
+                 signal: Union[Signal, Rolling],
+                 on: float,
+                 off: float,
+                 debounce: float = 0.0):
+        """Set up the detector.
+
+        Arguments:
+            name {str} -- event name
+            signal {Union[Signal, Rolling]} -- detected signal, owned by this detector
+            on {float} -- signal value starting the condition
+            off {float} -- signal value ending the condition
+
+        Keyword Arguments:
+            debounce {float} -- time the signal has to stay past a threshold, sec
+                                (default: {0.0})
+        """
+        self.name = name
+        self.signal = signal
+        self._sign = 1.0 if on >= off else -1.0
+        self._on = on * self._sign
+        self._off = off * self._sign
+        self._debounce = debounce
+        self.reset()
+
+    @property
+    def active(self) -> bool:
+        """Reported condition state.
+
+        Returns:
+            bool -- True if the condition holds
+        """
+        return self._active
+
+    def reset(self) -> None:
+        """Forget the state, the condition is inactive."""
+        self._active = False
+        self._pending = None  # clock and value of an unconfirmed crossing
+        if isinstance(self.signal, Rolling):
+            self.signal.reset()
+
+    def update(self, sample: Sample) -> Optional[GloveEvent]:
+        """Process a sample.
+
+        Arguments:
+            sample {Sample} -- data from the glove
+
+        Returns:
+            Optional[GloveEvent] -- event if the condition changed
+        """
+        return self._step(sample.clock, self.signal(sample))
+
+    def process(self, samples: np.ndarray) -> List[GloveEvent]:
+        """Process recorded samples, the detector state is continued.
+
+        Arguments:
+            samples {np.ndarray} -- array of vmg30.batch.SAMPLE_DTYPE, ordered by clock
+
+        Returns:
+            List[GloveEvent] -- events
+        """
+        return [event for _, event in self._process(samples)]
+
+    def _process(self, samples):
+        # events along with the indices of the samples reporting them
+        values = self.signal.column(samples)
+        if isinstance(values, np.ndarray):
+            values = values.tolist()
+        step = self._step
+        for index, (clock, value) in enumerate(zip(samples['clock'].tolist(), values)):
+            event = step(clock, value)
+            if event is not None:
+                yield index, event
+
+    def _step(self, clock: float, value: float) -> Optional[GloveEvent]:
+        signed = value * self._sign
+        crossed = signed <= self._off if self._active else signed >= self._on
+        if not crossed:
+            self._pending = None
+            return None
+        if self._pending is None:
+            self._pending = (clock, value)
+        start, start_value = self._pending
+        if clock - start < self._debounce:
+            return None
+        self._pending = None
+        self._active = not self._active
+        return GloveEvent(start, self.name, self._active, start_value)
+
+    def __repr__(self):
+        """String representation.
+
+        Returns:
+            str -- string representing the detector
+        """
+        return f'Hysteresis("{self.name}", {self.signal})'
+
+
+class EventPipeline:
+    """Several detectors run over the same samples."""
+
+    def __init__(self, detectors: Sequence[Hysteresis]):
+        """Set up the pipeline.
+
+        Arguments:
+            detectors {Sequence[Hysteresis]} -- detectors, events of a sample are reported
+                                                in this order
+        """
+        self.detectors = list(detectors)
+
+    def reset(self) -> None:
+        """Forget the state of all detectors."""
+        for detector in self.detectors:
+            detector.reset()
+
+    def update(self, sample: Sample) -> List[GloveEvent]:
+        """Process a sample.
+
+        Arguments:
+            sample {Sample} -- data from the glove
+
+        Returns:
+            List[GloveEvent] -- events, usually empty
+        """
+        events = []
+        for detector in self.detectors:
+            event = detector.update(sample)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def events(self, samples: Iterable[Sample]) -> Iterator[GloveEvent]:
+        """Process a stream of samples, e.g. the Glove.sampling() iterator.
+
+        Arguments:
+            samples {Iterable[Sample]} -- samples
+
+        Yields:
+            GloveEvent -- event
+        """
+        for sample in samples:
+            yield from self.update(sample)
+
+    def process(self, samples: np.ndarray) -> List[GloveEvent]:
+        """Process recorded samples, the detectors state is continued.
+
+        Arguments:
+            samples {np.ndarray} -- array of vmg30.batch.SAMPLE_DTYPE, ordered by clock
+
+        Returns:
+            List[GloveEvent] -- events in the order they are reported by update()
+        """
+        events = [(index, order, event)
+                  for order, detector in enumerate(self.detectors)
+                  for index, event in detector._process(samples)]  # pylint: disable=W0212
+        events.sort(key=lambda item: item[:2])
+        return [event for _, _, event in events]
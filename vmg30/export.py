@@ -0,0 +1,498 @@
+"""This module contains the columnar export of glove samples.
+
+Samples are flattened into typed columns (one per sensor value, e.g. 'pip_joints.1' or
+'wrist_imu.acceleration.z'), optionally with the joint angles and link positions of the hand
+model, and written in fixed-size row groups as they arrive, so the memory usage is bounded
+by one row group.
+
+The native format is a header (magic, version, JSON schema) followed by self-contained row
+groups, each one a header with the rows count and the stored size of every column followed
+by the column blocks, HDF5-style byte shuffled and compressed by a standard library codec.
+Row groups are appended with a single write, so a file is readable while it is recorded (an
+incomplete trailing row group is ignored) and a reader loads the selected columns only.
+Files named *.parquet are written and read by pyarrow instead, when it is installed.
+"""
+
+import bz2
+import json
+import lzma
+import struct
+import time
+import zlib
+from typing import Dict, Iterator, List, Sequence, Union
+
+import numpy as np
+
+from .batch import IMU_DTYPE, SAMPLE_DTYPE, decode_payloads, from_samples
+from .data import CompactSample, GloveSample
+from .error import GloveError
+from .model import HandModel
+
+__all__ = ('ColumnWriter', 'ColumnReader', 'sample_columns', 'read_columns')
+
+
+EXPORT_MAGIC = b'VMG30COL'
+EXPORT_VERSION = 1
+PARQUET_SUFFIX = '.parquet'
+
+COMPRESSIONS = {
+    'none': (lambda data, level: data, lambda data: data),
+    'zlib': (lambda data, level: zlib.compress(data, 6 if level is None else level),
+             zlib.decompress),
+    'bz2': (lambda data, level: bz2.compress(data, 9 if level is None else level),
+            bz2.decompress),
+    'lzma': (lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+
+_HEADER = struct.Struct('<8sHHI')  # magic, version, reserved, schema size
+_GROUP = struct.Struct('<4sII')  # marker, rows, columns
+_GROUP_MARKER = b'ROWG'
+
+_AXES = {3: 'xyz', 4: 'wxyz'}
+
+
+def sample_columns(samples: np.ndarray,
+                   model: HandModel = None,
+                   angles: bool = False,
+                   points: bool = False) -> Dict[str, np.ndarray]:
+    """Flatten samples into typed columns.
+
+    The device id is uint16, the clock float64, other values float32 (absent IMU data or
+    quaternions are NaN).
+
+    Arguments:
+        samples {np.ndarray} -- array of vmg30.batch.SAMPLE_DTYPE
+
+    Keyword Arguments:
+        model {HandModel} -- hand model for angles and points (default: {HandModel()})
+        angles {bool} -- add joint angles, 'angles.<link>.<axis>', degrees (default: {False})
+        points {bool} -- add link positions, 'points.<link>.<axis>' (default: {False})
+
+    Returns:
+        Dict[str, np.ndarray] -- columns of shape (N,) by name, in the schema order
+    """
+    columns = {}
+
+    def add(name, values, dtype=np.float32):
+        if values.ndim == 1:
+            columns[name] = values.astype(dtype)
+            return
+        axes = _AXES[values.shape[1]] if name.endswith('_quat') or \
+            name.startswith(('angles.', 'points.')) else range(values.shape[1])
+        for index, axis in enumerate(axes):
+            columns[f'{name}.{axis}'] = values[:, index].astype(dtype)
+
+    add('device_id', samples['device_id'], np.uint16)
+    add('clock', samples['clock'], np.float64)
+    for name in SAMPLE_DTYPE.names[2:]:
+        if name.endswith('_imu'):
+            for part in IMU_DTYPE.names:
+                for index, axis in enumerate('xyz'):
+                    columns[f'{name}.{part}.{axis}'] = \
+                        samples[name][part][:, index].astype(np.float32)
+        else:
+            add(name, samples[name])
+
+    if angles or points:
+        model = model if model is not None else HandModel()
+        names = [link.name for link in model.links]
+        if angles:
+            values = model.angles_batch(samples)
+            for index, link in enumerate(names):
+                add(f'angles.{link}', values[:, index])
+        if points:
+            values = model.points_batch(samples)
+            for index, link in enumerate(names):
+                add(f'points.{link}', values[:, index])
+    return columns
+
+
+def _shuffle(data: np.ndarray) -> bytes:
+    # bytes of the same significance are put together, which compresses better
+    return data.view(np.uint8).reshape(-1, data.itemsize).T.tobytes()
+
+
+def _unshuffle(data: bytes, dtype: np.dtype) -> np.ndarray:
+    size = len(data) // dtype.itemsize
+    return np.frombuffer(data, np.uint8).reshape(dtype.itemsize, size).T.copy().view(dtype)[:, 0]
+
+
+class ColumnWriter:
+    """Export glove samples to a columnar file as they arrive.
+
+    Samples are collected in a preallocated row group which is written out when it is full,
+    or when it waited longer than the flush interval, so recorded data become readable after
+    at most that delay.
+    """
+
+    def __init__(self,
+                 path: str,
+                 model: HandModel = None,
+                 angles: bool = False,
+                 points: bool = False,
+                 row_group_size: int = 4096,
+                 compression: str = 'zlib',
+                 level: int = None,
+                 shuffle: bool = True,
+                 flush_interval: float = None):
+        """Create the file, an existing file is overwritten.
+
+        Arguments:
+            path {str} -- file path, *.parquet for the Parquet format
+
+        Keyword Arguments:
+            model {HandModel} -- hand model for angles and points (default: {HandModel()})
+            angles {bool} -- add joint angles (default: {False})
+            points {bool} -- add link positions (default: {False})
+            row_group_size {int} -- number of rows written at once (default: {4096})
+            compression {str} -- 'none', 'zlib', 'bz2' or 'lzma', any pyarrow codec for
+                                 Parquet, e.g. 'zstd' or 'snappy' (default: {'zlib'})
+            level {int} -- compression level (default: {None for the codec default})
+            shuffle {bool} -- byte shuffle the values before compression (default: {True})
+            flush_interval {float} -- maximum time rows wait for a full row group, sec
+                                      (default: {None for no limit})
+        """
+        self._model = model if model is not None else HandModel() if angles or points else None
+        self._angles = angles
+        self._points = points
+        self._compression = compression
+        self._level = level
+        self._shuffle = shuffle
+        self._flush_interval = flush_interval
+        self._buffer = np.empty(row_group_size, SAMPLE_DTYPE)
+        self._used = 0
+        self._count = 0
+        self._deadline = None
+        self._schema = {name: values.dtype for name, values in
+                        sample_columns(self._buffer[:0], self._model, angles, points).items()}
+
+        self._parquet = None
+        self._file = None
+        if path.endswith(PARQUET_SUFFIX):
+            import pyarrow  # pylint: disable=import-outside-toplevel
+            import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+            schema = pyarrow.schema([(name, pyarrow.from_numpy_dtype(dtype))
+                                     for name, dtype in self._schema.items()])
+            self._parquet = pyarrow.parquet.ParquetWriter(
+                path, schema, compression=compression, compression_level=level)
+            return
+
+        if compression not in COMPRESSIONS:
+            raise ValueError(f'Unknown compression "{compression}"')
+        schema = json.dumps(dict(
+            columns=[[name, dtype.str] for name, dtype in self._schema.items()],
+            compression=compression, shuffle=shuffle)).encode()
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(EXPORT_MAGIC, EXPORT_VERSION, 0, len(schema)) + schema)
+        self._file.flush()
+
+    @property
+    def columns(self) -> List[str]:
+        """Names of the columns.
+
+        Returns:
+            List[str] -- names in the schema order
+        """
+        return list(self._schema)
+
+    @property
+    def row_group_size(self) -> int:
+        """Number of rows written at once.
+
+        Returns:
+            int -- rows count
+        """
+        return len(self._buffer)
+
+    @property
+    def count(self) -> int:
+        """Number of written samples, collected ones included.
+
+        Returns:
+            int -- samples count
+        """
+        return self._count + self._used
+
+    def write_payload(self, payload: bytes) -> None:
+        """Append a sample packet payload.
+
+        Arguments:
+            payload {bytes} -- payload of 0x0A packet (any buffer object)
+        """
+        self.write_array(decode_payloads(payload, len(payload), count=1))
+
+    def write_sample(self, sample: Union[GloveSample, CompactSample]) -> None:
+        """Append a decoded sample.
+
+        Arguments:
+            sample {Union[GloveSample, CompactSample]} -- sample
+        """
+        if isinstance(sample, CompactSample):
+            self.write_payload(sample.payload)
+        else:
+            self.write_array(from_samples([sample]))
+
+    def write_array(self, samples: np.ndarray) -> None:
+        """Append samples.
+
+        Arguments:
+            samples {np.ndarray} -- array of vmg30.batch.SAMPLE_DTYPE
+        """
+        size = len(self._buffer)
+        if self._used == 0 and self._flush_interval is not None:
+            self._deadline = time.monotonic() + self._flush_interval
+        while len(samples):
+            if self._used == 0 and len(samples) >= size:
+                self._write_group(samples[:size])  # full row groups are not copied
+                samples = samples[size:]
+                continue
+            count = min(size - self._used, len(samples))
+            self._buffer[self._used:self._used + count] = samples[:count]
+            self._used += count
+            samples = samples[count:]
+            if self._used == size:
+                self.flush()
+        if self._used and self._deadline is not None and time.monotonic() >= self._deadline:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write collected samples out as a row group."""
+        if self._used:
+            self._write_group(self._buffer[:self._used])
+            self._used = 0
+            self._deadline = None
+
+    def close(self) -> None:
+        """Write collected samples out and close the file."""
+        if self._parquet is not None:
+            self.flush()
+            self._parquet.close()
+            self._parquet = None
+        elif self._file is not None and not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        """Enter context guard.
+
+        Returns:
+            ColumnWriter -- this writer
+        """
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Close the file at context guard exit."""
+        self.close()
+
+    def _write_group(self, samples: np.ndarray) -> None:
+        columns = sample_columns(samples, self._model, self._angles, self._points)
+        self._count += len(samples)
+        if self._parquet is not None:
+            import pyarrow  # pylint: disable=import-outside-toplevel
+            self._parquet.write_table(pyarrow.table(columns), row_group_size=len(samples))
+            return
+
+        compress = COMPRESSIONS[self._compression][0]
+        blocks = [compress(_shuffle(values) if self._shuffle else values.tobytes(), self._level)
+                  for values in columns.values()]
+        sizes = struct.pack(f'<{len(blocks)}I', *map(len, blocks))
+        self._file.write(b''.join([_GROUP.pack(_GROUP_MARKER, len(samples), len(blocks)), sizes,
+                                   *blocks]))
+        self._file.flush()
+
+
+class ColumnReader:
+    """Read selected columns of an exported file.
+
+    Row groups appended after the file was opened are found by refresh().
+    """
+
+    def __init__(self, path: str):
+        """Open the file.
+
+        Arguments:
+            path {str} -- file path
+        """
+        self._parquet = None
+        self._file = None
+        self._groups = []  # offset of the column blocks, rows, column block sizes
+        if path.endswith(PARQUET_SUFFIX):
+            import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+            self._parquet = pyarrow.parquet.ParquetFile(path)
+            self._schema = {field.name: np.dtype(field.type.to_pandas_dtype())
+                            for field in self._parquet.schema_arrow}
+            return
+
+        self._file = open(path, 'rb')
+        header = self._file.read(_HEADER.size)
+        if len(header) < _HEADER.size or header[:len(EXPORT_MAGIC)] != EXPORT_MAGIC:
+            self._file.close()
+            raise GloveError(f'"{path}" is not an exported glove data file')
+        _, version, _, size = _HEADER.unpack(header)
+        if version != EXPORT_VERSION:
+            self._file.close()
+            raise GloveError(f'Unsupported export format version {version}')
+        schema = json.loads(self._file.read(size))
+        self._schema = {name: np.dtype(dtype) for name, dtype in schema['columns']}
+        self._decompress = COMPRESSIONS[schema['compression']][1]
+        self._shuffle = schema['shuffle']
+        self._end = _HEADER.size + size
+        self.refresh()
+
+    @property
+    def columns(self) -> List[str]:
+        """Names of the columns.
+
+        Returns:
+            List[str] -- names in the schema order
+        """
+        return list(self._schema)
+
+    @property
+    def row_groups(self) -> int:
+        """Number of complete row groups.
+
+        Returns:
+            int -- row groups count
+        """
+        if self._parquet is not None:
+            return self._parquet.num_row_groups
+        return len(self._groups)
+
+    def __len__(self) -> int:
+        """Number of rows.
+
+        Returns:
+            int -- rows count
+        """
+        if self._parquet is not None:
+            return self._parquet.metadata.num_rows
+        return sum(rows for _, rows, _ in self._groups)
+
+    def refresh(self) -> None:
+        """Find the row groups written since the last call."""
+        if self._parquet is not None:
+            return
+        self._file.seek(self._end)
+        count = len(self._schema)
+        while True:
+            header = self._file.read(_GROUP.size + 4 * count)
+            if len(header) < _GROUP.size + 4 * count:
+                break
+            marker, rows, columns = _GROUP.unpack_from(header)
+            if marker != _GROUP_MARKER or columns != count:
+                raise GloveError('Damaged row group in the exported file')
+            sizes = struct.unpack_from(f'<{count}I', header, _GROUP.size)
+            offset = self._end + len(header)
+            end = offset + sum(sizes)
+            if self._file.seek(0, 2) < end:
+                break  # being written
+            self._groups.append((offset, rows, sizes))
+            self._end = end
+            self._file.seek(end)
+
+    def read_group(self, index: int, columns: Sequence[str] = None) -> Dict[str, np.ndarray]:
+        """Read a row group.
+
+        Arguments:
+            index {int} -- row group index
+
+        Keyword Arguments:
+            columns {Sequence[str]} -- names of the columns to load (default: {None for all})
+
+        Returns:
+            Dict[str, np.ndarray] -- columns by name
+        """
+        columns = self._select(columns)
+        if self._parquet is not None:
+            table = self._parquet.read_row_group(index, columns=columns)
+            return {name: table.column(name).to_numpy() for name in columns}
+
+        offset, rows, sizes = self._groups[index]
+        wanted = set(columns)
+        values = {}
+        for name, size in zip(self._schema, sizes):
+            if name in wanted:
+                self._file.seek(offset)
+                data = self._decompress(self._file.read(size))
+                dtype = self._schema[name]
+                values[name] = _unshuffle(data, dtype) if self._shuffle else \
+                    np.frombuffer(data, dtype).copy()
+            offset += size
+        return {name: values[name] for name in columns}
+
+    def iter_groups(self, columns: Sequence[str] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """Read the row groups one by one.
+
+        Keyword Arguments:
+            columns {Sequence[str]} -- names of the columns to load (default: {None for all})
+
+        Yields:
+            Dict[str, np.ndarray] -- columns of a row group by name
+        """
+        for index in range(self.row_groups):
+            yield self.read_group(index, columns)
+
+    def read(self, columns: Sequence[str] = None) -> Dict[str, np.ndarray]:
+        """Read whole columns.
+
+        Keyword Arguments:
+            columns {Sequence[str]} -- names of the columns to load (default: {None for all})
+
+        Returns:
+            Dict[str, np.ndarray] -- columns by name
+        """
+        columns = self._select(columns)
+        groups = list(self.iter_groups(columns))
+        return {name: np.concatenate([group[name] for group in groups]) if groups else
+                np.empty(0, self._schema[name]) for name in columns}
+
+    def close(self) -> None:
+        """Close the file."""
+        if self._file is not None:
+            self._file.close()
+        self._parquet = None
+
+    def __enter__(self):
+        """Enter context guard.
+
+        Returns:
+            ColumnReader -- this reader
+        """
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Close the file at context guard exit."""
+        self.close()
+
+    def __repr__(self):
+        """String representation.
+
+        Returns:
+            str -- string representing the reader
+        """
+        return f'ColumnReader(columns={len(self._schema)}, rows={len(self)})'
+
+    def _select(self, columns: Sequence[str] = None) -> List[str]:
+        if columns is None:
+            return list(self._schema)
+        unknown = [name for name in columns if name not in self._schema]
+        if unknown:
+            raise KeyError(f'Unknown columns {unknown}')
+        return list(columns)
+
+
+def read_columns(path: str, columns: Sequence[str] = None) -> Dict[str, np.ndarray]:
+    """Read whole columns of an exported file.
+
+    Arguments:
+        path {str} -- file path
+
+    Keyword Arguments:
+        columns {Sequence[str]} -- names of the columns to load (default: {None for all})
+
+    Returns:
+        Dict[str, np.ndarray] -- columns by name
+    """
+    with ColumnReader(path) as reader:
+        return reader.read(columns)
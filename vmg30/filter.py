@@ -0,0 +1,399 @@
+"""This module contains streaming filters of glove samples.
+
+All filters keep O(1) state per channel and process either one sample at a time or whole
+recorded arrays (vmg30.batch.SAMPLE_DTYPE), the latter is a loop over time vectorized over
+channels, so both give the same result.
+"""
+
+import dataclasses
+import math
+from typing import List, Sequence, Union
+
+import numpy as np
+
+from .data import CompactSample, GloveSample, Vec3f, Vec4f
+
+__all__ = ('OneEuroFilter', 'QuaternionFilter', 'SampleFilter')
+
+
+def _alpha(dt, cutoff):
+    # smoothing factor of a first order low pass filter
+    rate = 2.0 * math.pi * cutoff * dt
+    return rate / (rate + 1.0)
+
+
+class OneEuroFilter:
+    """One euro filter of a vector of values.
+
+    The cutoff frequency grows with the speed of the values, so slow motions are smoothed
+    while fast ones get little lag. With beta equal to zero it is a plain exponential filter.
+    The derivative is estimated from the measured values (not from the filtered ones, which
+    lag), so it is also used to predict values ahead (constant velocity).
+    """
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.0, derivative_cutoff: float = 1.0):
+        """Set up the filter.
+
+        Keyword Arguments:
+            min_cutoff {float} -- cutoff frequency at rest, Hz (default: {1.0})
+            beta {float} -- cutoff frequency increase per unit of speed (default: {0.0})
+            derivative_cutoff {float} -- cutoff frequency of the derivative, Hz (default: {1.0})
+        """
+        self._min_cutoff = min_cutoff
+        self._beta = beta
+        self._derivative_cutoff = derivative_cutoff
+        self._time = None
+        self._value = None
+        self._derivative = None
+        self._last = None
+        self._buffer = None
+
+    @property
+    def value(self) -> np.ndarray:
+        """Filtered values, None before the first update.
+
+        Returns:
+            np.ndarray -- values
+        """
+        return self._value
+
+    @property
+    def derivative(self) -> np.ndarray:
+        """Filtered derivative of values, None before the first update.
+
+        Returns:
+            np.ndarray -- values per sec
+        """
+        return self._derivative
+
+    def reset(self) -> None:
+        """Forget the state, the next update starts the filter again."""
+        self._time = None
+
+    def update(self, time: float, value: np.ndarray) -> np.ndarray:
+        """Filter new values.
+
+        Arguments:
+            time {float} -- time of the values, sec
+            value {np.ndarray} -- values
+
+        Returns:
+            np.ndarray -- filtered values, the array is updated in place by the next call
+        """
+        if self._time is None or time <= self._time:
+            self._time = time
+            self._value = np.array(value, dtype=float)
+            self._derivative = np.zeros_like(self._value)
+            self._last = self._value.copy()
+            self._buffer = np.empty_like(self._value)
+            return self._value
+
+        dt = time - self._time
+        self._time = time
+        delta = np.subtract(value, self._last, out=self._buffer)
+        self._derivative += _alpha(dt, self._derivative_cutoff) * (delta / dt - self._derivative)
+        self._last[...] = value
+        delta = np.subtract(value, self._value, out=self._buffer)
+        if self._beta:
+            cutoff = self._min_cutoff + self._beta * np.abs(self._derivative)
+            rate = (2.0 * math.pi * dt) * cutoff
+            delta *= rate / (rate + 1.0)
+        else:
+            delta *= _alpha(dt, self._min_cutoff)
+        self._value += delta
+        return self._value
+
+    def predict(self, latency: float) -> np.ndarray:
+        """Extrapolate filtered values with constant velocity.
+
+        Arguments:
+            latency {float} -- time ahead, sec
+
+        Returns:
+            np.ndarray -- predicted values
+        """
+        return self._value + self._derivative * latency
+
+    def filter_array(self, times: np.ndarray, values: np.ndarray,
+                     latency: float = 0.0) -> np.ndarray:
+        """Filter a recorded sequence, the filter state is continued.
+
+        Arguments:
+            times {np.ndarray} -- times of shape (N,), sec
+            values {np.ndarray} -- values of shape (N, ...)
+
+        Keyword Arguments:
+            latency {float} -- prediction time ahead, sec (default: {0.0})
+
+        Returns:
+            np.ndarray -- filtered values of shape (N, ...)
+        """
+        result = np.empty(np.shape(values))
+        for i, time in enumerate(np.asarray(times).tolist()):
+            self.update(time, values[i])
+            result[i] = self.predict(latency) if latency else self._value
+        return result
+
+
+class QuaternionFilter:
+    """One euro filter of unit quaternions (w,x,y,z), several quaternions at once.
+
+    Each step turns the filtered orientation towards the measured one by a fraction of the
+    angle between them (spherical linear interpolation). The fraction is given by a cutoff
+    frequency growing with the angular speed, with beta equal to zero it is constant. The
+    filtered angular velocity is used to predict orientations ahead (constant velocity).
+    A handful of quaternions is processed faster by plain float math than by NumPy, so the
+    state is kept in tuples.
+    """
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.0, derivative_cutoff: float = 1.0):
+        """Set up the filter.
+
+        Keyword Arguments:
+            min_cutoff {float} -- cutoff frequency at rest, Hz (default: {1.0})
+            beta {float} -- cutoff frequency increase per rad/sec (default: {0.0})
+            derivative_cutoff {float} -- cutoff frequency of the angular velocity, Hz
+                                         (default: {1.0})
+        """
+        self._min_cutoff = min_cutoff
+        self._beta = beta
+        self._derivative_cutoff = derivative_cutoff
+        self._time = None
+        self._value = None
+        self._velocity = None
+        self._last = None
+
+    @property
+    def value(self) -> List[Vec4f]:
+        """Filtered quaternions, None before the first update.
+
+        Returns:
+            List[Vec4f] -- quaternions
+        """
+        return self._value
+
+    @property
+    def velocity(self) -> List[Vec3f]:
+        """Filtered angular velocities in the fixed frame, None before the first update.
+
+        Returns:
+            List[Vec3f] -- rotation vectors per sec
+        """
+        return self._velocity
+
+    def reset(self) -> None:
+        """Forget the state, the next update starts the filter again."""
+        self._time = None
+
+    def update(self, time: float, quats: Sequence[Vec4f]) -> List[Vec4f]:
+        """Filter new quaternions.
+
+        Arguments:
+            time {float} -- time of the quaternions, sec
+            quats {Sequence[Vec4f]} -- quaternions
+
+        Returns:
+            List[Vec4f] -- filtered quaternions
+        """
+        # a degenerate quaternion (all zeros before the IMU is ready) keeps the last one
+        last = self._last if self._last is not None else [_IDENTITY] * len(quats)
+        quats = [_normalize(quat, previous) for quat, previous in zip(quats, last)]
+        if self._time is None or time <= self._time:
+            self._time = time
+            self._value = self._last = quats
+            self._velocity = [(0.0, 0.0, 0.0)] * len(quats)
+            return self._value
+
+        dt = time - self._time
+        self._time = time
+        derivative_alpha = _alpha(dt, self._derivative_cutoff)
+        values, velocities = [], []
+        for quat, last, value, velocity in zip(quats, self._last, self._value, self._velocity):
+            rate = _rotvec(_multiply(quat, _conjugate(last)))
+            velocity = tuple(v + derivative_alpha * (r / dt - v) for v, r in zip(velocity, rate))
+            alpha = _alpha(dt, self._min_cutoff + self._beta * math.sqrt(
+                velocity[0] * velocity[0] + velocity[1] * velocity[1] +
+                velocity[2] * velocity[2]))
+            error = _rotvec(_multiply(quat, _conjugate(value)))
+            step = _quat((alpha * error[0], alpha * error[1], alpha * error[2]))
+            values.append(_normalize(_multiply(step, value), value))
+            velocities.append(velocity)
+        self._value, self._velocity, self._last = values, velocities, quats
+        return self._value
+
+    def predict(self, latency: float) -> List[Vec4f]:
+        """Extrapolate filtered quaternions with constant angular velocity.
+
+        Arguments:
+            latency {float} -- time ahead, sec
+
+        Returns:
+            List[Vec4f] -- predicted quaternions
+        """
+        return [_multiply(_quat((vx * latency, vy * latency, vz * latency)), value)
+                for (vx, vy, vz), value in zip(self._velocity, self._value)]
+
+    def filter_array(self, times: np.ndarray, quats: np.ndarray,
+                     latency: float = 0.0) -> np.ndarray:
+        """Filter a recorded sequence, the filter state is continued.
+
+        Arguments:
+            times {np.ndarray} -- times of shape (N,), sec
+            quats {np.ndarray} -- quaternions of shape (N, K, 4)
+
+        Keyword Arguments:
+            latency {float} -- prediction time ahead, sec (default: {0.0})
+
+        Returns:
+            np.ndarray -- filtered quaternions of shape (N, K, 4)
+        """
+        result = []
+        for time, row in zip(np.asarray(times).tolist(), np.asarray(quats).tolist()):
+            self.update(time, row)
+            result.append(self.predict(latency) if latency else self._value)
+        return np.array(result).reshape(np.shape(quats))
+
+
+class SampleFilter:
+    """Filter of glove samples to be placed between the glove and the hand model.
+
+    Flex and abduction sensors are filtered by a one euro filter, wrist and hand orientations
+    by a quaternion filter, both are predicted ahead by the given latency. Other fields are
+    passed as is. The sample clock is used as time, a clock going back restarts the filters.
+    """
+
+    _SENSORS = ('pip_joints', 'dip_joints', 'palm_arch', 'thumb_cross_over', 'abductions')
+
+    def __init__(self,
+                 min_cutoff: float = 1.0,
+                 beta: float = 0.0,
+                 rotation_min_cutoff: float = 1.0,
+                 rotation_beta: float = 0.0,
+                 derivative_cutoff: float = 1.0,
+                 latency: float = 0.0):
+        """Set up the filters.
+
+        Keyword Arguments:
+            min_cutoff {float} -- sensors cutoff frequency at rest, Hz (default: {1.0})
+            beta {float} -- sensors cutoff frequency increase per unit/sec (default: {0.0})
+            rotation_min_cutoff {float} -- orientations cutoff frequency at rest, Hz
+                                           (default: {1.0})
+            rotation_beta {float} -- orientations cutoff frequency increase per rad/sec
+                                     (default: {0.0})
+            derivative_cutoff {float} -- speeds cutoff frequency, Hz (default: {1.0})
+            latency {float} -- prediction time ahead, sec (default: {0.0})
+        """
+        self._latency = latency
+        self._sensors = OneEuroFilter(min_cutoff, beta, derivative_cutoff)
+        self._rotations = QuaternionFilter(rotation_min_cutoff, rotation_beta, derivative_cutoff)
+        self._values = np.empty(16)
+
+    def reset(self) -> None:
+        """Forget the state, the next sample starts the filters again."""
+        self._sensors.reset()
+        self._rotations.reset()
+
+    def __call__(self, sample: Union[GloveSample, CompactSample]) -> GloveSample:
+        """Filter a sample.
+
+        Arguments:
+            sample {Union[GloveSample, CompactSample]} -- data from the glove
+
+        Returns:
+            GloveSample -- filtered sample
+        """
+        if isinstance(sample, CompactSample):
+            sample = sample.to_sample()
+        values = self._values
+        values[0:5] = sample.pip_joints
+        values[5:10] = sample.dip_joints
+        values[10] = sample.palm_arch
+        values[11] = sample.thumb_cross_over
+        values[12:16] = sample.abductions
+        self._sensors.update(sample.clock, values)
+        values = (self._sensors.predict(self._latency) if self._latency
+                  else self._sensors.value).tolist()
+        fields = dict(
+            pip_joints=(*values[0:5],),
+            dip_joints=(*values[5:10],),
+            palm_arch=values[10],
+            thumb_cross_over=values[11],
+            abductions=(*values[12:16],))
+
+        if sample.wrist_quat is not None:
+            self._rotations.update(sample.clock, (sample.wrist_quat, sample.hand_quat))
+            quats = (self._rotations.predict(self._latency) if self._latency
+                     else self._rotations.value)
+            fields.update(wrist_quat=quats[0], hand_quat=quats[1])
+
+        return dataclasses.replace(sample, **fields)
+
+    def filter_array(self, samples: np.ndarray) -> np.ndarray:
+        """Filter recorded samples, the filter state is continued.
+
+        Arguments:
+            samples {np.ndarray} -- array of vmg30.batch.SAMPLE_DTYPE, ordered by clock
+
+        Returns:
+            np.ndarray -- filtered copy of the array
+        """
+        result = samples.copy()
+        clock = samples['clock']
+        values = np.concatenate([samples[name].reshape(len(samples), -1)
+                                 for name in self._SENSORS], axis=1)
+        values = self._sensors.filter_array(clock, values, self._latency)
+        offset = 0
+        for name in self._SENSORS:
+            column = result[name].reshape(len(result), -1)
+            column[...] = values[:, offset:offset + column.shape[1]]
+            offset += column.shape[1]
+
+        quat = ~np.isnan(samples['wrist_quat'][:, 0])
+        if quat.any():
+            quats = np.stack((samples['wrist_quat'][quat], samples['hand_quat'][quat]), axis=1)
+            quats = self._rotations.filter_array(clock[quat], quats, self._latency)
+            result['wrist_quat'][quat] = quats[:, 0]
+            result['hand_quat'][quat] = quats[:, 1]
+        return result
+
+
+_IDENTITY = (1.0, 0.0, 0.0, 0.0)
+
+
+def _normalize(quat, fallback):
+    w, x, y, z = quat
+    norm = math.sqrt(w * w + x * x + y * y + z * z)
+    if not norm > 0.0:  # zero or NaN
+        return fallback
+    return (w / norm, x / norm, y / norm, z / norm)
+
+
+def _conjugate(quat):
+    w, x, y, z = quat
+    return (w, -x, -y, -z)
+
+
+def _multiply(lhs, rhs):
+    # Hamilton product of w,x,y,z quaternions
+    w1, x1, y1, z1 = lhs
+    w2, x2, y2, z2 = rhs
+    return (w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+            w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+            w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+            w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2)
+
+
+def _rotvec(quat):
+    # rotation vector of the shortest rotation represented by a unit quaternion
+    w, x, y, z = quat if quat[0] >= 0.0 else (-quat[0], -quat[1], -quat[2], -quat[3])
+    sin = math.sqrt(x * x + y * y + z * z)
+    scale = 2.0 * math.atan2(sin, w) / sin if sin > 1e-12 else 2.0
+    return (x * scale, y * scale, z * scale)
+
+
+def _quat(rotvec):
+    # unit quaternion of a rotation vector
+    x, y, z = rotvec
+    angle = math.sqrt(x * x + y * y + z * z)
+    scale = math.sin(angle / 2.0) / angle if angle > 1e-12 else 0.5
+    return (math.cos(angle / 2.0), x * scale, y * scale, z * scale)
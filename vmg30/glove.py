@@ -1,16 +1,22 @@
 """This module contains the virtual motion glove interface."""
 
 import contextlib
-import io
 import ipaddress
+import socket
 import struct
 import time
-from typing import ContextManager, Sequence
+from typing import ContextManager, Iterator, List, Optional, Sequence, TYPE_CHECKING, Union
 
 import serial
 
-from .data import GloveSample, IMUSample
-from .error import GloveConnectionError, GloveError, GlovePacketError, GloveTimeoutError
+from .clock import ClockSync
+from .data import CompactSample, GloveSample
+from .error import GloveConnectionError, GloveError, GloveTimeoutError
+from .protocol import PacketFramer, decode_sample, encode_packet
+from .transport import open_transport
+
+if TYPE_CHECKING:  # numpy is loaded only when a profile is used
+    from .calibration import CalibrationProfile
 
 __all__ = ('Glove')
 
@@ -18,20 +24,29 @@ __all__ = ('Glove')
 class Glove:
     """Virtual motion glove (VMG30) interface."""
 
-    def __init__(self, port: str = '/dev/ttyUSB0'):
+    def __init__(self, port: Union[str, serial.Serial] = '/dev/ttyUSB0'):
         """Connect to the glove.
 
         Keyword Arguments:
-            port {str} -- serial device name (default: {'/dev/ttyUSB0'})
+            port {Union[str, serial.Serial]} -- serial device name, connection URL
+                                                (tcp://host:port, udp://host:port) or an
+                                                open serial-like connection, e.g.
+                                                emulator.FakeSerial
+                                                (default: {'/dev/ttyUSB0'})
         """
         try:
-            self._conn = serial.Serial(
-                port, baudrate=230400, timeout=2.0, write_timeout=2.0)
-            self._buffer = b''
+            if isinstance(port, str):
+                self._conn = open_transport(port)
+            else:
+                self._conn = port
+            self._framer = PacketFramer()
+            self._clock_sync = ClockSync()
+            self._profile = None
+            self._decode = decode_sample
 
             self.stop_sampling()
 
-            self._label = self._exec(0x11).decode().split('\0', 1)[0]
+            self._label = bytes(self._exec(0x11)).decode().split('\0', 1)[0]
             self._firmware = '{}.{}.{}'.format(*self._exec(0x13))
 
             info = struct.unpack('>BBHIIIBB', self._exec(0x0C))
@@ -42,11 +57,11 @@ class Glove:
             self._gateway = ipaddress.ip_address(info[5])
             self._dhcp = info[6]
 
-        except serial.SerialException as ex:
-            raise GloveConnectionError(ex.strerror)
+        except OSError as ex:  # serial.SerialException included
+            raise GloveConnectionError(ex.strerror or str(ex))
         except GloveTimeoutError:
             raise GloveConnectionError(
-                f'The glove on "{port}" is not responding, ensure it is turned on.')
+                f'The glove on "{self._conn.name}" is not responding, ensure it is turned on.')
 
     @property
     def device_id(self) -> int:
@@ -85,7 +100,7 @@ class Glove:
         """
         echo = self._exec(0x11, struct.pack(
             '16s', label.ljust(16, '\0').encode()))
-        self._label = echo.decode().split('\0', 1)[0]
+        self._label = bytes(echo).decode().split('\0', 1)[0]
 
     @property
     def firmware(self) -> str:
@@ -105,6 +120,43 @@ class Glove:
         """
         return self._device_type == 0x02
 
+    @property
+    def corrupted_packets(self) -> int:
+        """Number of damaged packets skipped since connection.
+
+        Returns:
+            int -- packets count
+        """
+        return self._framer.corrupted
+
+    @property
+    def clock_sync(self) -> ClockSync:
+        """Glove to host clock mapping, updated by the timed sampling and reset at its start.
+
+        Returns:
+            ClockSync -- clock synchronisation, with the gaps and lost samples counts
+        """
+        return self._clock_sync
+
+    @property
+    def calibration_profile(self) -> Optional['CalibrationProfile']:
+        """Sensors normalization applied to decoded samples.
+
+        Returns:
+            Optional[CalibrationProfile] -- profile, None for the firmware normalization
+        """
+        return self._profile
+
+    @calibration_profile.setter
+    def calibration_profile(self, profile: Optional['CalibrationProfile']) -> None:
+        """Set sensors normalization applied to decoded samples (compact samples excepted).
+
+        Arguments:
+            profile {Optional[CalibrationProfile]} -- profile, None for the firmware one
+        """
+        self._profile = profile
+        self._decode = decode_sample if profile is None else profile.decoder
+
     def calibration(self):
         """Start self calibration of the dataglove orientation module.
 
@@ -125,6 +177,7 @@ class Glove:
         Keyword Arguments:
             raw {bool} -- return IMU data instead of quaternions (default: {False})
         """
+        self._clock_sync.reset()
         self._send(0x0A, bytes([0x03 if raw else 0x01]))
 
     def stop_sampling(self) -> None:
@@ -134,56 +187,73 @@ class Glove:
         self._send(0x0B)
         time.sleep(0.1)
 
-    def next_sample(self) -> GloveSample:
-        """Receive next sample."""
-        data = io.BytesIO(self._recv(0x0A))
-        sample_type, device_id, clock = struct.unpack('>BHI', data.read(7))
-        raw = sample_type == 0x03
-
-        if raw:
-            values = struct.unpack('>' + 'h' * 18, data.read(36))
-            wrist_imu = IMUSample(
-                angular_velocity=(*[v / 0x8000 * 10 for v in values[0:3]],),
-                acceleration=(*[v / 0x8000 * 4 for v in values[3:6]],),
-                magnetic_field=(*values[6:9],))
-            hand_imu = IMUSample(
-                angular_velocity=(*[v / 0x8000 * 10 for v in values[9:12]],),
-                acceleration=(*[v / 0x8000 * 4 for v in values[12:15]],),
-                magnetic_field=(*values[15:18],))
-        else:
-            values = struct.unpack('>' + 'i' * 8, data.read(32))
-            wrist_quat = (*[v / 0x10000 for v in values[:4]],)
-            hand_quat = (*[v / 0x10000 for v in values[4:]],)
-
-        values = struct.unpack('>' + 'H' * 24, data.read(48))
-        return GloveSample(
-            device_id=device_id,
-            clock=clock / 1000,
-            wrist_imu=wrist_imu if raw else None,
-            hand_imu=hand_imu if raw else None,
-            wrist_quat=wrist_quat if not raw else None,
-            hand_quat=hand_quat if not raw else None,
-            pip_joints=(*[v / 1000 for v in values[1:10:2]],),
-            dip_joints=(*[v / 1000 for v in values[0:10:2]],),
-            palm_arch=values[10] / 1000,
-            thumb_cross_over=values[12] / 1000,
-            pressures=(*[1.0 - v / 999 for v in values[14:19]],),
-            abductions=(*[v / 1000 for v in values[19:23]],),
-            battery_charge=values[23] / 1000)
+    def next_sample(self, compact: bool = False) -> Union[GloveSample, CompactSample]:
+        """Receive next sample.
+
+        Keyword Arguments:
+            compact {bool} -- return a CompactSample decoded lazily, with the firmware
+                              sensors normalization (default: {False})
+
+        Returns:
+            Union[GloveSample, CompactSample] -- sample
+        """
+        if compact:
+            return CompactSample(self._recv(0x0A))
+        return self._decode(self._recv(0x0A))
+
+    def next_payload(self) -> memoryview:
+        """Receive next sample undecoded.
+
+        Returns:
+            memoryview -- payload of 0x0A packet, valid until the next receive call
+        """
+        return self._recv(0x0A)
+
+    def read_samples(self) -> List[GloveSample]:
+        """Receive the samples available without blocking, other packets are skipped.
+
+        Returns:
+            List[GloveSample] -- samples, may be empty
+        """
+        return [self._decode(payload) for payload in self.read_payloads()]
+
+    def read_payloads(self) -> Iterator[memoryview]:
+        """Receive the samples available without blocking undecoded, other packets are skipped.
+
+        Yields:
+            memoryview -- payload of 0x0A packet, valid until the next receive call
+        """
+        size = self._conn.in_waiting
+        if size:
+            self._framer.commit(self._conn.readinto(self._framer.reserve(size)))
+        while True:
+            packet = self._framer.next_packet()
+            if packet is None:
+                return
+            if packet[0] == 0x0A:
+                yield packet[1]
 
     @contextlib.contextmanager
-    def sampling(self, raw=False) -> ContextManager:
+    def sampling(self, raw=False, compact=False, timed=False) -> ContextManager:
         """"Start data sampling.
 
         Keyword Arguments:
             raw {bool} -- return IMU data instead of quaternions (default: {False})
+            compact {bool} -- return CompactSample objects decoded lazily (default: {False})
+            timed {bool} -- return TimedSample objects with the host time of the samples,
+                            see clock_sync (default: {False})
         """
         def _sample_iterator():
             while True:
-                yield self.next_sample()
+                yield self.next_sample(compact)
+
+        def _timed_iterator():
+            while True:
+                sample = self.next_sample(compact)
+                yield self._clock_sync.update(sample, time.monotonic())
 
         self.start_sampling(raw)
-        yield _sample_iterator()
+        yield _timed_iterator() if timed else _sample_iterator()
         self.stop_sampling()
 
     def set_vibro_feedback(self, levels: Sequence[float]) -> None:
@@ -192,8 +262,8 @@ class Glove:
         Arguments:
             levels {Sequence[float]} -- vibro intensity on tips of the fingers [0..1]
         """
-        values = [int(min(max(i, 0.0), 1.0) * 140 + 110) for i in levels]
-        self._send(0x60, bytes([values] + [0x00]))
+        values = [round(min(max(i, 0.0), 1.0) * 140) + 110 for i in levels]
+        self._send(0x60, bytes(values + [0x00]))
 
     def reboot(self) -> None:
         """Reboot the dataglove."""
@@ -208,6 +278,14 @@ class Glove:
         """Close connection."""
         self._conn.close()
 
+    def fileno(self) -> int:
+        """File descriptor of the connection, to wait for data with select or selectors.
+
+        Returns:
+            int -- file descriptor
+        """
+        return self._conn.fileno()
+
     def __enter__(self):
         """Enter context guard.
 
@@ -228,40 +306,24 @@ class Glove:
         """
         return f'Glove(port="{self._conn.name}", id={self.device_id}, label="{self.label}")'
 
-    def _read(self, size=1) -> bytes:
-        if size > len(self._buffer):
-            self._buffer += self._conn.read(
-                max(size - len(self._buffer), self._conn.in_waiting))
-            if size > len(self._buffer):
-                raise GloveTimeoutError('Read timeout')
-        data, self._buffer = self._buffer[:size], self._buffer[size:]
-        return data
+    def _read(self) -> None:
+        if not self._framer.read_from(self._conn):
+            raise GloveTimeoutError('Read timeout')
 
-    def _recv(self, package_type: int) -> bytes:
+    def _recv(self, package_type: int) -> memoryview:
         while True:
-            package = self._read(1)
-            if package[0] == 0x24:
-                package += self._read(2)
-                package += self._read(package[2] - 2)
-                crc, end = self._read(2)
-                if crc != sum(package) % 256 or end != 0x23:
-                    raise GlovePacketError()
-                if package[1] == package_type:
-                    package_data = package[3:]
-                    return package_data
+            packet = self._framer.next_packet()
+            if packet is None:
+                self._read()
+            elif packet[0] == package_type:
+                return packet[1]
 
     def _send(self, package_type: int, package_data: bytes = None) -> int:
         try:
-            package = bytes([0x24, package_type])
-            if package_data is not None:
-                package += bytes([len(package_data) + 2]) + package_data
-            else:
-                package += bytes([2])
-            crc = sum(package) % 256
-            return self._conn.write(package + bytes([crc, 0x23]))
-        except serial.SerialTimeoutException:
+            return self._conn.write(encode_packet(package_type, package_data))
+        except (serial.SerialTimeoutException, socket.timeout):
             raise GloveTimeoutError('Write timeout')
 
-    def _exec(self, package_type: int, package_data: bytes = None) -> bytes:
+    def _exec(self, package_type: int, package_data: bytes = None) -> memoryview:
         self._send(package_type, package_data)
         return self._recv(package_type)
@@ -0,0 +1,189 @@
+"""This module contains the vibrotactile feedback scheduler."""
+
+import threading
+import time
+from typing import Optional, Sequence, Tuple
+
+from .glove import Glove
+from .stats import Histogram
+
+__all__ = ('HapticScheduler')
+
+
+VIBRO_STEPS = 140  # the glove takes intensities from 110 to 250
+
+
+class HapticScheduler:
+    """Send vibrotactile feedback targets set at any rate to the glove.
+
+    Targets are quantized to the glove intensity steps and only the latest one is kept, a
+    command is sent when the quantized levels differ from the ones the glove has and no
+    sooner than the rate allows, so a simulator updating the contact forces at 1 kHz costs the
+    link at most rate commands per second (a command is 11 bytes of the 23 kB/s the serial
+    link carries). Commands are written either by a background thread (start() or the context
+    guard) or by calling flush() from the sampling loop; writes never wait for the reads, so
+    the sampling stream is not blocked.
+
+    The latency of a command is measured from the first target change it carries to the end
+    of the write to the connection.
+    """
+
+    def __init__(self, glove: Glove, rate: float = 100.0, steps: int = VIBRO_STEPS):
+        """Set up the scheduler.
+
+        Arguments:
+            glove {Glove} -- connected glove, or anything with set_vibro_feedback,
+                             e.g. server.GloveClient
+
+        Keyword Arguments:
+            rate {float} -- maximum number of commands per second (default: {100.0})
+            steps {int} -- intensity quantization steps, fewer steps filter out small
+                           changes (default: {140})
+        """
+        self._glove = glove
+        self._interval = 1.0 / rate
+        self._steps = steps
+        self._condition = threading.Condition()
+        self._send_lock = threading.Lock()  # keeps the writes in the order targets are taken
+        self._target = None
+        self._levels = None  # levels sent or being sent to the glove
+        self._changed = None  # perf_counter_ns of the first unsent change
+        self._next_time = 0.0
+        self._latency = Histogram()
+        self._updates = 0
+        self._sent = 0
+        self._thread = None
+        self._running = False
+        self._error = None
+
+    @property
+    def levels(self) -> Optional[Tuple[float, ...]]:
+        """Quantized levels sent to the glove.
+
+        Returns:
+            Optional[Tuple[float, ...]] -- intensities [0..1], None if nothing was sent
+        """
+        return self._levels
+
+    @property
+    def updates(self) -> int:
+        """Number of targets set.
+
+        Returns:
+            int -- targets count
+        """
+        return self._updates
+
+    @property
+    def sent(self) -> int:
+        """Number of commands sent to the glove.
+
+        Returns:
+            int -- commands count
+        """
+        return self._sent
+
+    @property
+    def latency(self) -> Histogram:
+        """Command latencies.
+
+        Returns:
+            Histogram -- latencies, nanoseconds
+        """
+        return self._latency
+
+    def set_levels(self, levels: Sequence[float]) -> None:
+        """Set the vibrotactile feedback target, returns at once.
+
+        Arguments:
+            levels {Sequence[float]} -- vibro intensity on tips of the fingers [0..1]
+        """
+        steps = self._steps
+        target = tuple(round(min(max(level, 0.0), 1.0) * steps) / steps for level in levels)
+        with self._condition:
+            if self._error is not None:
+                raise self._error
+            self._updates += 1
+            self._target = target
+            if target == self._levels:
+                self._changed = None  # the change was undone before being sent
+            elif self._changed is None:
+                self._changed = time.perf_counter_ns()
+                self._condition.notify()
+
+    def flush(self, force: bool = False) -> bool:
+        """Send the target if it changed and the rate allows.
+
+        Keyword Arguments:
+            force {bool} -- ignore the rate limit (default: {False})
+
+        Returns:
+            bool -- True if a command was sent
+        """
+        with self._send_lock:
+            with self._condition:
+                if self._changed is None:
+                    return False
+                now = time.monotonic()
+                if not force and now < self._next_time:
+                    return False
+                levels, changed = self._target, self._changed
+                self._levels = levels
+                self._changed = None
+                self._next_time = now + self._interval
+            # set_levels() only takes the condition, so it does not wait for the write
+            self._glove.set_vibro_feedback(levels)
+            self._latency.record(time.perf_counter_ns() - changed)
+            self._sent += 1
+        return True
+
+    def start(self) -> None:
+        """Start the sending thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='HapticScheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, turn_off: bool = True) -> None:
+        """Stop the sending thread.
+
+        Keyword Arguments:
+            turn_off {bool} -- stop the vibration (default: {True})
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if turn_off and self._error is None:
+            self.set_levels([0.0] * 5)
+            self.flush(force=True)
+
+    def __enter__(self):
+        """Start the sending thread at context guard enter.
+
+        Returns:
+            HapticScheduler -- this scheduler
+        """
+        self.start()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Stop the sending thread and the vibration at context guard exit."""
+        self.stop()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(
+                        lambda: self._changed is not None or not self._running)
+                    if not self._running:
+                        return
+                    delay = self._next_time - time.monotonic()
+                    if delay > 0:
+                        self._condition.wait(delay)
+                        continue
+                self.flush()
+        except Exception as ex:  # pylint: disable=broad-except
+            self._error = ex
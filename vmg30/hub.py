@@ -0,0 +1,227 @@
+"""This module contains the multiple gloves interface."""
+
+import collections
+import contextlib
+import selectors
+import time
+from typing import ContextManager, Dict, Iterator, Optional, Sequence
+
+from .clock import ClockSync
+from .data import HubFrame
+from .error import GloveError, GloveTimeoutError
+from .glove import Glove
+
+__all__ = ('GloveHub')
+
+
+class _Stream:
+    """Samples of one glove waiting to be merged."""
+
+    def __init__(self, glove: Glove):
+        self.glove = glove
+        self.clock_sync = ClockSync()
+        self.pending = collections.deque()
+
+
+class GloveHub:
+    """Sample several gloves at once and merge their samples into frames.
+
+    All gloves are read by a single selector loop. Each glove clock is mapped to the host
+    monotonic clock by a ClockSync, which follows the smallest host - glove time differences,
+    so the mapped timestamp is the earliest possible arrival time of a sample whatever the
+    clock drift or the counter wrap. Samples whose timestamps lay within a tolerance are
+    merged into one frame, a frame is emitted without the samples of a stalled glove once the
+    others waited for it longer than the maximum delay.
+    """
+
+    def __init__(self,
+                 ports: Sequence[str],
+                 tolerance: float = 0.005,
+                 max_delay: float = 0.05):
+        """Connect to the gloves.
+
+        Arguments:
+            ports {Sequence[str]} -- serial device names
+
+        Keyword Arguments:
+            tolerance {float} -- maximum timestamps difference within a frame, sec
+                                 (default: {0.005})
+            max_delay {float} -- maximum time to wait for the sample of a stalled glove, sec
+                                 (default: {0.05})
+        """
+        self._tolerance = tolerance
+        self._max_delay = max_delay
+        self._streams = {}
+        self._selector = selectors.DefaultSelector()
+        self._frames = 0
+        self._partial_frames = 0
+        try:
+            for port in ports:
+                glove = Glove(port)
+                if glove.device_id in self._streams:
+                    glove.disconnect()
+                    raise GloveError(
+                        f'The glove on "{port}" has the same id {glove.device_id} as '
+                        f'{self._streams[glove.device_id].glove}, set unique device ids.')
+                stream = _Stream(glove)
+                self._streams[glove.device_id] = stream
+                self._selector.register(glove, selectors.EVENT_READ, stream)
+        except GloveError:
+            self.disconnect()
+            raise
+
+    @property
+    def gloves(self) -> Dict[int, Glove]:
+        """Connected gloves.
+
+        Returns:
+            Dict[int, Glove] -- gloves by device id
+        """
+        return {device_id: stream.glove for device_id, stream in self._streams.items()}
+
+    @property
+    def frames(self) -> int:
+        """Number of emitted frames.
+
+        Returns:
+            int -- frames count
+        """
+        return self._frames
+
+    @property
+    def partial_frames(self) -> int:
+        """Number of emitted frames missing samples of stalled gloves.
+
+        Returns:
+            int -- frames count
+        """
+        return self._partial_frames
+
+    @property
+    def lost_samples(self) -> int:
+        """Number of samples lost by all gloves since sampling start, found by clock gaps.
+
+        Returns:
+            int -- samples count
+        """
+        return sum(stream.clock_sync.lost for stream in self._streams.values())
+
+    @property
+    def corrupted_packets(self) -> int:
+        """Number of damaged packets skipped by all gloves since connection.
+
+        Returns:
+            int -- packets count
+        """
+        return sum(stream.glove.corrupted_packets for stream in self._streams.values())
+
+    def start_sampling(self, raw=False) -> None:
+        """Start data sampling on all gloves.
+
+        Keyword Arguments:
+            raw {bool} -- return IMU data instead of quaternions (default: {False})
+        """
+        for stream in self._streams.values():
+            stream.pending.clear()
+            stream.clock_sync.reset()
+            stream.glove.start_sampling(raw)
+
+    def stop_sampling(self) -> None:
+        """Stop data sampling on all gloves."""
+        for stream in self._streams.values():
+            stream.glove.stop_sampling()
+            stream.pending.clear()
+
+    def next_frame(self, timeout: float = 2.0) -> HubFrame:
+        """Receive next frame.
+
+        Keyword Arguments:
+            timeout {float} -- maximum waiting time, sec (default: {2.0})
+
+        Returns:
+            HubFrame -- samples of the gloves
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            frame = self._pop_frame(now)
+            if frame is not None:
+                return frame
+            if now >= deadline:
+                raise GloveTimeoutError('Read timeout')
+            self._poll(min(deadline, self._flush_time()) - now)
+
+    @contextlib.contextmanager
+    def sampling(self, raw=False) -> ContextManager:
+        """"Start data sampling on all gloves.
+
+        Keyword Arguments:
+            raw {bool} -- return IMU data instead of quaternions (default: {False})
+        """
+        def _frame_iterator() -> Iterator[HubFrame]:
+            while True:
+                yield self.next_frame()
+
+        self.start_sampling(raw)
+        try:
+            yield _frame_iterator()
+        finally:
+            self.stop_sampling()
+
+    def disconnect(self) -> None:
+        """Close all connections."""
+        for stream in self._streams.values():
+            self._selector.unregister(stream.glove)
+            stream.glove.disconnect()
+        self._streams.clear()
+        self._selector.close()
+
+    def __enter__(self):
+        """Enter context guard.
+
+        Returns:
+            GloveHub -- this hub
+        """
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Disconnect the gloves at context guard exit."""
+        self.disconnect()
+
+    def __repr__(self):
+        """String representation.
+
+        Returns:
+            str -- string representing the hub
+        """
+        return f'GloveHub({", ".join(map(repr, self.gloves.values()))})'
+
+    def _poll(self, timeout: float) -> None:
+        for key, _ in self._selector.select(max(timeout, 0.0)):
+            now = time.monotonic()
+            stream = key.data
+            for sample in stream.glove.read_samples():
+                timed = stream.clock_sync.update(sample, now)
+                stream.pending.append((timed.timestamp, sample))
+
+    def _flush_time(self) -> float:
+        heads = [stream.pending[0][0] for stream in self._streams.values() if stream.pending]
+        return min(heads) + self._max_delay if heads else float('inf')
+
+    def _pop_frame(self, now: float) -> Optional[HubFrame]:
+        heads = [stream.pending[0][0] for stream in self._streams.values() if stream.pending]
+        if not heads:
+            return None
+        start = min(heads)
+        partial = len(heads) < len(self._streams)
+        if partial and now < start + self._max_delay:
+            return None
+
+        samples = {}
+        for device_id, stream in self._streams.items():
+            if stream.pending and stream.pending[0][0] <= start + self._tolerance:
+                samples[device_id] = stream.pending.popleft()[1]
+        self._frames += 1
+        if len(samples) < len(self._streams):
+            self._partial_frames += 1
+        return HubFrame(start, samples)
@@ -1,10 +1,10 @@
 """This module contains kinematic model of a hand compatible with the glove."""
 
+import math
 from dataclasses import dataclass
-from typing import Dict, Sequence, Tuple
+from typing import Dict, Mapping, Sequence, Tuple, Union
 
 import numpy as np
-from transforms3d import affines, euler
 
 from .data import GloveSample
 
@@ -12,7 +12,14 @@ __all__ = ('HandModel')
 
 
 Vec3f = Tuple[float, float, float]
+Vec4f = Tuple[float, float, float, float]
 Mat4f = np.ndarray
+Columns = Union[np.ndarray, Mapping[str, np.ndarray]]
+
+_EPS = np.finfo(float).eps
+_EPS4 = _EPS * 4.0
+_DEGREES = 180.0 / math.pi
+_IDENTITY = np.eye(4)
 
 
 @dataclass(frozen=True)
@@ -26,7 +33,11 @@ class Link:
 
 
 class HandModel:
-    """Kinematic hand model to interpret the glove sensor data."""
+    """Kinematic hand model to interpret the glove sensor data.
+
+    The link table is compiled once into arrays of parent slots, base angles and lengths.
+    Single sample methods reuse internal buffers, so an instance must not be shared by threads.
+    """
 
     def __init__(self):
         """Initialize the model."""
@@ -54,6 +65,37 @@ class HandModel:
             Link('little2', 'little1', (0.0, 0.0, 0.0), 0.025),
             Link('little3', 'little2', (0.0, 0.0, 0.0), 0.017),
         )
+        self._joints = (
+            # link, euler axis, sensor, sensor index, gain (degrees per sensor unit),
+            # per-user gains are applied to the sensor values by CalibrationProfile
+            ('wrist', 0, 'wrist_euler', 0, -_DEGREES),
+            ('wrist', 1, 'wrist_euler', 1, -_DEGREES),
+            ('wrist', 2, 'wrist_euler', 2, _DEGREES),
+            ('hand', 1, 'wrist_euler', 1, _DEGREES),
+            ('hand', 1, 'hand_euler', 1, -_DEGREES),
+            ('thumb0', 1, 'palm_arch', 0, 57.5),
+            ('thumb0', 1, 'thumb_cross_over', 0, 57.5),
+            ('thumb1', 1, 'pip_joints', 0, 20.0),
+            ('thumb1', 2, 'abductions', 0, -25.0),
+            ('thumb2', 1, 'pip_joints', 0, 30.0),
+            ('thumb3', 1, 'dip_joints', 0, 85.0),
+            ('index1', 1, 'pip_joints', 1, 70.0),
+            ('index1', 2, 'abductions', 1, -25.0),
+            ('index2', 1, 'dip_joints', 1, 100.0),
+            ('index3', 1, 'dip_joints', 1, 30.0),
+            ('middle1', 1, 'pip_joints', 2, 70.0),
+            ('middle2', 1, 'dip_joints', 2, 100.0),
+            ('middle3', 1, 'dip_joints', 2, 30.0),
+            ('ring1', 1, 'pip_joints', 3, 70.0),
+            ('ring1', 2, 'abductions', 2, 25.0),
+            ('ring2', 1, 'dip_joints', 3, 100.0),
+            ('ring3', 1, 'dip_joints', 3, 30.0),
+            ('little1', 1, 'pip_joints', 4, 70.0),
+            ('little1', 2, 'abductions', 3, 25.0),
+            ('little2', 1, 'dip_joints', 4, 100.0),
+            ('little3', 1, 'dip_joints', 4, 30.0),
+        )
+        self._compile()
 
     @property
     def links(self) -> Sequence[Link]:
@@ -82,33 +124,8 @@ class HandModel:
         Returns:
             Dict[str, Vec3f] -- euler angles (in degrees) by link name
         """
-        # pylint: disable=no-self-use
-        w_roll, w_pitch, w_yaw = np.rad2deg(euler.quat2euler(sample.wrist_quat, 'sxyz'))
-        _, h_pitch, _ = np.rad2deg(euler.quat2euler(sample.hand_quat, 'sxyz'))
-        return {
-            'wrist': (-w_roll, -w_pitch, w_yaw),
-            'hand': (0.0, w_pitch-h_pitch, 0.0),
-            'thumb0': (0.0, 57.5 * (sample.palm_arch + sample.thumb_cross_over), 0.0),
-            'thumb1': (0.0, 20.0 * sample.pip_joints[0], -25.0 * sample.abductions[0]),
-            'thumb2': (0.0, 30.0 * sample.pip_joints[0], 0.0),
-            'thumb3': (0.0, 85.0 * sample.dip_joints[0], 0.0),
-            'index0': (0.0, 0.0, 0.0),
-            'index1': (0.0, 70.0 * sample.pip_joints[1], -25.0 * sample.abductions[1]),
-            'index2': (0.0, 100.0 * sample.dip_joints[1], 0.0),
-            'index3': (0.0, 30.0 * sample.dip_joints[1], 0.0),
-            'middle0': (0.0, 0.0, 0.0),
-            'middle1': (0.0, 70.0 * sample.pip_joints[2], 0.0),
-            'middle2': (0.0, 100.0 * sample.dip_joints[2], 0.0),
-            'middle3': (0.0, 30.0 * sample.dip_joints[2], 0.0),
-            'ring0': (0.0, 0.0, 0.0),
-            'ring1': (0.0, 70.0 * sample.pip_joints[3], 25.0 * sample.abductions[2]),
-            'ring2': (0.0, 100.0 * sample.dip_joints[3], 0.0),
-            'ring3': (0.0, 30.0 * sample.dip_joints[3], 0.0),
-            'little0': (0.0, 0.0, 0.0),
-            'little1': (0.0, 70.0 * sample.pip_joints[4], 25.0 * sample.abductions[3]),
-            'little2': (0.0, 100.0 * sample.dip_joints[4], 0.0),
-            'little3': (0.0, 30.0 * sample.dip_joints[4], 0.0),
-        }
+        angles = np.dot(self._gains, _features(sample)).tolist()
+        return {link.name: (*joint,) for link, joint in zip(self._links, angles)}
 
     def frames(self,
                sample: GloveSample,
@@ -124,20 +141,30 @@ class HandModel:
         Returns:
             Dict[str, Mat4f] -- dict of link frame transformation matrix (4x4) by link name
         """
-        joints = self.angles(sample)
-        frames = {'root': np.eye(4)}
-        for link in self._links:
-            rotate = euler.euler2mat(*np.deg2rad(np.add(link.euler, joints[link.name])), 'sxyz')
-            frame = affines.compose(np.dot(rotate, [link.length, 0, 0]), rotate, [1, 1, 1])
-            frames[link.name] = np.dot(frames[link.parent], frame)
+        self._forward(_features(sample), fixed_frame, self._local, self._frames)
+        frames = self._frames[self._positions]
+        return dict(zip(['root'] + [link.name for link in self._links], frames))
 
-        if fixed_frame is not None:
-            link_name, frame = fixed_frame
-            shift = np.dot(frame, np.linalg.inv(frames[link_name]))
-            for link_name in frames:
-                frames[link_name] = np.dot(shift, frames[link_name])
+    def frames_array(self,
+                     sample: GloveSample,
+                     fixed_frame: Tuple[str, Mat4f] = None,
+                     out: np.ndarray = None) -> np.ndarray:
+        """Convert sensor data to link frames stored in one array.
+
+        Arguments:
+            sample {GloveSample} -- data from the glove
 
-        return frames
+        Keyword Arguments:
+            fixed_frame {Tuple[str, Mat4f]} -- known link frame transformation (default: {None})
+            out {np.ndarray} -- preallocated output of shape (links, 4, 4) (default: {None})
+
+        Returns:
+            np.ndarray -- link frame transformation matrices (4x4) ordered as links
+        """
+        if out is None:
+            out = np.empty((len(self._links), 4, 4))
+        self._forward(_features(sample), fixed_frame, self._local, self._frames)
+        return np.take(self._frames, self._positions[1:], axis=0, out=out)
 
     def points(self,
                sample: GloveSample,
@@ -157,3 +184,228 @@ class HandModel:
         points = {link: (*m44[:3, 3],) for link, m44 in frames.items()}
 
         return points
+
+    def angles_batch(self, samples: Columns) -> np.ndarray:
+        """Convert sensor data of many samples to euler angles in joints.
+
+        Arguments:
+            samples {Columns} -- structured array of vmg30.batch.SAMPLE_DTYPE or dict of columns
+
+        Returns:
+            np.ndarray -- euler angles (in degrees) of shape (N, links, 3), ordered as links
+        """
+        return np.tensordot(_features_batch(samples), self._gains, axes=(1, 2))
+
+    def frames_batch(self,
+                     samples: Columns,
+                     fixed_frame: Tuple[str, Mat4f] = None) -> np.ndarray:
+        """Convert sensor data of many samples to link frames.
+
+        Arguments:
+            samples {Columns} -- structured array of vmg30.batch.SAMPLE_DTYPE or dict of columns
+
+        Keyword Arguments:
+            fixed_frame {Tuple[str, Mat4f]} -- known link frame transformation (default: {None})
+
+        Returns:
+            np.ndarray -- link frame transformation matrices of shape (N, links, 4, 4)
+        """
+        features = _features_batch(samples)
+        local = np.zeros((len(features),) + self._local.shape)
+        local[..., 3, 3] = 1.0
+        frames = np.empty((len(features),) + self._frames.shape)
+        self._forward(features, fixed_frame, local, frames)
+        return frames[:, self._positions[1:]]
+
+    def points_batch(self,
+                     samples: Columns,
+                     fixed_frame: Tuple[str, Mat4f] = None) -> np.ndarray:
+        """Convert sensor data of many samples to link positions.
+
+        Arguments:
+            samples {Columns} -- structured array of vmg30.batch.SAMPLE_DTYPE or dict of columns
+
+        Keyword Arguments:
+            fixed_frame {Tuple[str, Mat4f]} -- known frame transformation (default: {None})
+
+        Returns:
+            np.ndarray -- link frame positions of shape (N, links, 3)
+        """
+        return self.frames_batch(samples, fixed_frame)[..., :3, 3]
+
+    def _compile(self) -> None:
+        # Store links level by level, children sorted by their parents, so that the parents of
+        # a level occupy a contiguous range (or a single slot) of the previous level and frames
+        # of a whole level are computed by one matrix multiplication. Slot 0 is the root frame.
+        names = [link.name for link in self._links]
+        parents = [names.index(link.parent) if link.parent in names else -1
+                   for link in self._links]
+        positions = {-1: 0}
+        order, levels = [], []
+        level = [i for i, parent in enumerate(parents) if parent < 0]
+        while level:
+            level.sort(key=lambda i: positions[parents[i]])
+            start = len(order) + 1
+            parent_positions = [positions[parents[i]] for i in level]
+            if len(set(parent_positions)) == 1:
+                parent_slots = slice(parent_positions[0], parent_positions[0] + 1)
+            elif parent_positions == list(range(
+                    parent_positions[0], parent_positions[0] + len(level))):
+                parent_slots = slice(parent_positions[0], parent_positions[-1] + 1)
+            else:
+                parent_slots = np.array(parent_positions)
+            levels.append((
+                slice(start, start + len(level)), slice(start - 1, start - 1 + len(level)),
+                parent_slots))
+            for i in level:
+                positions[i] = len(order) + 1
+                order.append(i)
+            level = [i for i, parent in enumerate(parents) if parent in level]
+
+        gains = np.zeros((len(names), 3, _FEATURES_SIZE))
+        for name, axis, sensor, index, gain in self._joints:
+            gains[names.index(name), axis, _FEATURES[sensor] + index] += gain
+
+        self._levels = levels
+        self._positions = np.array([0] + [positions[i] for i in range(len(names))])
+        self._slots = dict(root=0, **{name: positions[i] for i, name in enumerate(names)})
+        self._gains = gains
+        self._base_angles = np.deg2rad([self._links[i].euler for i in order])
+        self._joint_gains = np.deg2rad(gains[order]).reshape(-1, _FEATURES_SIZE).T
+        self._lengths = np.array([self._links[i].length for i in order])[:, None]
+        self._local = np.zeros((len(order), 4, 4))
+        self._local[:, 3, 3] = 1.0
+        self._frames = np.empty((len(order) + 1, 4, 4))
+
+    def _forward(self,
+                 features: np.ndarray,
+                 fixed_frame: Tuple[str, Mat4f],
+                 local: np.ndarray,
+                 frames: np.ndarray) -> None:
+        # Compute frames of links (in level order) from sensor features, the leading
+        # dimensions of features are batch dimensions.
+        angles = np.dot(features, self._joint_gains)
+        angles = angles.reshape(features.shape[:-1] + self._base_angles.shape)
+        angles += self._base_angles
+        _euler2mat(angles, local[..., :3, :3])
+        np.multiply(local[..., :3, 0], self._lengths, out=local[..., :3, 3])
+
+        frames[..., 0, :, :] = _IDENTITY
+        for slots, local_slots, parent_slots in self._levels:
+            np.matmul(frames[..., parent_slots, :, :], local[..., local_slots, :, :],
+                      out=frames[..., slots, :, :])
+
+        if fixed_frame is not None:
+            link_name, frame = fixed_frame
+            link_frame = frames[..., self._slots[link_name], :, :]
+            shift = np.matmul(frame, _invert_rigid(link_frame))
+            np.matmul(shift[..., None, :, :], frames, out=frames)
+
+
+_FEATURES = {
+    'wrist_euler': 0,
+    'hand_euler': 3,
+    'palm_arch': 6,
+    'thumb_cross_over': 7,
+    'pip_joints': 8,
+    'dip_joints': 13,
+    'abductions': 18,
+}
+
+_FEATURES_SIZE = 22
+
+
+def _features(sample: GloveSample) -> np.ndarray:
+    # sensor values in the order of _FEATURES
+    return np.array((
+        *_quat2euler_scalar(sample.wrist_quat),
+        *_quat2euler_scalar(sample.hand_quat),
+        sample.palm_arch,
+        sample.thumb_cross_over,
+        *sample.pip_joints,
+        *sample.dip_joints,
+        *sample.abductions))
+
+
+def _features_batch(samples: Columns) -> np.ndarray:
+    # sensor columns in the order of _FEATURES
+    return np.concatenate((
+        _quat2euler(np.asarray(samples['wrist_quat'])),
+        _quat2euler(np.asarray(samples['hand_quat'])),
+        np.asarray(samples['palm_arch'])[:, None],
+        np.asarray(samples['thumb_cross_over'])[:, None],
+        np.asarray(samples['pip_joints']),
+        np.asarray(samples['dip_joints']),
+        np.asarray(samples['abductions'])), axis=1)
+
+
+def _quat2euler_scalar(quat: Vec4f) -> Vec3f:
+    # transforms3d.euler.quat2euler(quat, 'sxyz') without array allocations
+    w, x, y, z = quat
+    norm = w * w + x * x + y * y + z * z
+    scale = 2.0 / norm if norm >= _EPS else 0.0
+    m00 = 1.0 - (y * y + z * z) * scale
+    m10 = (x * y + w * z) * scale
+    cos_y = math.hypot(m00, m10)
+    if cos_y > _EPS4:
+        return (math.atan2((y * z + w * x) * scale, 1.0 - (x * x + y * y) * scale),
+                math.atan2(-(x * z - w * y) * scale, cos_y),
+                math.atan2(m10, m00))
+    return (math.atan2(-(y * z - w * x) * scale, 1.0 - (x * x + z * z) * scale),
+            math.atan2(-(x * z - w * y) * scale, cos_y),
+            0.0)
+
+
+def _quat2euler(quat: np.ndarray) -> np.ndarray:
+    # vectorized transforms3d.euler.quat2euler(quat, 'sxyz'), quaternions are w,x,y,z
+    w, x, y, z = np.moveaxis(quat, -1, 0)
+    norm = w * w + x * x + y * y + z * z
+    scale = np.divide(2.0, norm, out=np.zeros_like(norm), where=norm >= np.finfo(float).eps)
+    m00 = 1.0 - (y * y + z * z) * scale
+    m10 = (x * y + w * z) * scale
+    m20 = (x * z - w * y) * scale
+    m21 = (y * z + w * x) * scale
+    m22 = 1.0 - (x * x + y * y) * scale
+    m11 = 1.0 - (x * x + z * z) * scale
+    m12 = (y * z - w * x) * scale
+
+    cos_y = np.hypot(m00, m10)
+    singular = cos_y <= _EPS4
+    roll = np.where(singular, np.arctan2(-m12, m11), np.arctan2(m21, m22))
+    pitch = np.arctan2(-m20, cos_y)
+    yaw = np.where(singular, 0.0, np.arctan2(m10, m00))
+    return np.stack((roll, pitch, yaw), axis=-1)
+
+
+def _euler2mat(angles: np.ndarray, out: np.ndarray) -> np.ndarray:
+    # vectorized transforms3d.euler.euler2mat(*angles, 'sxyz') written to out
+    sin, cos = np.sin(angles), np.cos(angles)
+    sin_i, sin_j, sin_k = sin[..., 0], sin[..., 1], sin[..., 2]
+    cos_i, cos_j, cos_k = cos[..., 0], cos[..., 1], cos[..., 2]
+    cos_cos, cos_sin = cos_i * cos_k, cos_i * sin_k
+    sin_cos, sin_sin = sin_i * cos_k, sin_i * sin_k
+
+    np.multiply(cos_j, cos_k, out=out[..., 0, 0])
+    np.multiply(sin_j, sin_cos, out=out[..., 0, 1])
+    out[..., 0, 1] -= cos_sin
+    np.multiply(sin_j, cos_cos, out=out[..., 0, 2])
+    out[..., 0, 2] += sin_sin
+    np.multiply(cos_j, sin_k, out=out[..., 1, 0])
+    np.multiply(sin_j, sin_sin, out=out[..., 1, 1])
+    out[..., 1, 1] += cos_cos
+    np.multiply(sin_j, cos_sin, out=out[..., 1, 2])
+    out[..., 1, 2] -= sin_cos
+    np.negative(sin_j, out=out[..., 2, 0])
+    np.multiply(cos_j, sin_i, out=out[..., 2, 1])
+    np.multiply(cos_j, cos_i, out=out[..., 2, 2])
+    return out
+
+
+def _invert_rigid(frame: np.ndarray) -> np.ndarray:
+    # inverse of rigid transformation matrices: transposed rotation and rotated back translation
+    inverse = np.zeros_like(frame)
+    rotate = np.swapaxes(frame[..., :3, :3], -1, -2)
+    inverse[..., :3, :3] = rotate
+    inverse[..., :3, 3] = -np.matmul(rotate, frame[..., :3, 3, None])[..., 0]
+    inverse[..., 3, 3] = 1.0
+    return inverse
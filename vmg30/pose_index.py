@@ -0,0 +1,299 @@
+"""This module contains the hand pose similarity index for gestures lookup."""
+
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .batch import from_samples
+from .data import GloveSample
+from .model import HandModel
+from .record import RecordReader
+
+__all__ = ('PoseIndex')
+
+
+FEATURES = ('angles', 'tips')
+
+_ORIENTATION_LINKS = ('wrist', 'hand')  # global orientation, not a part of the pose
+
+
+class PoseIndex:
+    """Nearest neighbour index of hand poses.
+
+    A pose is described either by the joint angles of the fingers (radians) or by the finger
+    tip positions in the hand frame divided by the middle finger length, the wrist and hand
+    orientation is left out. Features are kept in one growing float32 matrix along with their
+    squared norms, so a query is a single matrix product followed by a partial sort. This
+    brute-force layout answers k-NN queries over thousands of poses in well under a millisecond
+    and, unlike a tree, takes inserts at no cost.
+    """
+
+    def __init__(self,
+                 features: str = 'angles',
+                 model: HandModel = None,
+                 capacity: int = 1024):
+        """Create an empty index.
+
+        Keyword Arguments:
+            features {str} -- 'angles' or 'tips' (default: {'angles'})
+            model {HandModel} -- hand model (default: {HandModel()})
+            capacity {int} -- initial number of poses, the storage grows as needed
+                              (default: {1024})
+        """
+        if features not in FEATURES:
+            raise ValueError(f'Unknown pose features "{features}"')
+        self._kind = features
+        self._model = model if model is not None else HandModel()
+        names = [link.name for link in self._model.links]
+        self._angle_links = [i for i, name in enumerate(names)
+                             if name not in _ORIENTATION_LINKS]
+        self._hand_link = names.index('hand')
+        self._tip_links = [names.index(name) for name in self._model.tip_names]
+        self._scale = sum(link.length for link in self._model.links
+                          if link.name.startswith('middle'))
+        self._size = 0
+        self._features = np.empty((capacity, self.dimension), np.float32)
+        self._norms = np.empty(capacity, np.float32)
+        self._labels = []
+
+    @property
+    def features(self) -> str:
+        """Kind of the pose features.
+
+        Returns:
+            str -- 'angles' or 'tips'
+        """
+        return self._kind
+
+    @property
+    def dimension(self) -> int:
+        """Number of features of a pose.
+
+        Returns:
+            int -- features count
+        """
+        if self._kind == 'angles':
+            return len(self._angle_links) * 3
+        return len(self._tip_links) * 3
+
+    @property
+    def labels(self) -> List[str]:
+        """Labels of the indexed poses.
+
+        Returns:
+            List[str] -- labels in the insertion order
+        """
+        return self._labels
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Features of the indexed poses.
+
+        Returns:
+            np.ndarray -- features of shape (poses, dimension), a view of the storage
+        """
+        return self._features[:self._size]
+
+    def __len__(self) -> int:
+        """Number of indexed poses.
+
+        Returns:
+            int -- poses count
+        """
+        return self._size
+
+    def featurize(self, samples: Union[GloveSample, Sequence[GloveSample], np.ndarray]):
+        """Compute pose features.
+
+        Arguments:
+            samples {Union[GloveSample, Sequence[GloveSample], np.ndarray]} -- a sample,
+                samples or a structured array of vmg30.batch.SAMPLE_DTYPE
+
+        Returns:
+            np.ndarray -- features of shape (dimension,) for a sample, (N, dimension) else
+        """
+        if isinstance(samples, GloveSample) or hasattr(samples, 'to_sample'):
+            if self._kind == 'angles':
+                angles = self._model.angles(samples)
+                joints = np.array(list(angles.values()))[self._angle_links]
+                return np.deg2rad(joints.ravel())
+            frames = self._model.frames_array(samples)
+            return self._tips(frames).ravel()
+
+        if not isinstance(samples, np.ndarray):
+            samples = from_samples(list(samples))
+        if self._kind == 'angles':
+            angles = self._model.angles_batch(samples)[:, self._angle_links]
+            return np.deg2rad(angles.reshape(len(samples), -1))
+        frames = self._model.frames_batch(samples)
+        return self._tips(frames).reshape(len(samples), -1)
+
+    def add(self,
+            samples: Union[GloveSample, Sequence[GloveSample], np.ndarray],
+            labels: Union[str, Sequence[str]]) -> None:
+        """Insert poses.
+
+        Arguments:
+            samples {Union[GloveSample, Sequence[GloveSample], np.ndarray]} -- a sample,
+                samples or a structured array of vmg30.batch.SAMPLE_DTYPE
+            labels {Union[str, Sequence[str]]} -- a label for all poses or per pose
+        """
+        self.add_features(self.featurize(samples), labels)
+
+    def add_features(self, features: np.ndarray, labels: Union[str, Sequence[str]]) -> None:
+        """Insert poses given by their features.
+
+        Arguments:
+            features {np.ndarray} -- features of shape (dimension,) or (N, dimension)
+            labels {Union[str, Sequence[str]]} -- a label for all poses or per pose
+        """
+        features = np.asarray(features, np.float32).reshape(-1, self.dimension)
+        count = len(features)
+        labels = [labels] * count if isinstance(labels, str) else list(labels)
+        if len(labels) != count:
+            raise ValueError('Number of labels does not match the number of poses')
+
+        if self._size + count > len(self._features):
+            capacity = max(2 * len(self._features), self._size + count)
+            self._features = np.resize(self._features, (capacity, self.dimension))
+            self._norms = np.resize(self._norms, capacity)
+        end = self._size + count
+        self._features[self._size:end] = features
+        self._norms[self._size:end] = np.einsum('ij,ij->i', features, features)
+        self._labels += labels
+        self._size = end
+
+    def add_recording(self, path: str, label: str, step: int = 1) -> int:
+        """Insert poses of a recording.
+
+        Arguments:
+            path {str} -- recording file
+            label {str} -- label of all poses
+
+        Keyword Arguments:
+            step {int} -- insert every step-th sample (default: {1})
+
+        Returns:
+            int -- number of inserted poses
+        """
+        with RecordReader(path) as reader:
+            samples = reader.to_array()[::step]
+        self.add(samples, label)
+        return len(samples)
+
+    def query(self,
+              samples: Union[GloveSample, Sequence[GloveSample], np.ndarray],
+              k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the nearest indexed poses.
+
+        Arguments:
+            samples {Union[GloveSample, Sequence[GloveSample], np.ndarray]} -- a sample,
+                samples or a structured array of vmg30.batch.SAMPLE_DTYPE
+
+        Keyword Arguments:
+            k {int} -- number of neighbours (default: {1})
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray] -- euclidean distances and pose indices sorted by
+                distance, of shape (k,) for a sample, (N, k) else
+        """
+        return self.query_features(self.featurize(samples), k)
+
+    def query_features(self, features: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the nearest indexed poses to the given features.
+
+        Arguments:
+            features {np.ndarray} -- features of shape (dimension,) or (N, dimension)
+
+        Keyword Arguments:
+            k {int} -- number of neighbours (default: {1})
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray] -- euclidean distances and pose indices sorted by
+                distance, of shape (k,) or (N, k)
+        """
+        if not self._size:
+            raise ValueError('The pose index is empty')
+        features = np.asarray(features, np.float32)
+        k = min(k, self._size)
+        matrix = self._features[:self._size]
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2
+        distances = np.dot(features, matrix.T)
+        distances *= -2.0
+        distances += self._norms[:self._size]
+        distances += np.einsum('...i,...i->...', features, features)[..., None]
+        if k < self._size:
+            nearest = np.argpartition(distances, k - 1, axis=-1)[..., :k]
+        else:
+            nearest = np.broadcast_to(np.arange(self._size), distances.shape)
+        nearest_distances = np.take_along_axis(distances, nearest, axis=-1)
+        order = np.argsort(nearest_distances, axis=-1)
+        nearest = np.take_along_axis(nearest, order, axis=-1)
+        nearest_distances = np.take_along_axis(nearest_distances, order, axis=-1)
+        return np.sqrt(np.maximum(nearest_distances, 0.0)), nearest
+
+    def classify(self,
+                 sample: GloveSample,
+                 k: int = 5,
+                 max_distance: float = None) -> Optional[str]:
+        """Label a pose by the majority of its nearest neighbours.
+
+        Arguments:
+            sample {GloveSample} -- data from the glove
+
+        Keyword Arguments:
+            k {int} -- number of neighbours (default: {5})
+            max_distance {float} -- neighbours further away are ignored (default: {None})
+
+        Returns:
+            Optional[str] -- label, None if no neighbour is close enough
+        """
+        distances, indices = self.query(sample, k)
+        votes = {}
+        for distance, index in zip(distances, indices):
+            if max_distance is None or distance <= max_distance:
+                label = self._labels[index]
+                votes[label] = votes.get(label, 0) + 1
+        return max(votes, key=votes.get) if votes else None
+
+    def save(self, path: str) -> None:
+        """Store the index.
+
+        Arguments:
+            path {str} -- .npz file path
+        """
+        np.savez(path, features=self.matrix, labels=np.array(self._labels, str),
+                 kind=np.array(self._kind))
+
+    @classmethod
+    def load(cls, path: str, model: HandModel = None) -> 'PoseIndex':
+        """Load a stored index, more poses can be inserted.
+
+        Arguments:
+            path {str} -- .npz file path
+
+        Keyword Arguments:
+            model {HandModel} -- hand model (default: {HandModel()})
+
+        Returns:
+            PoseIndex -- index
+        """
+        with np.load(path) as data:
+            index = cls(str(data['kind']), model, max(len(data['features']), 1))
+            index.add_features(data['features'], data['labels'].tolist())
+        return index
+
+    def __repr__(self):
+        """String representation.
+
+        Returns:
+            str -- string representing the index
+        """
+        return f'PoseIndex(features="{self._kind}", poses={self._size})'
+
+    def _tips(self, frames: np.ndarray) -> np.ndarray:
+        # tip positions in the hand frame, scaled by the middle finger length
+        hand = frames[..., self._hand_link, :, :]
+        tips = np.take(frames, self._tip_links, axis=-3)[..., :3, 3] - hand[..., None, :3, 3]
+        rotation = hand[..., :3, :3]
+        return np.einsum('...ji,...tj->...ti', rotation, tips) / self._scale
@@ -0,0 +1,371 @@
+"""This module contains the glove packet protocol helpers."""
+
+import dataclasses
+import struct
+from typing import Optional, Sequence, Tuple
+from zlib import adler32
+
+from .data import GloveSample, IMUSample
+
+__all__ = ('PacketFramer', 'SampleDecoder', 'encode_packet', 'decode_sample', 'encode_sample')
+
+
+PACKET_START = 0x24
+PACKET_END = 0x23
+
+# The checksum covers the start, type and length bytes and the payload, the length byte counts
+# the payload and the 2 trailing bytes, so at most 256 bytes are summed. Their sum is then
+# below the Adler-32 modulus and the low half of adler32() is exactly 1 + the byte sum, which
+# next_packet() uses to sum the bytes in C.
+_MAX_CHECKED_SIZE = 0xFF + 1
+assert 1 + 0xFF * _MAX_CHECKED_SIZE < 65521
+
+
+def encode_packet(package_type: int, package_data: bytes = None) -> bytes:
+    """Build a framed packet.
+
+    Arguments:
+        package_type {int} -- packet type (command code)
+
+    Keyword Arguments:
+        package_data {bytes} -- packet payload (default: {None})
+
+    Returns:
+        bytes -- packet ready to be sent to the glove
+    """
+    if package_data is None:
+        package_data = b''
+    package = bytes([PACKET_START, package_type, len(package_data) + 2]) + package_data
+    return package + bytes([sum(package) % 256, PACKET_END])
+
+
+class PacketFramer:
+    """Split a byte stream into glove packets.
+
+    Incoming bytes are written directly into a preallocated buffer, packets are located and
+    validated in place and their payloads are returned as memory views, so no intermediate
+    copies are made. Unread bytes are moved to the beginning of the buffer only when there is
+    not enough free space at its end, so a packet always occupies a contiguous region.
+
+    Damaged packets (wrong length, checksum or end marker) are skipped and counted, the framer
+    resynchronizes on the next start byte.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        """Allocate the buffer.
+
+        Keyword Arguments:
+            capacity {int} -- buffer size in bytes, must fit several packets (default: {4096})
+        """
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self._corrupted = 0
+        self._resyncs = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered bytes not consumed yet.
+
+        Returns:
+            int -- size in bytes
+        """
+        return self._end - self._start
+
+    @property
+    def missing(self) -> int:
+        """Minimal number of bytes needed to complete the next packet.
+
+        Returns:
+            int -- size in bytes (at least 1)
+        """
+        pending = self._end - self._start
+        if pending < 3:
+            return 5 - pending
+        return max(self._buffer[self._start + 2] + 3 - pending, 1)
+
+    @property
+    def corrupted(self) -> int:
+        """Number of damaged packets skipped so far.
+
+        Returns:
+            int -- packets count
+        """
+        return self._corrupted
+
+    @property
+    def resyncs(self) -> int:
+        """Number of times bytes were skipped looking for a packet start so far.
+
+        Returns:
+            int -- resynchronizations count
+        """
+        return self._resyncs
+
+    def reserve(self, size: int) -> memoryview:
+        """Get a writable region at the end of the buffered data.
+
+        Arguments:
+            size {int} -- wanted size in bytes
+
+        Returns:
+            memoryview -- region of at most {size} bytes, fill it and call commit()
+        """
+        if len(self._buffer) - self._end < size and self._start > 0:
+            pending = self._end - self._start
+            self._view[:pending] = self._view[self._start:self._end]
+            self._start, self._end = 0, pending
+        return self._view[self._end:min(self._end + size, len(self._buffer))]
+
+    def commit(self, size: int) -> None:
+        """Append bytes written to the region returned by reserve().
+
+        Arguments:
+            size {int} -- number of bytes written
+        """
+        self._end += size
+
+    def read_from(self, conn) -> int:
+        """Append the bytes waiting in a connection.
+
+        At least the bytes missing to complete the next packet are read, blocking for them,
+        so call it when next_packet() returns None.
+
+        Arguments:
+            conn -- serial port or anything with in_waiting and readinto()
+
+        Returns:
+            int -- number of bytes read, 0 on timeout
+        """
+        count = conn.readinto(self.reserve(max(self.missing, conn.in_waiting)))
+        self._end += count
+        return count
+
+    def feed(self, data: bytes) -> None:
+        """Append bytes to the buffer.
+
+        Arguments:
+            data {bytes} -- received bytes
+        """
+        view = self.reserve(len(data))
+        if len(view) < len(data):
+            raise BufferError('Packet buffer overflow')
+        view[:] = data
+        self.commit(len(data))
+
+    def clear(self) -> None:
+        """Drop all buffered bytes."""
+        self._start = self._end = 0
+
+    def next_packet(self) -> Optional[Tuple[int, memoryview]]:
+        """Extract the next complete packet from the buffer.
+
+        The returned payload is a view into the buffer, it is valid until the next call of
+        reserve() or feed().
+
+        Returns:
+            Optional[Tuple[int, memoryview]] -- packet type and payload or None if incomplete
+        """
+        buffer, view, stop = self._buffer, self._view, self._end
+        start = self._start
+        while True:
+            if start == stop:
+                self._start = self._end = 0
+                return None
+            if buffer[start] != PACKET_START:
+                self._resyncs += 1
+                start = buffer.find(PACKET_START, start, stop)
+                if start < 0:
+                    self._start = self._end = 0
+                    return None
+            if stop - start < 3:
+                self._start = start
+                return None
+            end = start + buffer[start + 2] + 3
+            if end - start < 5:
+                start += 1
+                self._corrupted += 1
+                continue
+            if end > stop:
+                self._start = start
+                return None
+            # sum(view[start:end - 2]) & 0xFF, see _MAX_CHECKED_SIZE
+            if buffer[end - 1] != PACKET_END or \
+                    buffer[end - 2] != (adler32(view[start:end - 2]) - 1) & 0xFF:
+                start += 1
+                self._corrupted += 1
+                continue
+            self._start = end
+            return buffer[start + 1], view[start + 3:end - 2]
+
+
+SENSOR_DIVISORS = (1000,) * 14 + (-999,) * 5 + (1000,) * 5
+
+
+class _SampleLayout:
+    """Precompiled decoder of one sample type.
+
+    The decoding code is generated once per layout, like namedtuple methods: values are
+    unpacked at once into local variables and every field is built by an expression with the
+    divisors and offsets inlined as constants, so a sample costs a single unpack and no
+    intermediate lists.
+    """
+
+    def __init__(self, unpack: str, value_format: str, groups: int, group_size: int,
+                 divisor: int,
+                 sensor_divisors: Sequence[float] = SENSOR_DIVISORS,
+                 sensor_offsets: Sequence[float] = None):
+        count = groups * group_size
+        self.struct = struct.Struct(f'>BHI{count}{value_format}24H')
+        self.divisors = (1, 1, 1000) + (divisor,) * count + tuple(sensor_divisors)
+
+        def sensor(index):
+            value = f's{index} / {sensor_divisors[index]!r}'
+            if sensor_offsets is None:
+                return value
+            return f'({value} + {float(sensor_offsets[index])!r})'
+
+        def vector(items):
+            return f'({", ".join(items)},)'
+
+        def instance(name, cls, fields):
+            # bypass the frozen dataclass __init__: the fields are stored in their declaration
+            # order directly into the instance dictionary, which keeps it key-sharing; this is
+            # only valid for a plain dataclass, so any change of the class fails loudly here
+            names = tuple(field.name for field in dataclasses.fields(cls))
+            if tuple(fields) != names or '__slots__' in vars(cls) or \
+                    hasattr(cls, '__post_init__'):
+                raise TypeError(f'{cls.__name__} is not the plain dataclass the sample decoder '
+                                'is generated for, update _SampleLayout')
+            return [f'{name} = new({cls.__name__})', f'fields = {name}.__dict__'] + \
+                [f'fields["{key}"] = {value}' for key, value in fields.items()]
+
+        values = [f'v{i}' for i in range(count)]
+        lines = [f'_, device_id, clock, {", ".join(values)}, '
+                 f'{", ".join(f"s{i}" for i in range(24))} = {unpack}(payload)']
+        if value_format == 'h':  # raw IMU: gyroscope, accelerometer, magnetometer triples
+            for name, first in (('wrist', 0), ('hand', 9)):
+                lines += instance(name, IMUSample, dict(
+                    # v / divisor * scale as a single product, the same float for a power
+                    # of two divisor
+                    angular_velocity=vector(
+                        f'{v} * {10 / divisor!r}' for v in values[first:first + 3]),
+                    acceleration=vector(
+                        f'{v} * {4 / divisor!r}' for v in values[first + 3:first + 6]),
+                    magnetic_field=vector(values[first + 6:first + 9])))
+            imus, quats = ('wrist', 'hand'), ('None', 'None')
+        else:
+            imus = ('None', 'None')
+            quats = (vector(f'{v} / {divisor}' for v in values[:4]),
+                     vector(f'{v} / {divisor}' for v in values[4:]))
+        lines += instance('sample', GloveSample, dict(
+            device_id='device_id',
+            clock='clock / 1000',
+            wrist_imu=imus[0],
+            hand_imu=imus[1],
+            wrist_quat=quats[0],
+            hand_quat=quats[1],
+            pip_joints=vector(sensor(i) for i in range(1, 10, 2)),
+            dip_joints=vector(sensor(i) for i in range(0, 10, 2)),
+            palm_arch=sensor(10),
+            thumb_cross_over=sensor(12),
+            abductions=vector(sensor(i) for i in range(19, 23)),
+            pressures=vector(f'1.0 + {sensor(i)}' for i in range(14, 19)),
+            battery_charge=sensor(23)))
+        lines.append('return sample')
+        self.lines = lines
+
+
+class SampleDecoder:
+    """Sample packet payload decoder with a given sensors normalization.
+
+    A sensor value v is normalized as v / divisor + offset, pressures are then inverted as
+    1 + v / divisor + offset (their divisors are negative). The default normalization is the
+    one of the glove firmware: v / 1000 and 1 - v / 999 for pressures.
+    """
+
+    def __init__(self,
+                 sensor_divisors: Sequence[float] = SENSOR_DIVISORS,
+                 sensor_offsets: Sequence[float] = None):
+        """Precompile the decoder.
+
+        Keyword Arguments:
+            sensor_divisors {Sequence[float]} -- divisors of the 24 sensors
+                                                 (default: {SENSOR_DIVISORS})
+            sensor_offsets {Sequence[float]} -- offsets of the 24 sensors (default: {None})
+        """
+        self._quat_layout = _SampleLayout(
+            'unpack_quat', 'i', 2, 4, 0x10000, sensor_divisors, sensor_offsets)
+        self._raw_layout = _SampleLayout(
+            'unpack_raw', 'h', 6, 3, 0x8000, sensor_divisors, sensor_offsets)
+        source = 'def decode(payload):\n    if payload[0] == 0x03:\n' + \
+            ''.join(f'        {line}\n' for line in self._raw_layout.lines) + \
+            ''.join(f'    {line}\n' for line in self._quat_layout.lines)
+        namespace = dict(unpack_quat=self._quat_layout.struct.unpack_from,
+                         unpack_raw=self._raw_layout.struct.unpack_from,
+                         new=object.__new__, GloveSample=GloveSample, IMUSample=IMUSample)
+        exec(source, namespace)  # pylint: disable=exec-used
+        self._decode = namespace['decode']
+
+    def __call__(self, payload: bytes) -> GloveSample:
+        """Decode a sample packet payload.
+
+        Arguments:
+            payload {bytes} -- payload of 0x0A packet (any buffer object)
+
+        Returns:
+            GloveSample -- decoded sample
+        """
+        return self._decode(payload)
+
+
+_DEFAULT_DECODER = SampleDecoder()
+_QUAT_LAYOUT = _DEFAULT_DECODER._quat_layout  # pylint: disable=protected-access
+_RAW_LAYOUT = _DEFAULT_DECODER._raw_layout  # pylint: disable=protected-access
+_DEFAULT_DECODE = _DEFAULT_DECODER._decode  # pylint: disable=protected-access
+
+
+def decode_sample(payload: bytes) -> GloveSample:
+    """Decode a sample packet payload with the default sensors normalization.
+
+    Arguments:
+        payload {bytes} -- payload of 0x0A packet (any buffer object)
+
+    Returns:
+        GloveSample -- decoded sample
+    """
+    return _DEFAULT_DECODE(payload)
+
+
+def encode_sample(sample: GloveSample) -> bytes:
+    """Encode a sample back to a packet payload, the inverse of decode_sample.
+
+    Arguments:
+        sample {GloveSample} -- sample
+
+    Returns:
+        bytes -- payload of 0x0A packet
+    """
+    raw = sample.wrist_quat is None
+    layout = _RAW_LAYOUT if raw else _QUAT_LAYOUT
+    if raw:
+        values = []
+        for imu in (sample.wrist_imu, sample.hand_imu):
+            values += [v / 10 for v in imu.angular_velocity]
+            values += [v / 4 for v in imu.acceleration]
+            values += [v / 0x8000 for v in imu.magnetic_field]
+    else:
+        values = [*sample.wrist_quat, *sample.hand_quat]
+
+    sensors = [0.0] * 24
+    sensors[0:10:2] = sample.dip_joints
+    sensors[1:10:2] = sample.pip_joints
+    sensors[10] = sample.palm_arch
+    sensors[12] = sample.thumb_cross_over
+    sensors[14:19] = [v - 1.0 for v in sample.pressures]
+    sensors[19:23] = sample.abductions
+    sensors[23] = sample.battery_charge
+
+    scaled = [0x03 if raw else 0x01, sample.device_id, sample.clock] + values + sensors
+    return layout.struct.pack(*[round(v * d) for v, d in zip(scaled, layout.divisors)])
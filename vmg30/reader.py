@@ -0,0 +1,188 @@
+"""This module contains the background glove reader."""
+
+import collections
+import threading
+from typing import Iterator, Optional
+
+from .data import GloveSample
+from .error import GloveTimeoutError
+from .glove import Glove
+
+__all__ = ('GloveReader')
+
+
+class GloveReader:
+    """Read glove samples in a background thread.
+
+    The thread drains the glove continuously into a bounded queue, so a slow consumer does not
+    let the serial buffer (and the latency) grow. When the queue is full the oldest sample is
+    dropped, or the reader waits for the consumer if blocking is requested.
+    """
+
+    def __init__(self,
+                 glove: Glove,
+                 raw: bool = False,
+                 queue_size: int = 256,
+                 block: bool = False):
+        """Set up the reader, call start() or use it as a context guard to run it.
+
+        Arguments:
+            glove {Glove} -- connected glove
+
+        Keyword Arguments:
+            raw {bool} -- return IMU data instead of quaternions (default: {False})
+            queue_size {int} -- maximum number of queued samples (default: {256})
+            block {bool} -- wait for the consumer instead of dropping samples (default: {False})
+        """
+        self._glove = glove
+        self._raw = raw
+        self._block = block
+        self._queue = collections.deque(maxlen=None if block else queue_size)
+        self._queue_size = queue_size
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._error = None
+        self._latest = None
+        self._received = 0
+        self._dropped = 0
+        self._timeouts = 0
+
+    @property
+    def received(self) -> int:
+        """Number of samples received from the glove.
+
+        Returns:
+            int -- samples count
+        """
+        return self._received
+
+    @property
+    def dropped(self) -> int:
+        """Number of samples dropped because the queue was full.
+
+        Returns:
+            int -- samples count
+        """
+        return self._dropped
+
+    @property
+    def corrupted(self) -> int:
+        """Number of damaged packets skipped by the glove connection.
+
+        Returns:
+            int -- packets count
+        """
+        return self._glove.corrupted_packets
+
+    @property
+    def timeouts(self) -> int:
+        """Number of read timeouts.
+
+        Returns:
+            int -- timeouts count
+        """
+        return self._timeouts
+
+    def start(self) -> None:
+        """Start sampling and the reader thread."""
+        self._running = True
+        self._glove.start_sampling(self._raw)
+        self._thread = threading.Thread(target=self._run, name='GloveReader', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the reader thread and sampling."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_latest(self) -> Optional[GloveSample]:
+        """Get the most recent sample without waiting, queued samples are not affected.
+
+        Returns:
+            Optional[GloveSample] -- last received sample or None
+        """
+        self._raise_error()
+        return self._latest
+
+    def get(self, timeout: float = None) -> GloveSample:
+        """Take the oldest queued sample, wait for it if the queue is empty.
+
+        Keyword Arguments:
+            timeout {float} -- maximum waiting time, sec (default: {None})
+
+        Returns:
+            GloveSample -- sample
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._queue or not self._running, timeout):
+                raise GloveTimeoutError('Read timeout')
+            if not self._queue:
+                self._raise_error()
+                raise GloveTimeoutError('Reader is stopped')
+            sample = self._queue.popleft()
+            self._condition.notify_all()
+            return sample
+
+    def __iter__(self) -> Iterator[GloveSample]:
+        """Iterate over queued samples until the reader is stopped.
+
+        Yields:
+            GloveSample -- sample
+        """
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or not self._running)
+                if not self._queue:
+                    self._raise_error()
+                    return
+                sample = self._queue.popleft()
+                self._condition.notify_all()
+            yield sample
+
+    def __enter__(self):
+        """Start the reader at context guard enter.
+
+        Returns:
+            GloveReader -- this reader
+        """
+        self.start()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Stop the reader at context guard exit."""
+        self.stop()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        try:
+            while self._running:
+                try:
+                    sample = self._glove.next_sample()
+                except GloveTimeoutError:
+                    self._timeouts += 1
+                    continue
+                with self._condition:
+                    if self._block:
+                        self._condition.wait_for(
+                            lambda: len(self._queue) < self._queue_size or not self._running)
+                    elif len(self._queue) == self._queue_size:
+                        self._dropped += 1
+                    self._queue.append(sample)
+                    self._latest = sample
+                    self._received += 1
+                    self._condition.notify_all()
+            self._glove.stop_sampling()
+        except Exception as ex:  # pylint: disable=broad-except
+            self._error = ex
+        finally:
+            with self._condition:
+                self._running = False
+                self._condition.notify_all()
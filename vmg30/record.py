@@ -0,0 +1,387 @@
+"""This module contains the streaming recording format of glove samples.
+
+A recording is a 16 bytes header followed by fixed size records. The header holds the magic
+string, the format version and the record size. Each record is a validated sample packet
+payload padded with zeros, so a recording can be appended to without any index and read
+at random positions. An incomplete trailing record (left by a crash) is ignored.
+
+The clock to record index is kept in a sidecar NumPy file next to the recording.
+"""
+
+import mmap
+import os
+import struct
+import time
+from typing import Iterator, Union
+
+import numpy as np
+
+from .batch import decode_payloads
+from .data import CompactSample, GloveSample
+from .error import GloveError
+from .protocol import decode_sample, encode_sample
+
+__all__ = ('RecordReader', 'RecordWriter', 'is_recording', 'read_samples')
+
+
+RECORD_MAGIC = b'VMG30REC'
+RECORD_VERSION = 1
+RECORD_SIZE = 96
+INDEX_SUFFIX = '.idx.npy'
+
+_HEADER = struct.Struct('<8sHH4x')
+_CLOCK_OFFSET = 3
+_PAYLOAD_SIZES = {0x01: 87, 0x03: 91}  # quaternion and raw IMU samples
+
+
+def is_recording(path: str) -> bool:
+    """Check whether a file is a streaming recording.
+
+    Arguments:
+        path {str} -- file path
+
+    Returns:
+        bool -- True if the file starts with the recording magic
+    """
+    with open(path, 'rb') as file:
+        return file.read(len(RECORD_MAGIC)) == RECORD_MAGIC
+
+
+def read_samples(path: str, chunk_size: int = 1024) -> Iterator[GloveSample]:
+    """Read samples of a recording sequentially, chunk by chunk.
+
+    Arguments:
+        path {str} -- file path
+
+    Keyword Arguments:
+        chunk_size {int} -- number of records read at once (default: {1024})
+
+    Yields:
+        GloveSample -- sample
+    """
+    with open(path, 'rb') as file:
+        _read_header(file.read(_HEADER.size))
+        while True:
+            chunk = file.read(chunk_size * RECORD_SIZE)
+            with memoryview(chunk) as view:
+                for offset in range(0, len(chunk) - RECORD_SIZE + 1, RECORD_SIZE):
+                    yield decode_sample(view[offset:offset + RECORD_SIZE])
+            if len(chunk) < chunk_size * RECORD_SIZE:
+                return
+
+
+def _read_header(header: bytes) -> None:
+    if len(header) < _HEADER.size:
+        raise GloveError('Not a glove recording')
+    magic, version, record_size = _HEADER.unpack_from(header)
+    if magic != RECORD_MAGIC:
+        raise GloveError('Not a glove recording')
+    if version != RECORD_VERSION or record_size != RECORD_SIZE:
+        raise GloveError(f'Unsupported recording version {version}')
+
+
+class RecordWriter:
+    """Append glove samples to a recording.
+
+    Records are collected in a preallocated chunk which is written out when it is full or
+    when the sync interval has passed, the file is then synced to the disk. So the memory
+    usage is constant and a crash loses at most one sync interval of samples.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 1024, sync_interval: float = 1.0):
+        """Create the recording, an existing file is overwritten.
+
+        Arguments:
+            path {str} -- file path
+
+        Keyword Arguments:
+            chunk_size {int} -- number of records written at once (default: {1024})
+            sync_interval {float} -- maximum time between disk syncs, sec (default: {1.0})
+        """
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(RECORD_MAGIC, RECORD_VERSION, RECORD_SIZE))
+        self._chunk = bytearray(chunk_size * RECORD_SIZE)
+        self._used = 0
+        self._count = 0
+        self._sync_interval = sync_interval
+        self._sync_deadline = time.monotonic() + sync_interval
+
+    @property
+    def count(self) -> int:
+        """Number of written samples.
+
+        Returns:
+            int -- samples count
+        """
+        return self._count
+
+    def write_payload(self, payload: bytes) -> None:
+        """Append a sample packet payload.
+
+        Arguments:
+            payload {bytes} -- payload of 0x0A packet (any buffer object)
+        """
+        size = _PAYLOAD_SIZES.get(payload[0]) if len(payload) else None
+        if size is None or len(payload) < size:
+            raise ValueError('Not a sample packet payload')
+        end = self._used + RECORD_SIZE
+        self._chunk[self._used:self._used + size] = payload[:size]
+        self._chunk[self._used + size:end] = bytes(RECORD_SIZE - size)
+        self._used = end
+        self._count += 1
+        if end == len(self._chunk) or time.monotonic() >= self._sync_deadline:
+            self.flush()
+
+    def write_sample(self, sample: Union[GloveSample, CompactSample]) -> None:
+        """Append a decoded sample.
+
+        Arguments:
+            sample {Union[GloveSample, CompactSample]} -- sample
+        """
+        if isinstance(sample, CompactSample):
+            self.write_payload(sample.payload)
+        else:
+            self.write_payload(encode_sample(sample))
+
+    def flush(self) -> None:
+        """Write collected records out and sync the file to the disk if it is time to."""
+        with memoryview(self._chunk) as view:
+            self._file.write(view[:self._used])
+        self._used = 0
+        self._file.flush()
+        if time.monotonic() >= self._sync_deadline:
+            os.fsync(self._file.fileno())
+            self._sync_deadline = time.monotonic() + self._sync_interval
+
+    def close(self) -> None:
+        """Write collected records out and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def __enter__(self):
+        """Enter context guard.
+
+        Returns:
+            RecordWriter -- this writer
+        """
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Close the file at context guard exit."""
+        self.close()
+
+
+class RecordReader:
+    """Random access to the samples of a recording.
+
+    The recording is memory mapped, records are decoded only when they are accessed, so
+    opening is instant whatever the recording size is. Slicing by index or by time returns
+    a reader over the same mapping, no records are copied.
+
+    Seeking by time uses the clock index, it is built at the first seek (a single vectorized
+    pass over the clock column) and saved next to the recording. The index holds the running
+    maximum of the unwrapped clock: the 32-bit millisecond counter keeps counting past its
+    wrap (after 49.7 days), and a clock going back (after a glove reboot) does not break the
+    binary search.
+    """
+
+    def __init__(self, path: str):
+        """Open the recording.
+
+        Arguments:
+            path {str} -- file path
+        """
+        with open(path, 'rb') as file:
+            _read_header(file.read(_HEADER.size))
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._path = path
+        self._begin = 0
+        self._end = (len(self._mmap) - _HEADER.size) // RECORD_SIZE
+        self._index = None
+        self._root = self
+
+    def __len__(self) -> int:
+        """Number of samples.
+
+        Returns:
+            int -- samples count
+        """
+        return self._end - self._begin
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[GloveSample, 'RecordReader']:
+        """Get a sample by index or a reader over a range of samples.
+
+        Arguments:
+            key {Union[int, slice]} -- sample index or a slice with step 1
+
+        Returns:
+            Union[GloveSample, RecordReader] -- sample or reader
+        """
+        if isinstance(key, slice):
+            begin, end, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError('Slice step is not supported')
+            return self._view(self._begin + begin, self._begin + max(begin, end))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('Sample index out of range')
+        offset = _HEADER.size + (self._begin + key) * RECORD_SIZE
+        return decode_sample(memoryview(self._mmap)[offset:offset + RECORD_SIZE])
+
+    def __iter__(self) -> Iterator[GloveSample]:
+        """Iterate over samples, they are decoded lazily.
+
+        Yields:
+            GloveSample -- sample
+        """
+        with memoryview(self._mmap) as view:
+            offset = _HEADER.size + self._begin * RECORD_SIZE
+            for offset in range(offset, offset + len(self) * RECORD_SIZE, RECORD_SIZE):
+                yield decode_sample(view[offset:offset + RECORD_SIZE])
+
+    @property
+    def payloads(self) -> np.ndarray:
+        """Records as a view on the mapping, no bytes are copied.
+
+        Returns:
+            np.ndarray -- array of uint8 (samples count, RECORD_SIZE)
+        """
+        return np.ndarray((len(self), RECORD_SIZE), np.uint8, self._mmap,
+                          _HEADER.size + self._begin * RECORD_SIZE)
+
+    @property
+    def clock(self) -> np.ndarray:
+        """Glove clock column as a view on the mapping, no bytes are copied.
+
+        Returns:
+            np.ndarray -- array of big endian uint32, msec
+        """
+        return np.ndarray((len(self),), '>u4', self._mmap,
+                          _HEADER.size + self._begin * RECORD_SIZE + _CLOCK_OFFSET,
+                          (RECORD_SIZE,))
+
+    def seek(self, clock: float) -> int:
+        """Find the first sample taken at or after a time.
+
+        Arguments:
+            clock {float} -- glove time, sec, unwrapped from the beginning of the recording
+
+        Returns:
+            int -- sample index, len(self) if there is no such sample
+        """
+        index = self._load_index()[self._begin:self._end]
+        return int(np.searchsorted(index, round(clock * 1000), 'left'))
+
+    def between(self, start: float = None, stop: float = None) -> 'RecordReader':
+        """Get a reader over the samples taken in a time range.
+
+        Keyword Arguments:
+            start {float} -- first glove time included, sec (default: {from the beginning})
+            stop {float} -- first glove time excluded, sec (default: {to the end})
+
+        Returns:
+            RecordReader -- reader
+        """
+        begin = 0 if start is None else self.seek(start)
+        end = len(self) if stop is None else self.seek(stop)
+        return self[begin:end]
+
+    def to_array(self) -> np.ndarray:
+        """Decode all samples at once.
+
+        Returns:
+            np.ndarray -- decoded samples of SAMPLE_DTYPE, absent fields are NaN
+        """
+        return decode_payloads(self._mmap, RECORD_SIZE,
+                               _HEADER.size + self._begin * RECORD_SIZE, len(self))
+
+    def iter_arrays(self, chunk_size: int = 4096) -> Iterator[np.ndarray]:
+        """Decode samples chunk by chunk.
+
+        Keyword Arguments:
+            chunk_size {int} -- number of samples per chunk (default: {4096})
+
+        Yields:
+            np.ndarray -- decoded samples of SAMPLE_DTYPE, absent fields are NaN
+        """
+        for begin in range(0, len(self), chunk_size):
+            yield self[begin:begin + chunk_size].to_array()
+
+    def close(self) -> None:
+        """Unmap the recording, it stays mapped while views returned by the reader exist."""
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        """Enter context guard.
+
+        Returns:
+            RecordReader -- this reader
+        """
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Close the reader at context guard exit."""
+        self.close()
+
+    def __repr__(self):
+        """String representation.
+
+        Returns:
+            str -- string representing the reader
+        """
+        return f'RecordReader(path="{self._path}", samples={len(self)})'
+
+    def _view(self, begin: int, end: int) -> 'RecordReader':
+        reader = object.__new__(RecordReader)
+        reader.__dict__.update(self.__dict__)
+        reader._begin, reader._end = begin, end
+        return reader
+
+    def _load_index(self) -> np.ndarray:
+        if self._root is not self:
+            return self._root._load_index()  # pylint: disable=protected-access
+        if self._index is not None:
+            return self._index
+
+        count = (len(self._mmap) - _HEADER.size) // RECORD_SIZE
+        clock = np.ndarray((count,), '>u4', self._mmap, _HEADER.size + _CLOCK_OFFSET,
+                           (RECORD_SIZE,))
+        index_path = self._path + INDEX_SUFFIX
+        index = np.empty(0, np.int64)
+        try:
+            index = np.load(index_path)
+        except (OSError, ValueError):
+            pass
+        if index.dtype != np.int64 or len(index) > count or \
+                (len(index) and index[0] != clock[0]):
+            index = np.empty(0, np.int64)  # the recording was overwritten or an old index
+
+        if len(index) < count:
+            # the recording was appended to, index the tail only: it continues the last
+            # indexed clock and its number of wraps (the running maximum is of the same wrap)
+            tail = clock[len(index):].astype(np.int64)
+            if len(index):
+                previous = int(clock[len(index) - 1])
+                wraps = (int(index[-1]) - previous) >> 32
+            else:
+                previous, wraps = int(tail[0]), 0
+            steps = np.diff(tail, prepend=previous)
+            tail += (np.cumsum(steps < -(1 << 31)) + wraps) << 32
+            np.maximum.accumulate(tail, out=tail)
+            if len(index):
+                np.maximum(tail, index[-1], out=tail)
+            index = np.concatenate((index, tail))
+            try:
+                np.save(index_path, index)
+            except OSError:
+                pass  # read-only location, keep the index in memory
+
+        self._index = index
+        return index
@@ -0,0 +1,688 @@
+"""This module contains the server sharing gloves with local processes and its client.
+
+The server owns the gloves and publishes their samples through shared memory, one channel
+per glove. A channel holds the latest sample slot protected by a sequence lock and a ring of
+the recent samples, each ring slot stamped with its own sequence number, so any number of
+subscribers read without locks and without talking to the server; a subscriber lagging by
+more than the ring capacity skips the overwritten samples. Samples are published as packet
+payloads and decoded by the subscribers.
+
+Commands (vibrotactile feedback, calibration) are forwarded to the server through a Unix
+socket as JSON lines. Vibrotactile feedback is coalesced and rate limited by the server, so
+clients may set it at any rate.
+"""
+
+import collections
+import contextlib
+import json
+import mmap
+import os
+import selectors
+import socket
+import struct
+import tempfile
+import threading
+import time
+from typing import ContextManager, Dict, List, Optional, Sequence, Union
+
+from .calibration import CalibrationProfile
+from .data import CompactSample, GloveSample
+from .error import GloveConnectionError, GloveError, GloveTimeoutError
+from .glove import Glove
+from .haptics import HapticScheduler
+from .protocol import decode_sample
+
+__all__ = ('GloveServer', 'GloveClient')
+
+
+MEMORY_MAGIC = b'VMG30SHM'
+MEMORY_VERSION = 1
+SLOT_SIZE = 96  # payloads are 87 (quaternions) or 91 (raw IMU) bytes
+
+_HEADER = struct.Struct('<8sHHI')  # magic, version, channels, ring capacity
+_HEADER_SIZE = 64
+# published samples, latest slot sequence, calibration profile version, device id
+_CHANNEL = struct.Struct('<QQQH')
+_CHANNEL_SIZE = 64
+_STAMP = struct.Struct('<Q')
+_RING_SLOT_SIZE = _STAMP.size + SLOT_SIZE
+
+
+def socket_path(name: str) -> str:
+    """Get the command socket path of a server.
+
+    Arguments:
+        name {str} -- server name
+
+    Returns:
+        str -- socket path
+    """
+    return os.path.join(tempfile.gettempdir(), f'{name}.sock')
+
+
+def memory_path(name: str) -> str:
+    """Get the shared memory file path of a server, it is RAM backed where available.
+
+    Arguments:
+        name {str} -- server name
+
+    Returns:
+        str -- file path
+    """
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, f'{name}.shm')
+
+
+def _channel_size(capacity: int) -> int:
+    return _CHANNEL_SIZE + SLOT_SIZE + capacity * _RING_SLOT_SIZE
+
+
+class _Channel:
+    """Shared memory area of one glove."""
+
+    def __init__(self, buffer: memoryview, offset: int, capacity: int):
+        self.buffer = buffer
+        self.offset = offset
+        self.capacity = capacity
+        self.latest = offset + _CHANNEL_SIZE
+        self.ring = self.latest + SLOT_SIZE
+
+    def counters(self):
+        # published samples, latest slot sequence, profile version, device id
+        return _CHANNEL.unpack_from(self.buffer, self.offset)
+
+    def published(self) -> int:
+        return _STAMP.unpack_from(self.buffer, self.offset)[0]
+
+    def set_counter(self, index: int, value: int) -> None:
+        _STAMP.pack_into(self.buffer, self.offset + index * _STAMP.size, value)
+
+    def publish(self, number: int, payload: memoryview) -> None:
+        # the ring slot stamp is odd while the slot is written and 2 * (number + 1) after
+        slot = self.ring + number % self.capacity * _RING_SLOT_SIZE
+        _STAMP.pack_into(self.buffer, slot, 2 * number + 1)
+        self.buffer[slot + _STAMP.size:slot + _STAMP.size + len(payload)] = payload
+        _STAMP.pack_into(self.buffer, slot, 2 * number + 2)
+
+        sequence = 2 * number  # the latest slot sequence is odd while the slot is written
+        self.set_counter(1, sequence + 1)
+        self.buffer[self.latest:self.latest + len(payload)] = payload
+        self.set_counter(1, sequence + 2)
+        self.set_counter(0, number + 1)
+
+    def read(self, number: int) -> Optional[bytes]:
+        # payload of the sample or None if it was overwritten
+        slot = self.ring + number % self.capacity * _RING_SLOT_SIZE
+        stamp = _STAMP.unpack_from(self.buffer, slot)[0]
+        payload = bytes(self.buffer[slot + _STAMP.size:slot + _RING_SLOT_SIZE])
+        if stamp != 2 * number + 2 or _STAMP.unpack_from(self.buffer, slot)[0] != stamp:
+            return None
+        return payload
+
+    def read_latest(self) -> Optional[bytes]:
+        # payload of the latest sample or None if nothing was published
+        while True:
+            sequence = _STAMP.unpack_from(self.buffer, self.offset + _STAMP.size)[0]
+            if not sequence:
+                return None
+            payload = bytes(self.buffer[self.latest:self.latest + SLOT_SIZE])
+            if not sequence & 1 and \
+                    _STAMP.unpack_from(self.buffer, self.offset + _STAMP.size)[0] == sequence:
+                return payload
+
+
+class _Client:
+    """Command connection of a client.
+
+    Replies are written by the selector loop and by calibration threads, a write lock keeps
+    the JSON lines whole.
+    """
+
+    def __init__(self, conn: socket.socket):
+        self.conn = conn
+        self.pending = bytearray()
+        self.lock = threading.Lock()
+
+    def send(self, reply: dict) -> None:
+        data = json.dumps(reply).encode() + b'\n'
+        with self.lock:
+            self.conn.sendall(data)
+
+    def close(self) -> None:
+        with self.lock:  # not while a reply is written, the descriptor could be reused
+            self.conn.close()
+
+
+class GloveServer:
+    """Own the gloves and share their samples with local processes.
+
+    All gloves are read by a single selector loop, which also serves the command socket.
+    The IMU calibration of a glove runs in a thread of its own, the glove is left out of the
+    loop meanwhile, so the other gloves keep being published.
+    """
+
+    def __init__(self,
+                 ports: Sequence[str],
+                 name: str = 'vmg30',
+                 capacity: int = 1024,
+                 raw: bool = False,
+                 profiles: Sequence[Optional[CalibrationProfile]] = None):
+        """Connect to the gloves, create the shared memory and the command socket.
+
+        Arguments:
+            ports {Sequence[str]} -- serial device names or connection URLs
+
+        Keyword Arguments:
+            name {str} -- server name, clients connect by it (default: {'vmg30'})
+            capacity {int} -- number of recent samples kept per glove (default: {1024})
+            raw {bool} -- publish IMU data instead of quaternions (default: {False})
+            profiles {Sequence[Optional[CalibrationProfile]]} -- sensors normalization of
+                the gloves given to the clients (default: {None for the firmware one})
+        """
+        self._name = name
+        self._raw = raw
+        self._gloves = []
+        self._channels = []
+        self._haptics = []
+        self._profile_versions = []
+        self._calibrating = set()
+        self._calibrated = collections.deque()  # gloves to put back into the loop
+        self._memory = None
+        self._buffer = None
+        self._listener = None
+        self._selector = selectors.DefaultSelector()
+        self._running = False
+        try:
+            for port in ports:
+                glove = Glove(port)
+                self._gloves.append(glove)
+                if [g.device_id for g in self._gloves].count(glove.device_id) > 1:
+                    raise GloveError(
+                        f'The glove on "{port}" has the same id {glove.device_id} as '
+                        f'another one, set unique device ids.')
+            for glove, profile in zip(self._gloves, profiles or ()):
+                glove.calibration_profile = profile
+
+            with open(memory_path(name), 'w+b') as file:
+                file.truncate(_HEADER_SIZE + len(ports) * _channel_size(capacity))
+                self._memory = mmap.mmap(file.fileno(), 0)
+            buffer = self._buffer = memoryview(self._memory)
+            _HEADER.pack_into(buffer, 0, MEMORY_MAGIC, MEMORY_VERSION, len(ports), capacity)
+            for index, glove in enumerate(self._gloves):
+                channel = _Channel(buffer, _HEADER_SIZE + index * _channel_size(capacity),
+                                   capacity)
+                _CHANNEL.pack_into(buffer, channel.offset, 0, 0, 0, glove.device_id)
+                self._channels.append(channel)
+                self._haptics.append(HapticScheduler(glove))
+                self._profile_versions.append(0)
+                self._selector.register(glove, selectors.EVENT_READ, index)
+
+            path = socket_path(name)
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._listener.bind(path)
+            self._listener.listen()
+            self._selector.register(self._listener, selectors.EVENT_READ)
+        except (GloveError, OSError):
+            self.close()
+            raise
+
+    @property
+    def name(self) -> str:
+        """Server name.
+
+        Returns:
+            str -- name
+        """
+        return self._name
+
+    @property
+    def gloves(self) -> List[Glove]:
+        """Served gloves.
+
+        Returns:
+            List[Glove] -- gloves in the channels order
+        """
+        return list(self._gloves)
+
+    @property
+    def published(self) -> Dict[int, int]:
+        """Number of published samples.
+
+        Returns:
+            Dict[int, int] -- samples count by device id
+        """
+        return {glove.device_id: channel.published()
+                for glove, channel in zip(self._gloves, self._channels)}
+
+    def serve_forever(self) -> None:
+        """Publish the samples and answer the commands until shutdown() is called."""
+        for glove in self._gloves:
+            glove.start_sampling(self._raw)
+        self._running = True
+        try:
+            while self._running:
+                self.poll(0.1)
+        finally:
+            for glove in self._gloves:
+                glove.stop_sampling()
+
+    def shutdown(self) -> None:
+        """Stop serve_forever loop, may be called from another thread or a signal handler."""
+        self._running = False
+
+    def poll(self, timeout: float = 0.0) -> None:
+        """Publish the received samples and answer the commands once.
+
+        Keyword Arguments:
+            timeout {float} -- maximum waiting time, sec (default: {0.0})
+        """
+        for key, _ in self._selector.select(timeout):
+            if key.fileobj is self._listener:
+                conn, _ = self._listener.accept()
+                conn.settimeout(1.0)
+                self._selector.register(conn, selectors.EVENT_READ, _Client(conn))
+            elif isinstance(key.data, int):
+                self._publish(key.data)
+            else:
+                self._serve_client(key.data)
+        while self._calibrated:
+            index = self._calibrated.popleft()
+            self._calibrating.discard(index)
+            if index < len(self._gloves):
+                self._selector.register(self._gloves[index], selectors.EVENT_READ, index)
+        for haptics in self._haptics:
+            haptics.flush()
+
+    def close(self) -> None:
+        """Disconnect the gloves, close the socket and release the shared memory."""
+        for key in list((self._selector.get_map() or {}).values()):
+            if isinstance(key.data, _Client):
+                key.data.close()
+        self._selector.close()
+        for glove in self._gloves:
+            glove.disconnect()
+        self._gloves.clear()
+        self._channels.clear()
+        self._haptics.clear()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(socket_path(self._name))
+        if self._memory is not None:
+            self._buffer.release()
+            self._memory.close()
+            self._memory = None
+            os.unlink(memory_path(self._name))
+
+    def __enter__(self):
+        """Enter context guard.
+
+        Returns:
+            GloveServer -- this server
+        """
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Close the server at context guard exit."""
+        self.close()
+
+    def _publish(self, index: int) -> None:
+        glove, channel = self._gloves[index], self._channels[index]
+        number = channel.published()
+        for payload in glove.read_payloads():
+            channel.publish(number, payload)
+            number += 1
+
+    def _serve_client(self, client: _Client) -> None:
+        try:
+            data = client.conn.recv(4096)
+        except OSError:
+            data = b''
+        if not data:
+            self._selector.unregister(client.conn)
+            client.close()
+            return
+        pending = client.pending
+        pending += data
+        while b'\n' in pending:
+            line, _, rest = pending.partition(b'\n')
+            pending[:] = rest
+            try:
+                for reply in self._execute(line, client):
+                    client.send(reply)
+            except OSError:
+                self._selector.unregister(client.conn)
+                client.close()
+                return
+
+    def _execute(self, line: bytes, client: _Client):
+        # yields the replies, a command failure is reported to the client as an error
+        try:
+            request = json.loads(line)
+            command = request['command']
+            if command == 'info':
+                yield dict(memory=memory_path(self._name), raw=self._raw, gloves=[
+                    dict(device_id=glove.device_id, label=glove.label,
+                         firmware=glove.firmware,
+                         profile=glove.calibration_profile and
+                         glove.calibration_profile.to_dict())
+                    for glove in self._gloves])
+                return
+            index = [g.device_id for g in self._gloves].index(request['device_id'])
+            glove = self._gloves[index]
+            if command == 'set_vibro_feedback':
+                self._haptics[index].set_levels(request['levels'])
+                yield dict(done=True)
+            elif command == 'calibration_profile':
+                profile = request['profile']
+                glove.calibration_profile = profile and CalibrationProfile.from_dict(profile)
+                self._profile_versions[index] += 1
+                self._channels[index].set_counter(2, self._profile_versions[index])
+                yield dict(done=True)
+            elif command == 'calibration':
+                if index in self._calibrating:
+                    raise GloveError(f'The glove {glove.device_id} is being calibrated')
+                self._calibrating.add(index)
+                self._selector.unregister(glove)
+                threading.Thread(target=self._calibrate, args=(index, client),
+                                 name='GloveCalibration', daemon=True).start()
+            else:
+                yield dict(error=f'Unknown command "{command}"')
+        except (GloveError, KeyError, TypeError, ValueError) as ex:
+            yield dict(error=str(ex) or type(ex).__name__)
+
+    def _calibrate(self, index: int, client: _Client) -> None:
+        # replies the calibration stages from its own thread, the loop puts the glove back
+        glove = self._gloves[index]
+        try:
+            glove.stop_sampling()
+            try:
+                for stage in glove.calibration():
+                    client.send(dict(stage=stage))
+            finally:
+                glove.start_sampling(self._raw)
+        except OSError:  # the client or the glove is gone
+            pass
+        except Exception as ex:  # pylint: disable=broad-except
+            # the client waits for the stages, tell it whatever stopped them
+            error = str(ex) if isinstance(ex, GloveError) else f'{type(ex).__name__}: {ex}'
+            with contextlib.suppress(OSError):
+                client.send(dict(error=error))
+        finally:
+            self._calibrated.append(index)
+
+
+class GloveClient:
+    """Glove served by GloveServer, it has the sampling interface of Glove."""
+
+    def __init__(self,
+                 name: str = 'vmg30',
+                 device_id: int = None,
+                 poll_interval: float = 0.0002):
+        """Connect to the server.
+
+        Keyword Arguments:
+            name {str} -- server name (default: {'vmg30'})
+            device_id {int} -- device identificator of the glove (default: {the first one})
+            poll_interval {float} -- sleep time between checks for a new sample, sec
+                                     (default: {0.0002})
+        """
+        self._poll_interval = poll_interval
+        self._memory = None
+        self._buffer = None
+        self._sock = None
+        try:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(5.0)
+            self._sock.connect(socket_path(name))
+            self._replies = self._sock.makefile('rb')
+            info = self._request(command='info')
+            gloves = info['gloves']
+            ids = [glove['device_id'] for glove in gloves]
+            if device_id is None:
+                device_id = ids[0]
+            if device_id not in ids:
+                raise GloveConnectionError(f'The server "{name}" has no glove {device_id}')
+            index = ids.index(device_id)
+            self._info = gloves[index]
+
+            with open(info['memory'], 'rb') as file:
+                self._memory = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._buffer = memoryview(self._memory)
+            magic, version, _, capacity = _HEADER.unpack_from(self._buffer, 0)
+            if magic != MEMORY_MAGIC or version != MEMORY_VERSION:
+                raise GloveConnectionError(f'The server "{name}" is not compatible')
+            self._channel = _Channel(
+                self._buffer, _HEADER_SIZE + index * _channel_size(capacity), capacity)
+        except OSError as ex:
+            self.disconnect()
+            raise GloveConnectionError(
+                f'The server "{name}" is not available: {ex.strerror or ex}')
+        except GloveError:
+            self.disconnect()
+            raise
+
+        self._profile_version = self._channel.counters()[2]
+        self._set_profile(self._info['profile'])
+        self._number = self._channel.published()
+        self._dropped = 0
+
+    @property
+    def device_id(self) -> int:
+        """Device identificator.
+
+        Returns:
+            int -- id
+        """
+        return self._info['device_id']
+
+    @property
+    def label(self) -> str:
+        """Device string identificator.
+
+        Returns:
+            str -- label
+        """
+        return self._info['label']
+
+    @property
+    def firmware(self) -> str:
+        """Firmware version.
+
+        Returns:
+            str -- version string x.y.z
+        """
+        return self._info['firmware']
+
+    @property
+    def dropped(self) -> int:
+        """Number of samples overwritten before this client read them.
+
+        Returns:
+            int -- samples count
+        """
+        return self._dropped
+
+    @property
+    def calibration_profile(self) -> Optional[CalibrationProfile]:
+        """Sensors normalization applied to decoded samples, shared by all clients.
+
+        Returns:
+            Optional[CalibrationProfile] -- profile, None for the firmware normalization
+        """
+        self._check_profile()
+        return self._profile
+
+    @calibration_profile.setter
+    def calibration_profile(self, profile: Optional[CalibrationProfile]) -> None:
+        """Set sensors normalization of the glove for all clients.
+
+        Arguments:
+            profile {Optional[CalibrationProfile]} -- profile, None for the firmware one
+        """
+        self._request(command='calibration_profile', device_id=self.device_id,
+                      profile=profile and profile.to_dict())
+        self._check_profile()
+
+    def calibration(self):
+        """Start self calibration of the dataglove orientation module, sampling pauses.
+
+        Yields:
+            int -- calibration status (from 0 to 100)
+        """
+        self._send(command='calibration', device_id=self.device_id)
+        stage = 0
+        while stage != 100:
+            stage = self._reply()['stage']
+            yield stage
+
+    def set_vibro_feedback(self, levels: Sequence[float]) -> None:
+        """Set vibrotactile feedback.
+
+        Arguments:
+            levels {Sequence[float]} -- vibro intensity on tips of the fingers [0..1]
+        """
+        self._request(command='set_vibro_feedback', device_id=self.device_id,
+                      levels=list(levels))
+
+    def next_payload(self, timeout: float = 2.0) -> bytes:
+        """Receive next sample undecoded.
+
+        Keyword Arguments:
+            timeout {float} -- maximum waiting time, sec (default: {2.0})
+
+        Returns:
+            bytes -- payload of 0x0A packet
+        """
+        channel = self._channel
+        deadline = None
+        while True:
+            published = channel.published()
+            if published > self._number:
+                if published - self._number > channel.capacity:
+                    self._dropped += published - channel.capacity - self._number
+                    self._number = published - channel.capacity
+                payload = channel.read(self._number)
+                if payload is not None:
+                    self._number += 1
+                    return payload
+                self._dropped += 1  # overwritten while read
+                self._number += 1
+                continue
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() >= deadline:
+                raise GloveTimeoutError('Read timeout')
+            time.sleep(self._poll_interval)
+
+    def next_sample(self, compact: bool = False) -> Union[GloveSample, CompactSample]:
+        """Receive next sample.
+
+        Keyword Arguments:
+            compact {bool} -- return a CompactSample decoded lazily, with the firmware
+                              sensors normalization (default: {False})
+
+        Returns:
+            Union[GloveSample, CompactSample] -- sample
+        """
+        payload = self.next_payload()
+        if compact:
+            return CompactSample(payload)
+        self._check_profile()
+        return self._decode(payload)
+
+    def latest_sample(self,
+                      compact: bool = False) -> Union[GloveSample, CompactSample, None]:
+        """Get the latest published sample without waiting, it does not move the reading.
+
+        Keyword Arguments:
+            compact {bool} -- return a CompactSample decoded lazily, with the firmware
+                              sensors normalization (default: {False})
+
+        Returns:
+            Union[GloveSample, CompactSample, None] -- sample, None if there is no sample yet
+        """
+        payload = self._channel.read_latest()
+        if payload is None:
+            return None
+        if compact:
+            return CompactSample(payload)
+        self._check_profile()
+        return self._decode(payload)
+
+    @contextlib.contextmanager
+    def sampling(self, compact=False) -> ContextManager:
+        """"Receive the samples published from now on.
+
+        Keyword Arguments:
+            compact {bool} -- return CompactSample objects decoded lazily (default: {False})
+        """
+        def _sample_iterator():
+            while True:
+                yield self.next_sample(compact)
+
+        self._number = self._channel.published()
+        yield _sample_iterator()
+
+    def disconnect(self) -> None:
+        """Close connection to the server."""
+        if self._memory is not None:
+            self._channel = None
+            self._buffer.release()
+            self._memory.close()
+            self._memory = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self):
+        """Enter context guard.
+
+        Returns:
+            GloveClient -- this client
+        """
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        """Disconnect at context guard exit."""
+        self.disconnect()
+
+    def __repr__(self):
+        """String representation.
+
+        Returns:
+            str -- string representing the client
+        """
+        return f'GloveClient(id={self.device_id}, label="{self.label}")'
+
+    def _set_profile(self, profile: Optional[dict]) -> None:
+        self._profile = profile and CalibrationProfile.from_dict(profile)
+        self._decode = decode_sample if self._profile is None else self._profile.decoder
+
+    def _check_profile(self) -> None:
+        version = self._channel.counters()[2]
+        if version != self._profile_version:
+            self._profile_version = version
+            info = self._request(command='info')
+            for glove in info['gloves']:
+                if glove['device_id'] == self.device_id:
+                    self._set_profile(glove['profile'])
+
+    def _send(self, **request) -> None:
+        self._sock.sendall(json.dumps(request).encode() + b'\n')
+
+    def _reply(self) -> dict:
+        line = self._replies.readline()
+        if not line:
+            raise GloveConnectionError('The server closed the connection')
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise GloveError(reply['error'])
+        return reply
+
+    def _request(self, **request) -> dict:
+        self._send(**request)
+        return self._reply()
@@ -0,0 +1,476 @@
+"""This module contains the opt-in instrumentation of the sample processing path.
+
+Nothing is measured until enable() is called: it wraps the hot methods of the glove, the
+hand model and the views with timing wrappers, and disable() puts the original methods back,
+so the instrumentation costs nothing while it is off.
+
+Measured spans (perf_counter_ns, nanoseconds):
+
+- glove.read, glove.recv, glove.next_sample, glove.read_samples -- acquisition and decoding
+- aio.read -- AsyncGlove reader callback, receiving and decoding
+- hub.next_frame -- GloveHub frame merging, waiting included
+- model.angles, model.frames, model.frames_array -- forward kinematics
+- view.update -- hand visualisation
+- glove.jitter -- delay of the sample arrival on the host over the arrival predicted by a
+  ClockSync fed with the samples of the glove (Glove, AsyncGlove and the gloves of a
+  GloveHub), so the counter wrap and the clock drift are accounted for
+
+Counters: glove.corrupted (damaged packets, CRC failures included), glove.resyncs
+(stream resynchronizations), glove.timeouts, glove.lost (samples missing in the glove clock),
+aio.dropped (samples dropped from a full AsyncGlove queue), client.timeouts, client.dropped
+(samples overwritten before a server client read them), hub.partial_frames.
+"""
+
+import functools
+import json
+import time
+from typing import Dict, Optional, TextIO
+
+__all__ = ('Histogram', 'Stats', 'STATS', 'enable', 'disable', 'is_enabled')
+
+
+class Histogram:
+    """Histogram of non-negative integer values with a bounded relative error.
+
+    Buckets are exact up to 2 ** precision, above that each power of two range is split
+    into 2 ** (precision - 1) buckets, as in the HdrHistogram, so the relative error is below
+    2 ** (1 - precision) for any value. Recording is a few integer operations without locks;
+    an increment made concurrently from another thread may be lost, never the histogram.
+    """
+
+    def __init__(self, precision: int = 7, max_bits: int = 48):
+        """Allocate the buckets.
+
+        Keyword Arguments:
+            precision {int} -- bits of the value kept by the buckets (default: {7})
+            max_bits {int} -- bits of the largest value, larger ones are clamped (default: {48})
+        """
+        self._precision = precision
+        self._half = 1 << (precision - 1)
+        self._max_value = (1 << max_bits) - 1
+        self._counts = [0] * ((max_bits - precision + 2) * self._half)
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all values."""
+        self._counts[:] = [0] * len(self._counts)
+        self._count = 0
+        self._total = 0
+        self._min = None
+        self._max = None
+
+    def record(self, value: int) -> None:
+        """Add a value.
+
+        Arguments:
+            value {int} -- value, negative ones are taken as 0
+        """
+        value = min(max(value, 0), self._max_value)
+        shift = value.bit_length() - self._precision
+        if shift <= 0:
+            self._counts[value] += 1
+        else:
+            self._counts[(shift + 1) * self._half + (value >> shift) - self._half] += 1
+        self._count += 1
+        self._total += value
+        if self._min is None or value < self._min:
+            self._min = value
+        if self._max is None or value > self._max:
+            self._max = value
+
+    @property
+    def count(self) -> int:
+        """Number of recorded values.
+
+        Returns:
+            int -- values count
+        """
+        return self._count
+
+    @property
+    def min(self) -> Optional[int]:
+        """Smallest recorded value.
+
+        Returns:
+            Optional[int] -- value, None if empty
+        """
+        return self._min
+
+    @property
+    def max(self) -> Optional[int]:
+        """Largest recorded value.
+
+        Returns:
+            Optional[int] -- value, None if empty
+        """
+        return self._max
+
+    @property
+    def mean(self) -> Optional[float]:
+        """Mean of the recorded values.
+
+        Returns:
+            Optional[float] -- value, None if empty
+        """
+        return self._total / self._count if self._count else None
+
+    def percentile(self, percent: float) -> Optional[int]:
+        """Value below or at which the given share of the recorded values lies.
+
+        Arguments:
+            percent {float} -- share of values, %
+
+        Returns:
+            Optional[int] -- bucket value (within the histogram precision), None if empty
+        """
+        counts = list(self._counts)  # snapshot
+        total = sum(counts)
+        if not total:
+            return None
+        rank = max(int(total * percent / 100.0 + 0.5), 1)
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return min(max(self._bucket_value(index), self._min), self._max)
+        return self._max
+
+    def buckets(self) -> Dict[int, int]:
+        """Non-empty buckets.
+
+        Returns:
+            Dict[int, int] -- values count by the bucket lowest value
+        """
+        return {self._bucket_value(index): count
+                for index, count in enumerate(list(self._counts)) if count}
+
+    def to_dict(self) -> dict:
+        """Convert to a JSON compatible dict.
+
+        Returns:
+            dict -- summary and non-empty buckets
+        """
+        return dict(count=self._count, min=self._min, max=self._max, mean=self.mean,
+                    p50=self.percentile(50.0), p90=self.percentile(90.0),
+                    p99=self.percentile(99.0), p999=self.percentile(99.9),
+                    buckets=sorted(self.buckets().items()))
+
+    def _bucket_value(self, index: int) -> int:
+        if index < 2 * self._half:
+            return index
+        shift = index // self._half - 1
+        return (index % self._half + self._half) << shift
+
+
+class Stats:
+    """Named histograms and counters."""
+
+    def __init__(self):
+        """Create empty statistics."""
+        self.histograms = {}
+        self.counters = {}
+
+    def histogram(self, name: str) -> Histogram:
+        """Get a histogram, it is created at the first use.
+
+        Arguments:
+            name {str} -- histogram name
+
+        Returns:
+            Histogram -- histogram
+        """
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def count(self, name: str, increment: int = 1) -> None:
+        """Increment a counter.
+
+        Arguments:
+            name {str} -- counter name
+
+        Keyword Arguments:
+            increment {int} -- value added (default: {1})
+        """
+        self.counters[name] = self.counters.get(name, 0) + increment
+
+    def reset(self) -> None:
+        """Forget all values."""
+        for histogram in self.histograms.values():
+            histogram.reset()
+        for name in self.counters:
+            self.counters[name] = 0
+
+    def to_dict(self) -> dict:
+        """Convert to a JSON compatible dict.
+
+        Returns:
+            dict -- histograms (values in nanoseconds) and counters
+        """
+        return dict(histograms={name: histogram.to_dict()
+                                for name, histogram in sorted(self.histograms.items())},
+                    counters=dict(sorted(self.counters.items())))
+
+    def dump(self, file: TextIO) -> None:
+        """Write as JSON.
+
+        Arguments:
+            file {TextIO} -- output text file
+        """
+        json.dump(self.to_dict(), file, indent=2)
+
+    def format(self) -> str:
+        """Format as a table, times in microseconds.
+
+        Returns:
+            str -- text
+        """
+        def micros(value):
+            return '-' if value is None else f'{value / 1000.0:.1f}'
+
+        lines = [f'{"span":22} {"count":>9} {"p50":>9} {"p90":>9} {"p99":>9} {"max":>9}']
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(f'{name:22} {histogram.count:9} '
+                         f'{micros(histogram.percentile(50.0)):>9} '
+                         f'{micros(histogram.percentile(90.0)):>9} '
+                         f'{micros(histogram.percentile(99.0)):>9} '
+                         f'{micros(histogram.max):>9}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'{name:22} {value:9}')
+        return '\n'.join(lines)
+
+
+STATS = Stats()
+
+_originals = {}
+
+
+def is_enabled() -> bool:
+    """Check whether the instrumentation is on.
+
+    Returns:
+        bool -- True if enabled
+    """
+    return bool(_originals)
+
+
+def enable(stats: Stats = None) -> Stats:
+    """Start measuring.
+
+    Keyword Arguments:
+        stats {Stats} -- statistics to fill (default: {STATS})
+
+    Returns:
+        Stats -- statistics being filled
+    """
+    # pylint: disable=import-outside-toplevel,protected-access
+    from .aio import AsyncGlove
+    from .clock import ClockSync
+    from .error import GloveTimeoutError
+    from .glove import Glove
+    from .hub import GloveHub
+    from .model import HandModel
+    from .server import GloveClient
+
+    disable()
+    stats = stats if stats is not None else STATS
+    for name in ('glove.corrupted', 'glove.resyncs', 'glove.timeouts', 'glove.lost'):
+        stats.count(name, 0)
+
+    def span(cls, method, name):
+        histogram = stats.histogram(name)
+        original = getattr(cls, method)
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            begin = time.perf_counter_ns()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                histogram.record(time.perf_counter_ns() - begin)
+
+        _install(cls, method, wrapper)
+
+    # acquisition: framer counters are sampled around each packet receive
+    read = Glove._read
+    read_histogram = stats.histogram('glove.read')
+
+    @functools.wraps(read)
+    def glove_read(self):
+        begin = time.perf_counter_ns()
+        try:
+            read(self)
+        except GloveTimeoutError:
+            stats.count('glove.timeouts')
+            raise
+        finally:
+            read_histogram.record(time.perf_counter_ns() - begin)
+
+    _install(Glove, '_read', glove_read)
+
+    recv = Glove._recv
+    recv_histogram = stats.histogram('glove.recv')
+
+    @functools.wraps(recv)
+    def glove_recv(self, package_type):
+        framer = self._framer
+        corrupted, resyncs = framer.corrupted, framer.resyncs
+        begin = time.perf_counter_ns()
+        try:
+            return recv(self, package_type)
+        finally:
+            recv_histogram.record(time.perf_counter_ns() - begin)
+            stats.count('glove.corrupted', framer.corrupted - corrupted)
+            stats.count('glove.resyncs', framer.resyncs - resyncs)
+
+    _install(Glove, '_recv', glove_recv)
+
+    # jitter: residual of the arrival time against the glove clock mapped to the host clock,
+    # one synchronisation per glove restarted with the sampling
+    jitter = stats.histogram('glove.jitter')
+    syncs = {}
+
+    def arrived(glove, sample, now):
+        sync = syncs.get(id(glove))
+        if sync is None:
+            sync = syncs[id(glove)] = ClockSync()
+        timed = sync.update(sample, now * 1e-9)
+        jitter.record(now - int(timed.timestamp * 1e9))
+        if timed.lost:
+            stats.count('glove.lost', timed.lost)
+
+    start_sampling = Glove.start_sampling
+
+    @functools.wraps(start_sampling)
+    def glove_start_sampling(self, *args, **kwargs):
+        syncs.pop(id(self), None)
+        return start_sampling(self, *args, **kwargs)
+
+    _install(Glove, 'start_sampling', glove_start_sampling)
+
+    next_sample = Glove.next_sample
+    next_sample_histogram = stats.histogram('glove.next_sample')
+
+    @functools.wraps(next_sample)
+    def glove_next_sample(self, *args, **kwargs):
+        begin = time.perf_counter_ns()
+        try:
+            sample = next_sample(self, *args, **kwargs)
+        finally:
+            now = time.perf_counter_ns()
+            next_sample_histogram.record(now - begin)
+        arrived(self, sample, now)
+        return sample
+
+    _install(Glove, 'next_sample', glove_next_sample)
+
+    read_samples = Glove.read_samples
+    read_samples_histogram = stats.histogram('glove.read_samples')
+
+    @functools.wraps(read_samples)
+    def glove_read_samples(self):
+        framer = self._framer
+        corrupted, resyncs = framer.corrupted, framer.resyncs
+        begin = time.perf_counter_ns()
+        try:
+            samples = read_samples(self)
+        finally:
+            now = time.perf_counter_ns()
+            read_samples_histogram.record(now - begin)
+            stats.count('glove.corrupted', framer.corrupted - corrupted)
+            stats.count('glove.resyncs', framer.resyncs - resyncs)
+        for sample in samples:
+            arrived(self, sample, now)
+        return samples
+
+    _install(Glove, 'read_samples', glove_read_samples)
+
+    # asyncio glove: samples decoded by a reader callback are the ones it queued
+    async_start_sampling = AsyncGlove.start_sampling
+
+    @functools.wraps(async_start_sampling)
+    async def async_glove_start_sampling(self, *args, **kwargs):
+        syncs.pop(id(self), None)
+        return await async_start_sampling(self, *args, **kwargs)
+
+    _install(AsyncGlove, 'start_sampling', async_glove_start_sampling)
+
+    on_readable = AsyncGlove._on_readable
+    on_readable_histogram = stats.histogram('aio.read')
+
+    @functools.wraps(on_readable)
+    def async_glove_on_readable(self):
+        framer, queue = self._framer, self._samples
+        corrupted, resyncs = framer.corrupted, framer.resyncs
+        queued, dropped = len(queue), self._dropped
+        begin = time.perf_counter_ns()
+        try:
+            on_readable(self)
+        finally:
+            now = time.perf_counter_ns()
+            on_readable_histogram.record(now - begin)
+            stats.count('glove.corrupted', framer.corrupted - corrupted)
+            stats.count('glove.resyncs', framer.resyncs - resyncs)
+            stats.count('aio.dropped', self._dropped - dropped)
+        received = min(len(queue) - queued + self._dropped - dropped, len(queue))
+        for index in range(len(queue) - received, len(queue)):
+            arrived(self, queue[index], now)
+
+    _install(AsyncGlove, '_on_readable', async_glove_on_readable)
+
+    # dropped samples and timeouts of the server clients, partial frames of the hub
+    next_payload = GloveClient.next_payload
+
+    @functools.wraps(next_payload)
+    def client_next_payload(self, *args, **kwargs):
+        dropped = self.dropped
+        try:
+            return next_payload(self, *args, **kwargs)
+        except GloveTimeoutError:
+            stats.count('client.timeouts')
+            raise
+        finally:
+            stats.count('client.dropped', self.dropped - dropped)
+
+    _install(GloveClient, 'next_payload', client_next_payload)
+
+    # the hub reads its gloves with Glove.read_samples, so their jitter is measured there
+    next_frame = GloveHub.next_frame
+    next_frame_histogram = stats.histogram('hub.next_frame')
+
+    @functools.wraps(next_frame)
+    def hub_next_frame(self, *args, **kwargs):
+        partial_frames = self.partial_frames
+        begin = time.perf_counter_ns()
+        try:
+            return next_frame(self, *args, **kwargs)
+        finally:
+            next_frame_histogram.record(time.perf_counter_ns() - begin)
+            stats.count('hub.partial_frames', self.partial_frames - partial_frames)
+
+    _install(GloveHub, 'next_frame', hub_next_frame)
+
+    span(HandModel, 'angles', 'model.angles')
+    span(HandModel, 'frames', 'model.frames')
+    span(HandModel, 'frames_array', 'model.frames_array')
+
+    try:
+        from .view import HandView
+    except ImportError:  # panda3d_viewer is not installed
+        pass
+    else:
+        span(HandView, 'update', 'view.update')
+    return stats
+
+
+def disable() -> None:
+    """Stop measuring, the collected statistics are kept."""
+    for (cls, method), original in _originals.items():
+        setattr(cls, method, original)
+    _originals.clear()
+
+
+def _install(cls, method: str, wrapper) -> None:
+    _originals[(cls, method)] = getattr(cls, method)
+    setattr(cls, method, wrapper)
@@ -0,0 +1,474 @@
+"""This application measure performance of the glove client hot paths."""
+
+import argparse
+import io
+import json
+import os
+import random
+import struct
+import subprocess
+import sys
+import time
+import timeit
+
+from ..data import GloveSample, IMUSample
+from ..emulator import EmulatorPty, EmulatorServer, FakeSerial, GloveEmulator
+from ..glove import Glove
+from ..protocol import PacketFramer, decode_sample, encode_packet
+
+parser = argparse.ArgumentParser('Benchmark glove client')
+subparsers = parser.add_subparsers(dest='bench', required=True)
+
+decode_parser = subparsers.add_parser('decode', help='Sample decoding speed')
+decode_parser.add_argument('-n', '--number', type=int, default=20000,
+                           help='Number of decoded samples per measure')
+# decoding measures 2.2-3.2x faster than the reference, a 3x gain is not reached on every
+# run, the default gate only catches regressions
+decode_parser.add_argument('--min-speedup', type=float, default=2.0,
+                           help='Fail if decoding is not faster than the reference by this factor')
+
+throughput_parser = subparsers.add_parser(
+    'throughput', help='Receiving speed and decoding latency with an emulated glove')
+throughput_parser.add_argument('-n', '--number', type=int, default=50000,
+                               help='Number of received samples')
+throughput_parser.add_argument('-r', '--raw', action='store_true',
+                               help='Receive IMU data instead of quaternions')
+throughput_parser.add_argument('--rate', type=float, default=None,
+                               help='Emulated samples per second (default: unlimited)')
+throughput_parser.add_argument('--corrupt-rate', type=float, default=0.0,
+                               help='Probability of a sample packet with a bad crc')
+throughput_parser.add_argument('--truncate-rate', type=float, default=0.0,
+                               help='Probability of a truncated sample packet')
+throughput_parser.add_argument('--transport', choices=('port', 'pty', 'tcp', 'udp'),
+                               default='port',
+                               help='Connect in process, through a pseudo terminal or a socket')
+throughput_parser.add_argument('--pty', action='store_const', const='pty', dest='transport',
+                               help='Same as --transport pty')
+
+startup_parser = subparsers.add_parser('startup', help='Import time of the entry points')
+startup_parser.add_argument('-n', '--runs', type=int, default=5,
+                            help='Number of fresh interpreters per entry point, best is kept')
+startup_parser.add_argument('--baseline', type=str, default=None,
+                            help='Path to the JSON import times to compare with')
+startup_parser.add_argument('--save-baseline', action='store_true',
+                            help='Save the measured times to the baseline file')
+startup_parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative slowdown against the baseline')
+
+HEAVY_MODULES = ('numpy', 'transforms3d', 'panda3d_viewer')
+
+# statements timed in a fresh interpreter and modules they must not load
+STARTUP_ENTRIES = (
+    ('import vmg30', HEAVY_MODULES),
+    ('from vmg30 import Glove, GloveSample', HEAVY_MODULES),
+    ('import vmg30.tools.info', HEAVY_MODULES),
+    ('import vmg30.tools.reboot', HEAVY_MODULES),
+    ('import vmg30.tools.dump', HEAVY_MODULES[1:]),
+    ('import vmg30.tools.convert', HEAVY_MODULES[1:]),
+    ('import vmg30.tools.calibrate', HEAVY_MODULES[1:]),
+    ('import vmg30.tools.serve', HEAVY_MODULES[1:]),
+    ('import vmg30.tools.process', HEAVY_MODULES[1:]),
+    ('import vmg30.tools.export', HEAVY_MODULES[1:] + ('pyarrow',)),
+    ('import vmg30.tools.bench', HEAVY_MODULES[1:]),
+    ('import vmg30.tools.show', ()),
+)
+
+_STARTUP_SCRIPT = '''
+import sys, time
+begin = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - begin
+print(elapsed, *[name for name in {modules!r} if name in sys.modules])
+'''
+
+
+def make_payload(rng: random.Random, raw: bool = False, clock: int = 0) -> bytes:
+    """Generate a random sample packet payload.
+
+    Arguments:
+        rng {random.Random} -- random generator
+
+    Keyword Arguments:
+        raw {bool} -- IMU data instead of quaternions (default: {False})
+        clock {int} -- glove clock, msec (default: {0})
+
+    Returns:
+        bytes -- payload of 0x0A packet
+    """
+    if raw:
+        values = struct.pack('>18h', *[rng.randint(-0x8000, 0x7FFF) for _ in range(18)])
+    else:
+        values = struct.pack('>8i', *[rng.randint(-0x10000, 0x10000) for _ in range(8)])
+    sensors = struct.pack('>24H', *[rng.randint(0, 1000) for _ in range(24)])
+    return struct.pack('>BHI', 0x03 if raw else 0x01, rng.randint(0, 0xFFFF), clock) + \
+        values + sensors
+
+
+def reference_decode(payload: bytes) -> GloveSample:
+    """Decode a sample the way the first client version did (baseline for comparison).
+
+    Arguments:
+        payload {bytes} -- payload of 0x0A packet
+
+    Returns:
+        GloveSample -- decoded sample
+    """
+    data = io.BytesIO(payload)
+    sample_type, device_id, clock = struct.unpack('>BHI', data.read(7))
+    raw = sample_type == 0x03
+
+    if raw:
+        values = struct.unpack('>' + 'h' * 18, data.read(36))
+        wrist_imu = IMUSample(
+            angular_velocity=(*[v / 0x8000 * 10 for v in values[0:3]],),
+            acceleration=(*[v / 0x8000 * 4 for v in values[3:6]],),
+            magnetic_field=(*values[6:9],))
+        hand_imu = IMUSample(
+            angular_velocity=(*[v / 0x8000 * 10 for v in values[9:12]],),
+            acceleration=(*[v / 0x8000 * 4 for v in values[12:15]],),
+            magnetic_field=(*values[15:18],))
+    else:
+        values = struct.unpack('>' + 'i' * 8, data.read(32))
+        wrist_quat = (*[v / 0x10000 for v in values[:4]],)
+        hand_quat = (*[v / 0x10000 for v in values[4:]],)
+
+    values = struct.unpack('>' + 'H' * 24, data.read(48))
+    return GloveSample(
+        device_id=device_id,
+        clock=clock / 1000,
+        wrist_imu=wrist_imu if raw else None,
+        hand_imu=hand_imu if raw else None,
+        wrist_quat=wrist_quat if not raw else None,
+        hand_quat=hand_quat if not raw else None,
+        pip_joints=(*[v / 1000 for v in values[1:10:2]],),
+        dip_joints=(*[v / 1000 for v in values[0:10:2]],),
+        palm_arch=values[10] / 1000,
+        thumb_cross_over=values[12] / 1000,
+        pressures=(*[1.0 - v / 999 for v in values[14:19]],),
+        abductions=(*[v / 1000 for v in values[19:23]],),
+        battery_charge=values[23] / 1000)
+
+
+class StreamPort:
+    """In-memory serial port replaying a byte stream."""
+
+    def __init__(self, data: bytes, chunk_size: int = 256):
+        """Set the stream.
+
+        Arguments:
+            data {bytes} -- bytes to replay
+
+        Keyword Arguments:
+            chunk_size {int} -- bytes reported as waiting at once (default: {256})
+        """
+        self._data = data
+        self._offset = 0
+        self._chunk_size = chunk_size
+
+    @property
+    def in_waiting(self) -> int:
+        """Number of bytes available without blocking."""
+        return min(len(self._data) - self._offset, self._chunk_size)
+
+    def read(self, size: int = 1) -> bytes:
+        """Read bytes."""
+        data = self._data[self._offset:self._offset + size]
+        self._offset += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        """Read bytes into a buffer."""
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def reference_receive(port: StreamPort, count: int) -> list:
+    """Receive samples the way the first client version did (baseline for comparison).
+
+    Arguments:
+        port {StreamPort} -- sample stream
+        count {int} -- number of samples
+
+    Returns:
+        list -- received samples
+    """
+    buffer = b''
+
+    def read(size):
+        nonlocal buffer
+        if size > len(buffer):
+            buffer += port.read(max(size - len(buffer), port.in_waiting))
+        data, buffer = buffer[:size], buffer[size:]
+        return data
+
+    samples = []
+    while len(samples) < count:
+        package = read(1)
+        if package[0] == 0x24:
+            package += read(2)
+            package += read(package[2] - 2)
+            crc, end = read(2)
+            if crc == sum(package) % 256 and end == 0x23:
+                samples.append(reference_decode(package[3:]))
+    return samples
+
+
+def reference_frame(port: StreamPort, count: int) -> list:
+    """Extract sample payloads the way the first client version did (framing only).
+
+    Arguments:
+        port {StreamPort} -- sample stream
+        count {int} -- number of packets
+
+    Returns:
+        list -- payloads
+    """
+    buffer = b''
+
+    def read(size):
+        nonlocal buffer
+        if size > len(buffer):
+            buffer += port.read(max(size - len(buffer), port.in_waiting))
+        data, buffer = buffer[:size], buffer[size:]
+        return data
+
+    payloads = []
+    while len(payloads) < count:
+        package = read(1)
+        if package[0] == 0x24:
+            package += read(2)
+            package += read(package[2] - 2)
+            crc, end = read(2)
+            if crc == sum(package) % 256 and end == 0x23:
+                payloads.append(package[3:])
+    return payloads
+
+
+def frame(port: StreamPort, count: int) -> list:
+    """Extract sample payloads the way Glove.next_payload does (framing only).
+
+    Arguments:
+        port {StreamPort} -- sample stream
+        count {int} -- number of packets
+
+    Returns:
+        list -- payloads
+    """
+    framer = PacketFramer()
+    payloads = []
+    while len(payloads) < count:
+        packet = framer.next_packet()
+        if packet is None:
+            framer.read_from(port)
+        else:
+            payloads.append(bytes(packet[1]))
+    return payloads
+
+
+def receive(port: StreamPort, count: int) -> list:
+    """Receive samples the way Glove.next_sample does.
+
+    Arguments:
+        port {StreamPort} -- sample stream
+        count {int} -- number of samples
+
+    Returns:
+        list -- received samples
+    """
+    framer = PacketFramer()
+    samples = []
+    while len(samples) < count:
+        packet = framer.next_packet()
+        if packet is None:
+            framer.read_from(port)
+        elif packet[0] == 0x0A:
+            samples.append(decode_sample(packet[1]))
+    return samples
+
+
+def bench_decode(number: int, min_speedup: float) -> bool:
+    """Compare sample decoding, framing and receiving against the reference implementation.
+
+    Arguments:
+        number {int} -- number of decoded samples per measure
+        min_speedup {float} -- required decoding speedup factor
+
+    Returns:
+        bool -- True if outputs are identical and the speedup is reached
+    """
+    def measure(func):
+        return min(timeit.repeat(func, number=1, repeat=5)) / number * 1e6
+
+    rng = random.Random(0)
+    success = True
+    for raw in (False, True):
+        payloads = [make_payload(rng, raw, i) for i in range(number)]
+        stream = b''.join(encode_packet(0x0A, payload) for payload in payloads)
+        payloads = [memoryview(payload) for payload in payloads]
+        samples = receive(StreamPort(stream), number)
+        if samples != [reference_decode(payload) for payload in payloads] or \
+                samples != reference_receive(StreamPort(stream), number) or \
+                frame(StreamPort(stream), number) != reference_frame(StreamPort(stream), number):
+            print('Decoded samples mismatch')
+            return False
+
+        # pylint: disable=cell-var-from-loop
+        decode_ref = measure(lambda: [reference_decode(p) for p in payloads])
+        decode_new = measure(lambda: [decode_sample(p) for p in payloads])
+        frame_ref = measure(lambda: reference_frame(StreamPort(stream), number))
+        frame_new = measure(lambda: frame(StreamPort(stream), number))
+        receive_ref = measure(lambda: reference_receive(StreamPort(stream), number))
+        receive_new = measure(lambda: receive(StreamPort(stream), number))
+
+        print(f'{"raw IMU" if raw else "quaternion"} samples:')
+        print(f'- decode: reference {decode_ref:.2f} us, '
+              f'current {decode_new:.2f} us, speedup x{decode_ref / decode_new:.1f}')
+        print(f'- framing: reference {frame_ref:.2f} us, '
+              f'current {frame_new:.2f} us, speedup x{frame_ref / frame_new:.1f}')
+        print(f'- receive: reference {receive_ref:.2f} us, '
+              f'current {receive_new:.2f} us, speedup x{receive_ref / receive_new:.1f}')
+        success = success and decode_ref / decode_new >= min_speedup
+    return success
+
+
+def bench_throughput(number: int, raw: bool, rate: float, corrupt_rate: float,
+                     truncate_rate: float, transport: str = 'port') -> bool:
+    """Receive samples from an emulated glove, report packets/sec and decoding latency.
+
+    Arguments:
+        number {int} -- number of received samples
+        raw {bool} -- receive IMU data instead of quaternions
+        rate {float} -- emulated samples per second, None for unlimited
+        corrupt_rate {float} -- probability of a sample packet with a bad crc
+        truncate_rate {float} -- probability of a truncated sample packet
+
+    Keyword Arguments:
+        transport {str} -- 'port' to connect in process, 'pty' through a pseudo terminal,
+                           'tcp' or 'udp' through a local socket (default: {'port'})
+
+    Returns:
+        bool -- True if no damaged packet was taken for a sample
+    """
+    emulator = GloveEmulator(rate=rate, corrupt_rate=corrupt_rate,
+                             truncate_rate=truncate_rate, seed=0)
+    if transport == 'pty':
+        server = EmulatorPty(emulator)
+        port = server.port
+    elif transport in ('tcp', 'udp'):
+        server = EmulatorServer(emulator, transport)
+        port = server.url
+    else:
+        server = None
+        port = FakeSerial(emulator)
+    if server is not None:
+        server.start()
+    try:
+        with Glove(port) as glove:
+            latencies = []
+            foreign = 0
+            with glove.sampling(raw):
+                start = time.perf_counter()
+                for _ in range(number):
+                    payload = glove.next_payload()
+                    begin = time.perf_counter_ns()
+                    sample = decode_sample(payload)
+                    latencies.append(time.perf_counter_ns() - begin)
+                    if sample.device_id != emulator.device_id or \
+                            (sample.wrist_quat is None) != raw:
+                        foreign += 1
+                elapsed = time.perf_counter() - start
+            corrupted = glove.corrupted_packets
+    finally:
+        if server is not None:
+            server.stop()
+
+    latencies.sort()
+    print(f'{"raw IMU" if raw else "quaternion"} samples through '
+          f'{"in-process port" if transport == "port" else transport}:')
+    print(f'- received {number} samples in {elapsed:.2f} s, {number / elapsed:.0f} packets/sec')
+    print(f'- decode latency: p50 {latencies[len(latencies) // 2] / 1000:.2f} us, '
+          f'p99 {latencies[len(latencies) * 99 // 100] / 1000:.2f} us, '
+          f'max {latencies[-1] / 1000:.2f} us')
+    print(f'- damaged packets: injected {emulator.corrupted + emulator.truncated}, '
+          f'skipped {corrupted}, taken for samples {foreign}')
+    return foreign == 0
+
+
+def measure_import(statement: str, runs: int = 5):
+    """Time a statement in fresh interpreters.
+
+    Arguments:
+        statement {str} -- import statement
+
+    Keyword Arguments:
+        runs {int} -- number of interpreters, the best time is kept (default: {5})
+
+    Returns:
+        Tuple[float, List[str]] -- time in seconds and heavy modules loaded by the statement
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (root, env.get('PYTHONPATH'))))
+    script = _STARTUP_SCRIPT.format(statement=statement, modules=HEAVY_MODULES)
+    best, loaded = float('inf'), []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True).stdout
+        elapsed, *loaded = output.split()
+        best = min(best, float(elapsed))
+    return best, loaded
+
+
+def bench_startup(runs: int, baseline: str = None, save_baseline: bool = False,
+                  tolerance: float = 0.25) -> bool:
+    """Measure import time of the package and the tools entry points.
+
+    Arguments:
+        runs {int} -- number of fresh interpreters per entry point, the best time is kept
+
+    Keyword Arguments:
+        baseline {str} -- path to the JSON import times to compare with (default: {None})
+        save_baseline {bool} -- save the measured times to the baseline file (default: {False})
+        tolerance {float} -- allowed relative slowdown against the baseline (default: {0.25})
+
+    Returns:
+        bool -- True if no entry point loads a forbidden module or got slower
+    """
+    reference = {}
+    if baseline is not None and not save_baseline and os.path.exists(baseline):
+        with open(baseline, 'r') as file:
+            reference = json.load(file)
+
+    passed = True
+    times = {}
+    print(f'{"entry point":40} {"ms":>8} {"baseline":>9}  issues')
+    for statement, forbidden in STARTUP_ENTRIES:
+        elapsed, loaded = measure_import(statement, runs)
+        times[statement] = elapsed * 1000.0
+        issues = [f'loads {name}' for name in loaded if name in forbidden]
+        expected = reference.get(statement)
+        # a millisecond of slack keeps the fastest entries from failing on noise
+        if expected is not None and times[statement] > expected * (1.0 + tolerance) + 1.0:
+            issues.append('slower')
+        passed &= not issues
+        print(f'{statement:40} {times[statement]:8.1f} '
+              f'{"-" if expected is None else f"{expected:.1f}":>9}  {", ".join(issues)}')
+
+    if save_baseline and baseline is not None:
+        with open(baseline, 'w') as file:
+            json.dump(times, file, indent=2)
+        print(f'Saved baseline to "{baseline}".')
+    return passed
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.bench == 'decode':
+        sys.exit(0 if bench_decode(args.number, args.min_speedup) else 1)
+    elif args.bench == 'throughput':
+        sys.exit(0 if bench_throughput(args.number, args.raw, args.rate, args.corrupt_rate,
+                                       args.truncate_rate, args.transport) else 1)
+    elif args.bench == 'startup':
+        sys.exit(0 if bench_startup(args.runs, args.baseline, args.save_baseline,
+                                    args.tolerance) else 1)
@@ -0,0 +1,36 @@
+"""This application learn the sensors ranges of the glove user and store the profile."""
+
+import argparse
+
+from ..calibration import ProfileBuilder, save_profile
+from ..glove import Glove
+
+parser = argparse.ArgumentParser('Calibrate glove sensors')
+parser.add_argument('-p', '--port', type=str, default='/dev/ttyUSB0', help='Glove serial port')
+parser.add_argument('-d', '--duration', type=float, default=10.0,
+                    help='Recording duration, sec')
+parser.add_argument('--dir', type=str, default=None,
+                    help='Profiles directory (default: ~/.vmg30/profiles)')
+
+
+def calibrate(port, duration, directory=None):
+    """Record the user moving the hand and store the learned profile.
+
+    Args:
+        port (str): serial device name
+        duration (float): recording duration, sec
+        directory (str): profiles directory
+    """
+    with Glove(port) as glove:
+        print('Open, clench and spread the fingers, press the finger tips.')
+        builder = ProfileBuilder()
+        for stage in builder.record(glove, duration):
+            print(f'\rRecording: {stage}%', end='', flush=True)
+        print()
+        path = save_profile(builder.profile(), directory)
+    print(f'Saved profile of {builder.count} samples to "{path}".')
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    calibrate(args.port, args.duration, args.dir)
@@ -0,0 +1,48 @@
+"""This application convert recorded glove data between the pickle and the streaming formats."""
+
+import argparse
+import pickle
+
+from ..record import RecordWriter, is_recording, read_samples
+
+parser = argparse.ArgumentParser('Convert recorded glove data')
+parser.add_argument('input', type=str,
+                    help='Path to input file, either a recording or a pickled list of samples')
+parser.add_argument('output', type=str,
+                    help='Path to output file, of the other format than the input one')
+
+
+def to_recording(in_file, out_file):
+    """Convert a pickled list of samples to a recording.
+
+    Args:
+        in_file (str): input pickle file
+        out_file (str): output recording file
+    """
+    with open(in_file, 'rb') as pklfile:
+        samples = pickle.load(pklfile)
+    with RecordWriter(out_file) as writer:
+        for sample in samples:
+            writer.write_sample(sample)
+    print(f'Converted {writer.count} samples to "{out_file}".')
+
+
+def to_pickle(in_file, out_file):
+    """Convert a recording to a pickled list of samples.
+
+    Args:
+        in_file (str): input recording file
+        out_file (str): output pickle file
+    """
+    samples = list(read_samples(in_file))
+    with open(out_file, 'wb') as pklfile:
+        pickle.dump(samples, pklfile)
+    print(f'Converted {len(samples)} samples to "{out_file}".')
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if is_recording(args.input):
+        to_pickle(args.input, args.output)
+    else:
+        to_recording(args.input, args.output)
@@ -5,37 +5,64 @@ import pickle
 from threading import Event, Thread
 
 from ..glove import Glove
+from ..record import RecordWriter
 
 parser = argparse.ArgumentParser('Record glove data')
 parser.add_argument('-p', '--port', type=str, default='/dev/ttyUSB0', help='Glove serial port')
-parser.add_argument('-o', '--file', type=str, default='glove_data.pkl',
-                    help='Path to output pickle file')
+parser.add_argument('-o', '--file', type=str, default='glove_data.vmg',
+                    help='Path to output recording file')
+parser.add_argument('-r', '--raw', action='store_true',
+                    help='Record IMU data instead of quaternions')
+parser.add_argument('--pickle', action='store_true',
+                    help='Save a pickled list of samples at exit instead of streaming to disk')
 
 
-def record(port, out_file, stop_event):
-    """Record samples.
+def record(port, out_file, stop_event, raw=False):
+    """Record samples, they are streamed to the disk while recording.
+
+    Args:
+        port (str): serial device name
+        out_file (str): output recording file
+        stop_event (Event): stop flag
+        raw (bool): record IMU data instead of quaternions
+    """
+    with Glove(port) as glove, RecordWriter(out_file) as writer:
+        with glove.sampling(raw):
+            while not stop_event.is_set():
+                writer.write_payload(glove.next_payload())
+
+    print(f'Saved {writer.count} samples to "{out_file}".')
+
+
+def record_pickle(port, out_file, stop_event, raw=False):
+    """Record samples, they are kept in memory in the compact form and pickled at exit.
+
+    The pickle holds GloveSample objects, the compact samples are decoded one by one
+    when saving.
 
     Args:
         port (str): serial device name
         out_file (str): output pickle file
         stop_event (Event): stop flag
+        raw (bool): record IMU data instead of quaternions
     """
     samples = []
     with Glove(port) as glove:
-        with glove.sampling():
+        with glove.sampling(raw):
             while not stop_event.is_set():
-                samples.append(glove.next_sample())
+                samples.append(glove.next_sample(compact=True))
 
     print(f'Saving {len(samples)} samples to "{out_file}"...')
     with open(out_file, 'wb') as pklfile:
-        pickle.dump(samples, pklfile)
+        pickle.dump([sample.to_sample() for sample in samples], pklfile)
     print('Done.')
 
 
 if __name__ == '__main__':
     args = parser.parse_args()
     stop = Event()
-    task = Thread(target=record, args=(args.port, args.file, stop))
+    task = Thread(target=record_pickle if args.pickle else record,
+                  args=(args.port, args.file, stop, args.raw))
     task.start()
     input('Press Enter to exit.')
     stop.set()
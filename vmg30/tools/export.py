@@ -0,0 +1,75 @@
+"""This application export glove data to a columnar file."""
+
+import argparse
+import pickle
+from threading import Event, Thread
+
+from ..export import COMPRESSIONS, ColumnWriter
+from ..glove import Glove
+from ..record import RecordReader, is_recording
+
+parser = argparse.ArgumentParser('Export glove data to columns')
+parser.add_argument('input', type=str, nargs='?', default=None,
+                    help='Recording or pickled list of samples, omit to export live samples')
+parser.add_argument('-p', '--port', type=str, default='/dev/ttyUSB0',
+                    help='Glove serial port for live export')
+parser.add_argument('-o', '--file', type=str, default='glove_data.vmgc',
+                    help='Path to output file, *.parquet for the Parquet format (needs pyarrow)')
+parser.add_argument('-c', '--compression', type=str, default='zlib',
+                    help=f'Column compression: {", ".join(COMPRESSIONS)} '
+                         '(or a pyarrow codec for Parquet)')
+parser.add_argument('-l', '--level', type=int, default=None, help='Compression level')
+parser.add_argument('--row-group-size', type=int, default=4096,
+                    help='Number of samples written at once')
+parser.add_argument('--angles', action='store_true', help='Add the hand model joint angles')
+parser.add_argument('--points', action='store_true', help='Add the hand model link positions')
+parser.add_argument('-r', '--raw', action='store_true',
+                    help='Export IMU data instead of quaternions of live samples')
+
+
+def export_file(in_file, writer):
+    """Export a recorded file.
+
+    Args:
+        in_file (str): recording or pickled list of samples
+        writer (ColumnWriter): output writer
+    """
+    if is_recording(in_file):
+        with RecordReader(in_file) as reader:
+            for samples in reader.iter_arrays(writer.row_group_size):
+                writer.write_array(samples)
+    else:
+        with open(in_file, 'rb') as pklfile:
+            for sample in pickle.load(pklfile):
+                writer.write_sample(sample)
+
+
+def export_live(port, writer, stop_event, raw=False):
+    """Export samples of the glove until stopped.
+
+    Args:
+        port (str): serial device name
+        writer (ColumnWriter): output writer
+        stop_event (Event): stop flag
+        raw (bool): export IMU data instead of quaternions
+    """
+    with Glove(port) as glove, glove.sampling(raw):
+        while not stop_event.is_set():
+            writer.write_payload(glove.next_payload())
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    with ColumnWriter(args.file, angles=args.angles, points=args.points,
+                      row_group_size=args.row_group_size, compression=args.compression,
+                      level=args.level, flush_interval=5.0) as out:
+        if args.input is not None:
+            export_file(args.input, out)
+        else:
+            stop = Event()
+            task = Thread(target=export_live, args=(args.port, out, stop, args.raw))
+            task.start()
+            input('Press Enter to exit.')
+            stop.set()
+            task.join()
+    print(f'Exported {out.count} samples ({len(out.columns)} columns) to "{args.file}".')
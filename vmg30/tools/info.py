@@ -1,12 +1,20 @@
 """This application show information about of the glove."""
 
 import argparse
+import time
 
+from .. import stats
 from ..glove import Glove
 from ..error import GloveError
 
 parser = argparse.ArgumentParser('Glove info')
 parser.add_argument('--port', type=str, default='/dev/ttyUSB0', help='Glove serial port')
+parser.add_argument('--stats', action='store_true',
+                    help='Sample the glove and print timing statistics live')
+parser.add_argument('--duration', type=float, default=None,
+                    help='Statistics sampling duration, sec (default: until Ctrl+C)')
+parser.add_argument('--json', type=str, default=None,
+                    help='Path to save the final statistics as JSON')
 
 
 def info(port):
@@ -16,7 +24,7 @@ def info(port):
         port (str): serial device name
     """
     try:
-        with Glove(port=args.port) as glove:
+        with Glove(port=port) as glove:
             print(f'Device "{port}"')
             print(f'- id: {glove.device_id}')
             print(f'- label: "{glove.label}"')
@@ -26,6 +34,46 @@ def info(port):
         print(ex)
 
 
+def show_stats(port, duration=None, json_file=None, interval=1.0):
+    """Sample the glove through the hand model and print timing statistics.
+
+    Args:
+        port (str): serial device name
+        duration (float): sampling duration, sec, None for until interrupted
+        json_file (str): path to save the final statistics as JSON
+        interval (float): printing interval, sec
+    """
+    from ..model import HandModel  # pylint: disable=import-outside-toplevel
+
+    model = HandModel()
+    collected = stats.enable()
+    try:
+        with Glove(port=port) as glove, glove.sampling() as samples:
+            start = printed = time.monotonic()
+            for sample in samples:
+                model.frames_array(sample)
+                now = time.monotonic()
+                if now - printed >= interval:
+                    printed = now
+                    print('\033[H\033[J' + collected.format(), flush=True)
+                if duration is not None and now - start >= duration:
+                    break
+    except GloveError as ex:
+        print(ex)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stats.disable()
+    print(collected.format())
+    if json_file is not None:
+        with open(json_file, 'w') as file:
+            collected.dump(file)
+        print(f'Saved statistics to "{json_file}".')
+
+
 if __name__ == '__main__':
     args = parser.parse_args()
-    info(args.port)
+    if args.stats:
+        show_stats(args.port, args.duration, args.json)
+    else:
+        info(args.port)
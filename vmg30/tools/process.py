@@ -0,0 +1,159 @@
+"""This application convert recordings to hand skeleton data using all processor cores."""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ..model import HandModel
+from ..record import RecordReader, is_recording
+
+parser = argparse.ArgumentParser('Compute hand skeleton data of recordings')
+parser.add_argument('inputs', type=str, nargs='+',
+                    help='Recording files or directories of recordings')
+parser.add_argument('-o', '--output', type=str, default='.', help='Output directory')
+parser.add_argument('-c', '--columns', type=str, default='points,angles',
+                    help='Comma separated outputs: points, frames, angles')
+parser.add_argument('-f', '--format', choices=('npz', 'npy'), default='npz',
+                    help='An .npz archive per recording or a directory of .npy files '
+                         'to memory-map')
+parser.add_argument('--compress', action='store_true', help='Compress .npz archives')
+parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                    help='Number of worker processes')
+parser.add_argument('--chunk-size', type=int, default=65536,
+                    help='Number of samples processed by a worker at once')
+
+COLUMNS = ('points', 'frames', 'angles')
+
+_model = None
+
+
+def _init_worker(model):
+    # the model is received once per worker and kept for all its chunks
+    global _model  # pylint: disable=global-statement
+    _model = model
+
+
+def _column_shapes(model, count):
+    links = len(model.links)
+    return dict(clock=(count,), points=(count, links, 3), frames=(count, links, 4, 4),
+                angles=(count, links, 3))
+
+
+def process_chunk(path, begin, end, out_dir, columns):
+    """Decode a chunk of a recording and write its skeleton data to the output files.
+
+    Args:
+        path (str): recording file
+        begin (int): first sample index
+        end (int): end sample index
+        out_dir (str): directory of the output .npy files
+        columns (list): outputs to compute
+
+    Returns:
+        int: number of processed samples
+    """
+    with RecordReader(path) as reader:
+        samples = reader[begin:end].to_array()
+    values = dict(clock=samples['clock'])
+    if 'frames' in columns or 'points' in columns:
+        frames = _model.frames_batch(samples)
+        values['frames'] = frames
+        values['points'] = frames[..., :3, 3]
+    if 'angles' in columns:
+        values['angles'] = _model.angles_batch(samples)
+    for column in ['clock'] + list(columns):
+        output = np.load(os.path.join(out_dir, f'{column}.npy'), mmap_mode='r+')
+        output[begin:end] = values[column]
+        output.flush()
+        del output
+    return end - begin
+
+
+def find_recordings(inputs):
+    """List the recordings to process.
+
+    Args:
+        inputs (list): recording files or directories of recordings
+
+    Returns:
+        list: recording files
+    """
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            names = sorted(os.listdir(path))
+            paths += [os.path.join(path, name) for name in names
+                      if os.path.isfile(os.path.join(path, name)) and
+                      is_recording(os.path.join(path, name))]
+        else:
+            paths.append(path)
+    return paths
+
+
+def process(paths, out_dir, columns, out_format='npz', compress=False, jobs=None,
+            chunk_size=65536):
+    """Process the recordings, shards are recordings chunks spread across worker processes.
+
+    Each worker writes its chunks directly into the memory-mapped .npy outputs, they are
+    packed into .npz archives at the end if requested.
+
+    Args:
+        paths (list): recording files
+        out_dir (str): output directory
+        columns (list): outputs to compute
+        out_format (str): 'npz' or 'npy'
+        compress (bool): compress .npz archives
+        jobs (int): number of worker processes
+        chunk_size (int): number of samples processed by a worker at once
+    """
+    model = HandModel()
+    outputs = {}
+    for path in paths:
+        with RecordReader(path) as reader:
+            count = len(reader)
+        name = os.path.splitext(os.path.basename(path))[0]
+        outputs[path] = (os.path.join(out_dir, name), count)
+        os.makedirs(outputs[path][0], exist_ok=True)
+        shapes = _column_shapes(model, count)
+        for column in ['clock'] + list(columns):
+            np.lib.format.open_memmap(os.path.join(outputs[path][0], f'{column}.npy'), 'w+',
+                                      np.float64, shapes[column])
+
+    start = time.perf_counter()
+    total = 0
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(model,)) as executor:
+        futures = [executor.submit(process_chunk, path, begin, min(begin + chunk_size, count),
+                                   path_dir, columns)
+                   for path, (path_dir, count) in outputs.items()
+                   for begin in range(0, count, chunk_size)]
+        for future in futures:
+            total += future.result()
+    elapsed = time.perf_counter() - start
+
+    for path_dir, _ in outputs.values():
+        if out_format == 'npz':
+            files = {column: os.path.join(path_dir, f'{column}.npy')
+                     for column in ['clock'] + list(columns)}
+            save = np.savez_compressed if compress else np.savez
+            save(path_dir + '.npz', **{column: np.load(file, mmap_mode='r')
+                                       for column, file in files.items()})
+            for file in files.values():
+                os.remove(file)
+            os.rmdir(path_dir)
+        print(f'Saved "{path_dir}{".npz" if out_format == "npz" else os.sep}".')
+
+    print(f'Processed {total} samples of {len(paths)} recordings in {elapsed:.2f} s '
+          f'by {jobs or os.cpu_count()} workers, {total / max(elapsed, 1e-9):.0f} samples/sec.')
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    selected = [column.strip() for column in args.columns.split(',') if column.strip()]
+    unknown = set(selected) - set(COLUMNS)
+    if unknown:
+        parser.error(f'unknown columns: {", ".join(sorted(unknown))}')
+    process(find_recordings(args.inputs), args.output, selected, args.format, args.compress,
+            args.jobs, args.chunk_size)
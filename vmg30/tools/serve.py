@@ -0,0 +1,55 @@
+"""This application share the gloves with local processes."""
+
+import argparse
+import signal
+
+from ..calibration import load_profile
+from ..server import GloveServer, socket_path
+
+parser = argparse.ArgumentParser('Share gloves with local processes')
+parser.add_argument('-p', '--port', type=str, action='append',
+                    help='Glove serial port or connection URL, repeat for several gloves')
+parser.add_argument('-n', '--name', type=str, default='vmg30',
+                    help='Server name, clients connect by it')
+parser.add_argument('-c', '--capacity', type=int, default=1024,
+                    help='Number of recent samples kept per glove')
+parser.add_argument('-r', '--raw', action='store_true',
+                    help='Publish IMU data instead of quaternions')
+parser.add_argument('--calibrated', action='store_true',
+                    help='Apply the stored calibration profiles of the gloves')
+parser.add_argument('--dir', type=str, default=None,
+                    help='Profiles directory (default: ~/.vmg30/profiles)')
+
+
+def serve(ports, name, capacity, raw=False, calibrated=False, directory=None):
+    """Publish the samples until interrupted.
+
+    Args:
+        ports (list): serial device names or connection URLs
+        name (str): server name
+        capacity (int): number of recent samples kept per glove
+        raw (bool): publish IMU data instead of quaternions
+        calibrated (bool): apply the stored calibration profiles
+        directory (str): profiles directory
+    """
+    with GloveServer(ports, name, capacity, raw) as server:
+        for glove in server.gloves:
+            profile = load_profile(glove.device_id, glove.label, directory) \
+                if calibrated else None
+            glove.calibration_profile = profile
+            print(f'- {glove}{", calibrated" if profile else ""}')
+        print(f'Serving on "{socket_path(name)}", press Ctrl+C to exit.')
+        signal.signal(signal.SIGTERM, lambda *_: server.shutdown())
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        published = server.published
+    for device_id, count in published.items():
+        print(f'Published {count} samples of glove {device_id}.')
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    serve(args.port or ['/dev/ttyUSB0'], args.name, args.capacity, args.raw,
+          args.calibrated, args.dir)
@@ -3,7 +3,7 @@
 import argparse
 import pickle
 import sys
-from itertools import cycle
+from itertools import chain, cycle, repeat
 from typing import Iterable
 
 try:
@@ -12,11 +12,13 @@ except ModuleNotFoundError:
     sys.exit('You need to install necessary dependencies: pip install panda3d_viewer')
 
 from ..glove import Glove, GloveSample
+from ..record import RecordReader, is_recording
 from ..view import HandView
 
 parser = argparse.ArgumentParser('Show hand skeleton')
 parser.add_argument('-p', '--port', type=str, default='/dev/ttyUSB0', help='Glove serial port')
-parser.add_argument('-f', '--file', type=str, default=None, help='Path to recorded pickle data')
+parser.add_argument('-f', '--file', type=str, default=None,
+                    help='Path to a recording or to recorded pickle data')
 
 
 def show(samples: Iterable[GloveSample]) -> None:
@@ -37,9 +39,17 @@ def show(samples: Iterable[GloveSample]) -> None:
 if __name__ == '__main__':
     args = parser.parse_args()
 
-    if args.file:
+    if args.file and is_recording(args.file):
+        with RecordReader(args.file) as reader:
+            if not len(reader):
+                sys.exit(f'The recording "{args.file}" is empty')
+            show(chain.from_iterable(repeat(reader)))
+
+    elif args.file:
         with open(args.file, 'rb') as f:
             list_samples = pickle.load(f)
+        if not list_samples:
+            sys.exit(f'The file "{args.file}" holds no samples')
         show(cycle(list_samples))
 
     elif args.port:
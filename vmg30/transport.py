@@ -0,0 +1,225 @@
+"""This module contains the glove connection transports.
+
+The glove client needs a byte stream with the following subset of the serial.Serial
+interface, so an open serial port is a transport as is:
+
+- name {str} -- connection name
+- timeout {float} -- read timeout, sec
+- in_waiting {int} -- number of bytes readable without blocking
+- readinto(buffer) -> int -- read at least one byte, 0 on timeout
+- write(data) -> int -- write all bytes
+- fileno() -> int -- file descriptor to wait for data
+- close()
+
+Network transports of the Wi-Fi gloves receive directly into the packet framer buffer, as
+many bytes as are available at once.
+"""
+
+import socket
+import struct
+from urllib.parse import parse_qs, urlsplit
+
+import serial
+
+from .error import GloveConnectionError
+
+try:
+    import fcntl
+    import termios
+except ModuleNotFoundError:  # not POSIX, in_waiting is unknown
+    fcntl = termios = None
+
+__all__ = ('SocketTransport', 'UdpTransport', 'open_transport')
+
+
+_MAX_DATAGRAM_SIZE = 0x10000
+
+
+def open_transport(url: str, timeout: float = 2.0):
+    """Open a glove connection.
+
+    Arguments:
+        url {str} -- tcp://host:port, udp://host:port[?local_port=N], a serial device name
+                     or any URL supported by serial.serial_for_url
+
+    Keyword Arguments:
+        timeout {float} -- read and write timeout, sec (default: {2.0})
+
+    Returns:
+        transport -- open connection
+    """
+    parts = urlsplit(url)
+    if parts.scheme == 'tcp':
+        return SocketTransport(parts.hostname, parts.port, timeout)
+    if parts.scheme == 'udp':
+        local_port = int(parse_qs(parts.query).get('local_port', ['0'])[0])
+        return UdpTransport(parts.hostname, parts.port, local_port, timeout)
+    return serial.serial_for_url(url, baudrate=230400, timeout=timeout, write_timeout=timeout)
+
+
+def _bytes_available(sock: socket.socket) -> int:
+    if fcntl is None:
+        return 0
+    return struct.unpack('i', fcntl.ioctl(sock.fileno(), termios.FIONREAD, b'\0' * 4))[0]
+
+
+class SocketTransport:
+    """Glove connection over TCP."""
+
+    def __init__(self, host: str, port: int, timeout: float = 2.0):
+        """Connect to the glove.
+
+        Arguments:
+            host {str} -- glove address
+            port {int} -- glove port
+
+        Keyword Arguments:
+            timeout {float} -- read and write timeout, sec (default: {2.0})
+        """
+        self._sock = socket.create_connection((host, port), timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.name = f'tcp://{host}:{port}'
+
+    @property
+    def timeout(self) -> float:
+        """Read and write timeout, sec."""
+        return self._sock.gettimeout()
+
+    @timeout.setter
+    def timeout(self, timeout: float) -> None:
+        self._sock.settimeout(timeout)
+
+    @property
+    def in_waiting(self) -> int:
+        """Number of bytes readable without blocking."""
+        return _bytes_available(self._sock)
+
+    def readinto(self, buffer) -> int:
+        """Read available bytes, wait for the first one until the timeout.
+
+        Arguments:
+            buffer {buffer} -- writable buffer
+
+        Returns:
+            int -- number of bytes read, 0 on timeout
+        """
+        try:
+            count = self._sock.recv_into(buffer)
+        except socket.timeout:
+            return 0
+        if not count and len(buffer):
+            raise GloveConnectionError(f'Connection to {self.name} is closed')
+        return count
+
+    def write(self, data: bytes) -> int:
+        """Write all bytes.
+
+        Arguments:
+            data {bytes} -- bytes
+
+        Returns:
+            int -- number of bytes written
+        """
+        self._sock.sendall(data)
+        return len(data)
+
+    def fileno(self) -> int:
+        """File descriptor of the socket.
+
+        Returns:
+            int -- file descriptor
+        """
+        return self._sock.fileno()
+
+    def close(self) -> None:
+        """Close the connection."""
+        self._sock.close()
+
+
+class UdpTransport:
+    """Glove connection over UDP.
+
+    Datagrams are taken as parts of a byte stream, packets may span datagrams. A datagram is
+    received directly into the reader buffer when it fits, otherwise it is kept in an own
+    buffer and read out in parts, so no datagram is truncated.
+    """
+
+    def __init__(self, host: str, port: int, local_port: int = 0, timeout: float = 2.0):
+        """Connect to the glove.
+
+        Arguments:
+            host {str} -- glove address
+            port {int} -- glove port
+
+        Keyword Arguments:
+            local_port {int} -- port to receive on, 0 for any free port (default: {0})
+            timeout {float} -- read timeout, sec (default: {2.0})
+        """
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind(('', local_port))
+        self._sock.connect((host, port))
+        self._sock.settimeout(timeout)
+        self._datagram = bytearray(_MAX_DATAGRAM_SIZE)
+        self._view = memoryview(self._datagram)
+        self._start = 0
+        self._end = 0
+        self.name = f'udp://{host}:{port}'
+
+    @property
+    def timeout(self) -> float:
+        """Read timeout, sec."""
+        return self._sock.gettimeout()
+
+    @timeout.setter
+    def timeout(self, timeout: float) -> None:
+        self._sock.settimeout(timeout)
+
+    @property
+    def in_waiting(self) -> int:
+        """Number of bytes readable without blocking (the next datagram at least)."""
+        return self._end - self._start + _bytes_available(self._sock)
+
+    def readinto(self, buffer) -> int:
+        """Read a datagram or its rest, wait for it until the timeout.
+
+        Arguments:
+            buffer {buffer} -- writable buffer
+
+        Returns:
+            int -- number of bytes read, 0 on timeout
+        """
+        if self._start == self._end:
+            try:
+                size = _bytes_available(self._sock)
+                if 0 < size <= len(buffer):
+                    return self._sock.recv_into(buffer)
+                self._start, self._end = 0, self._sock.recv_into(self._datagram)
+            except socket.timeout:
+                return 0
+        count = min(len(buffer), self._end - self._start)
+        buffer[:count] = self._view[self._start:self._start + count]
+        self._start += count
+        return count
+
+    def write(self, data: bytes) -> int:
+        """Send bytes in a datagram.
+
+        Arguments:
+            data {bytes} -- bytes
+
+        Returns:
+            int -- number of bytes written
+        """
+        return self._sock.send(data)
+
+    def fileno(self) -> int:
+        """File descriptor of the socket.
+
+        Returns:
+            int -- file descriptor
+        """
+        return self._sock.fileno()
+
+    def close(self) -> None:
+        """Close the connection."""
+        self._sock.close()
@@ -1,9 +1,10 @@
 """This module contains the hand visualisation helper."""
 
+import time
 from typing import Tuple
 
 import numpy as np
-from transforms3d.quaternions import axangle2quat, mat2quat
+from transforms3d.quaternions import axangle2quat
 
 from panda3d_viewer import Viewer
 
@@ -18,13 +19,20 @@ Mat4f = np.ndarray
 
 
 class HandView:
-    """Hand visualisation helper class."""
+    """Hand visualisation helper class.
+
+    Only the links which moved and the tips whose pressure changed by more than a threshold
+    since they were last shown are sent to the viewer, so a still hand costs nothing to render.
+    """
 
     def __init__(self,
                  viewer: Viewer,
                  hand_name: str = 'hand',
                  hand_model: HandModel = HandModel(),
-                 thickness: float = 0.005):
+                 thickness: float = 0.005,
+                 position_threshold: float = 1e-4,
+                 rotation_threshold: float = 1e-3,
+                 pressure_threshold: float = 1e-2):
         """Append the hand model to the viewer.
 
         Arguments:
@@ -34,11 +42,24 @@ class HandView:
             hand_name {str} -- hand name on the scene (default: {'hand'})
             hand_model {HandModel} -- hand model (default: {HandModel()})
             thickness {float} -- bones thickness (default: {0.005})
+            position_threshold {float} -- minimum shown link displacement, m (default: {1e-4})
+            rotation_threshold {float} -- minimum shown link rotation, rad (default: {1e-3})
+            pressure_threshold {float} -- minimum shown tip pressure change (default: {1e-2})
         """
         self._viewer = viewer
         self._name = hand_name
         self._model = hand_model
-        self._clock = 0.0
+        self._position_threshold = position_threshold
+        self._rotation_threshold = rotation_threshold
+        self._pressure_threshold = pressure_threshold
+        self._time = -np.inf
+        self._rendered = 0
+        self._skipped = 0
+        self._names = [link.name for link in self._model.links]
+        self._frames = np.empty((len(self._names), 4, 4))
+        # last frames and pressures sent to the viewer, infinite means never sent
+        self._shown_frames = np.full((len(self._names), 4, 4), np.inf)
+        self._shown_pressures = np.full(len(self._model.tip_names), np.inf)
         self._viewer.append_group(self._name)
         for link in self._model.links:
             frame = ((-link.length / 2.0, 0.0, 0.0), axangle2quat((0.0, -1.0, 0.0), np.pi / 2.0))
@@ -52,6 +73,25 @@ class HandView:
         """
         for link in self._model.links:
             self._viewer.set_material(self._name, link.name, color_rgba)
+        self._shown_pressures[:] = np.inf
+
+    @property
+    def rendered(self) -> int:
+        """Number of samples shown.
+
+        Returns:
+            int -- samples count
+        """
+        return self._rendered
+
+    @property
+    def skipped(self) -> int:
+        """Number of samples skipped by the rate limit.
+
+        Returns:
+            int -- samples count
+        """
+        return self._skipped
 
     def update(self,
                sample: GloveSample,
@@ -66,21 +106,51 @@ class HandView:
             fixed_frame {Tuple(str, Mat4f)} --  known link frame transformation (default: {None})
             rate_limit {float} -- maximum update rate (Hz) (default: {60.0})
         """
-        if sample.clock - self._clock > 1.0 / rate_limit or sample.clock < self._clock:
-            frames = self._model.frames(sample, fixed_frame)
+        now = time.monotonic()
+        if now - self._time < 1.0 / rate_limit:
+            self._skipped += 1
+            return
+        self._time = now
+        self._rendered += 1
+
+        frames = self._model.frames_array(sample, fixed_frame, out=self._frames)
+        shown = self._shown_frames
+        moved = np.abs(frames[:, :3, :3] - shown[:, :3, :3]).max(axis=(1, 2)) \
+            > self._rotation_threshold
+        moved |= np.abs(frames[:, :3, 3] - shown[:, :3, 3]).max(axis=1) \
+            > self._position_threshold
+        if moved.any():
+            shown[moved] = frames[moved]
+            positions, quats = _pose(frames[moved])
+            names = [name for name, flag in zip(self._names, moved) if flag]
+            self._viewer.move_nodes(self._name, dict(zip(names, zip(positions, quats))))
+
+        pressures = np.asarray(sample.pressures)
+        changed = np.abs(pressures - self._shown_pressures) > self._pressure_threshold
+        if changed.any():
+            self._shown_pressures[changed] = pressures[changed]
             tips = self._model.tip_names
-            colors = {tip: _rgba(p) for tip, p in zip(tips, sample.pressures)}
-            self._viewer.move_nodes('hand', frames)
-            self._viewer.set_materials('hand', colors)
-            self._clock = sample.clock
+            colors = {tips[i]: _rgba(pressures[i]) for i in np.flatnonzero(changed)}
+            self._viewer.set_materials(self._name, colors)
 
     def remove(self) -> None:
         """Remove the hand model from the viewer."""
         self._viewer.remove_group(self._name)
 
 
-def _pose(matrix):
-    return (matrix[:3, 3], mat2quat(matrix[:3, :3]))
+def _pose(matrices):
+    # positions and w,x,y,z quaternions of rigid transformations (..., 4, 4)
+    rot = matrices[..., :3, :3]
+    m00, m11, m22 = rot[..., 0, 0], rot[..., 1, 1], rot[..., 2, 2]
+    quats = 0.5 * np.sqrt(np.maximum(np.stack((
+        1.0 + m00 + m11 + m22,
+        1.0 + m00 - m11 - m22,
+        1.0 - m00 + m11 - m22,
+        1.0 - m00 - m11 + m22), axis=-1), 0.0))
+    np.copysign(quats[..., 1], rot[..., 2, 1] - rot[..., 1, 2], out=quats[..., 1])
+    np.copysign(quats[..., 2], rot[..., 0, 2] - rot[..., 2, 0], out=quats[..., 2])
+    np.copysign(quats[..., 3], rot[..., 1, 0] - rot[..., 0, 1], out=quats[..., 3])
+    return matrices[..., :3, 3], quats
 
 
 def _rgba(pressure):